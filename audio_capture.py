@@ -0,0 +1,206 @@
+import wave
+from math import gcd
+
+import numpy as np
+
+
+class CapturedAudio:
+    """Raw PCM captured from the microphone, kept in memory for the recognizer."""
+
+    def __init__(self, sample_rate, sample_width, channels=1):
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.channels = channels
+        self.frames = []
+        self._pcm = None
+
+    @classmethod
+    def from_wav(cls, filename):
+        wf = wave.open(filename, "rb")
+        captured = cls(wf.getframerate(), wf.getsampwidth(), wf.getnchannels())
+        captured.append(wf.readframes(wf.getnframes()))
+        wf.close()
+        return captured
+
+    def append(self, data):
+        self.frames.append(data)
+        self._pcm = None
+
+    @property
+    def pcm(self):
+        # Join the chunks once and reuse the result until more audio arrives
+        if self._pcm is None:
+            self._pcm = b"".join(self.frames)
+        return self._pcm
+
+    @property
+    def num_bytes(self):
+        return sum(len(frame) for frame in self.frames)
+
+    @property
+    def duration(self):
+        bytes_per_second = self.sample_rate * self.sample_width * self.channels
+        return self.num_bytes / bytes_per_second if bytes_per_second else 0.0
+
+    def is_empty(self):
+        return self.num_bytes == 0
+
+    @property
+    def num_samples(self):
+        return self.num_bytes // (self.sample_width * self.channels)
+
+    def trim(self, start_sample, end_sample):
+        # Keep only [start_sample, end_sample), e.g. the speech found by the VAD
+        frame_size = self.sample_width * self.channels
+        pcm = self.pcm[start_sample * frame_size : end_sample * frame_size]
+        self.frames = [pcm]
+        self._pcm = pcm
+
+    def to_audio_data(self):
+        # Hand the buffer straight to speech_recognition, no WAV encode/decode
+        import speech_recognition as sr
+
+        return sr.AudioData(self.pcm, self.sample_rate, self.sample_width)
+
+    def resampled(self, rate):
+        # Mono 16-bit copy at another sample rate, e.g. for engines fixed at 16 kHz
+        if rate == self.sample_rate:
+            return self
+        resampler = StreamingResampler(self.sample_rate, rate)
+        copy = CapturedAudio(rate, self.sample_width, self.channels)
+        copy.append(resampler.process(self.pcm) + resampler.flush())
+        return copy
+
+    def write_wav(self, filename):
+        # Optional debug sink, the recognizer never reads this file
+        wf = wave.open(filename, "wb")
+        wf.setnchannels(self.channels)
+        wf.setsampwidth(self.sample_width)
+        wf.setframerate(self.sample_rate)
+        wf.writeframes(self.pcm)
+        wf.close()
+
+
+# Both cloud and local recognizers work at 16 kHz mono
+RECOGNIZER_RATE = 16000
+
+CAPTURE_PROFILES = {
+    # Ask the device for 16 kHz directly, resample from the native rate if refused
+    "direct_16k": {"rate": RECOGNIZER_RATE, "fallback": "native_resampled"},
+    # Capture at the device's default rate and resample to 16 kHz while recording
+    "native_resampled": {"rate": None, "resample_to": RECOGNIZER_RATE},
+    # Original behaviour: 44.1 kHz captured and sent as-is
+    "legacy_44k": {"rate": 44100},
+}
+
+
+def default_input_rate(p):
+    try:
+        return int(p.get_default_input_device_info()["defaultSampleRate"])
+    except (IOError, OSError, KeyError):
+        return 44100
+
+
+def supports_input_rate(p, rate, audio_format, channels):
+    try:
+        return p.is_format_supported(
+            rate,
+            input_device=p.get_default_input_device_info()["index"],
+            input_channels=channels,
+            input_format=audio_format,
+        )
+    except (ValueError, IOError, OSError):
+        return False
+
+
+def select_capture_format(p, profile_name, audio_format, channels):
+    """Return (device_rate, resampler) for a capture profile.
+
+    resampler is None when the device already delivers the output rate.
+    """
+    profile = CAPTURE_PROFILES.get(profile_name)
+    if profile is None:
+        print(f"Unknown capture profile {profile_name!r}, using direct_16k")
+        profile = CAPTURE_PROFILES["direct_16k"]
+
+    rate = profile.get("rate")
+    if rate is not None:
+        if supports_input_rate(p, rate, audio_format, channels):
+            return rate, None
+        if "fallback" in profile:
+            return select_capture_format(
+                p, profile["fallback"], audio_format, channels
+            )
+
+    device_rate = rate or default_input_rate(p)
+    resample_to = profile.get("resample_to")
+    if resample_to and resample_to != device_rate:
+        return device_rate, StreamingResampler(device_rate, resample_to)
+    return device_rate, None
+
+
+def design_lowpass(up, down, taps_per_phase=32, beta=8.0):
+    # Windowed-sinc anti-aliasing filter at the upsampled rate, with a DC
+    # gain of `up` to make up for the zeros inserted by upsampling
+    cutoff = 1.0 / max(up, down)
+    length = up * taps_per_phase
+    n = np.arange(length) - (length - 1) / 2.0
+    h = np.sinc(cutoff * n) * np.kaiser(length, beta)
+    return h * (up / h.sum())
+
+
+class StreamingResampler:
+    """Vectorized NumPy polyphase resampler for int16 mono PCM chunks.
+
+    Keeps enough input history between chunks that the output matches
+    resampling the whole recording in one go.
+    """
+
+    def __init__(self, in_rate, out_rate, taps_per_phase=32):
+        g = gcd(int(in_rate), int(out_rate))
+        self.in_rate = in_rate
+        self.out_rate = out_rate
+        self.up = int(out_rate) // g
+        self.down = int(in_rate) // g
+        self.taps = taps_per_phase
+
+        # Polyphase bank: row p holds the taps used for output phase p,
+        # ordered oldest input sample first
+        h = design_lowpass(self.up, self.down, taps_per_phase)
+        bank = h.reshape(taps_per_phase, self.up).T
+        self.bank = np.ascontiguousarray(bank[:, ::-1], dtype=np.float32)
+        self.offsets = np.arange(taps_per_phase - 1, -1, -1)
+
+        self.history = np.zeros(taps_per_phase - 1, dtype=np.float32)
+        self.consumed = 0  # Input samples seen so far
+        self.produced = 0  # Output samples computed so far
+
+        # Read the filter half its length ahead so the output lines up with
+        # the input instead of lagging behind it
+        self.shift = (len(h) - 1) // 2
+
+    def _run(self, samples):
+        x = np.concatenate([self.history, samples])
+        start = self.consumed - len(self.history)  # Input index of x[0]
+        self.consumed += len(samples)
+        self.history = x[len(x) - (self.taps - 1):]
+
+        # Every output sample whose newest input sample is now available
+        last = (self.consumed * self.up - 1 - self.shift) // self.down
+        n = np.arange(self.produced, max(last + 1, self.produced))
+        self.produced = max(last + 1, self.produced)
+
+        pos = n * self.down + self.shift
+        newest = pos // self.up - start
+        window = newest[:, None] - self.offsets[None, :]
+        y = np.einsum("ij,ij->i", x[window], self.bank[pos % self.up])
+        return np.clip(np.rint(y), -32768, 32767).astype(np.int16)
+
+    def process(self, data):
+        out = self._run(np.frombuffer(data, dtype=np.int16).astype(np.float32))
+        return out.tobytes()
+
+    def flush(self):
+        # Push zeros through so the last few milliseconds are not lost
+        padding = np.zeros(self.shift // self.up + 1, dtype=np.int16)
+        return self.process(padding.tobytes())
@@ -0,0 +1,315 @@
+import time
+from threading import Event, Lock, Thread
+
+from audio_capture import StreamingResampler, select_capture_format
+from startup_profile import PROFILE
+
+CHANNELS = 1
+
+
+class RingBuffer:
+    """Preallocated byte ring written by the PortAudio callback.
+
+    Single producer: the callback only copies into the buffer and advances
+    write_pos (total bytes ever written), it never waits for a reader.
+    Readers keep their own position; one that falls more than a buffer
+    behind loses the oldest audio, which read() reports.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.buffer = bytearray(capacity)
+        self.view = memoryview(self.buffer)
+        self.write_pos = 0
+        self.data_ready = Event()
+
+    def write(self, data):
+        n = len(data)
+        if n > self.capacity:
+            data = data[n - self.capacity :]
+            self.write_pos += n - self.capacity
+            n = self.capacity
+        start = self.write_pos % self.capacity
+        first = min(n, self.capacity - start)
+        self.view[start : start + first] = data[:first]
+        if first < n:
+            self.view[: n - first] = data[first:]
+        self.write_pos += n
+        self.data_ready.set()
+
+    def available(self, pos):
+        return self.write_pos - pos
+
+    def read(self, pos, max_bytes):
+        """(data, new_pos, lost_bytes) for up to max_bytes starting at pos."""
+        lost = 0
+        if self.write_pos - pos > self.capacity:
+            lost = self.write_pos - pos - self.capacity
+            pos += lost
+        n = min(max_bytes, self.write_pos - pos)
+        start = pos % self.capacity
+        first = min(n, self.capacity - start)
+        data = bytes(self.view[start : start + first])
+        if first < n:
+            data += bytes(self.view[: n - first])
+        # The callback may have lapped us while copying
+        overwritten = self.write_pos - pos - self.capacity
+        if overwritten > 0:
+            lost += overwritten
+            data = data[overwritten:]
+        return data, pos + n, lost
+
+
+class CaptureSession:
+    """One recording on the shared input stream.
+
+    read() returns PCM at the output rate, resampled with a resampler of
+    its own. Audio pushed back with unread() is returned first, e.g. what
+    the barge-in monitor heard before handing the session to the recorder.
+    """
+
+    def __init__(self, devices, started_at=None):
+        self.devices = devices
+        self.rate = devices.output_rate
+        self.sample_width = devices.sample_width
+        self.channels = CHANNELS
+        self.resampler = None
+        if devices.resample_to:
+            self.resampler = StreamingResampler(devices.rate, devices.resample_to)
+        self.pending = []
+        self.read_pos = devices.ring.write_pos  # Older audio is stale
+        self.started_at = started_at or time.perf_counter()
+        self.first_sample_ms = None
+
+    def unread(self, data):
+        self.pending.append(data)
+
+    def read(self, frames, timeout=0.5):
+        if self.pending:
+            return self.pending.pop(0)
+
+        # Wait for the callback to deliver enough audio
+        ring = self.devices.ring
+        want = frames * self.devices.frame_bytes
+        while ring.available(self.read_pos) < want:
+            ring.data_ready.clear()
+            if ring.available(self.read_pos) >= want:
+                break
+            if not ring.data_ready.wait(timeout):
+                self.devices.starved_reads += 1
+                break
+        data, self.read_pos, lost = ring.read(self.read_pos, want)
+        if lost:
+            self.devices.dropped_bytes += lost
+
+        if data and self.first_sample_ms is None:
+            self.first_sample_ms = (time.perf_counter() - self.started_at) * 1000
+            print(f"Audio: first sample {self.first_sample_ms:.0f} ms after start")
+        if self.resampler:
+            data = self.resampler.process(data)
+        return data
+
+    def flush(self):
+        return self.resampler.flush() if self.resampler else b""
+
+    def close(self):
+        self.devices.release()
+        print(self.devices.describe())
+
+
+class AudioDeviceManager:
+    """Owns PyAudio and the microphone stream for the whole session.
+
+    PortAudio is initialized, the input device and capture format are chosen
+    and the stream is opened once, by warm_load() in the background after
+    the window is up, or by the first recording. With keep_warm the stream
+    keeps running between recordings and stale audio is dropped when a new
+    one starts; otherwise it is stopped and restarted, which is still much
+    cheaper than enumerating the devices again. close() releases it all.
+
+    The stream runs in callback mode: PortAudio hands each buffer of
+    frames_per_buffer frames to on_audio() on its own thread, which copies it
+    into a ring buffer holding ring_seconds of audio. Recording threads read
+    from the ring, so a busy GIL delays them without losing input. Overflows,
+    underruns and input latency are tracked for tuning.
+    """
+
+    def __init__(
+        self,
+        capture_profile="direct_16k",
+        frames_per_buffer=1024,
+        keep_warm=True,
+        ring_seconds=4,
+    ):
+        self.capture_profile = capture_profile
+        self.frames_per_buffer = frames_per_buffer
+        self.keep_warm = keep_warm
+        self.ring_seconds = ring_seconds
+        self.lock = Lock()
+        self.ready = Event()
+        self.load_started = False
+        self.load_error = None
+        self.pyaudio = None
+        self.p = None
+        self.device = None
+        self.stream = None
+
+        # Capture health, updated from the callback and the readers
+        self.overflows = 0  # PortAudio input overflows (audio lost)
+        self.underruns = 0  # PortAudio input underflows
+        self.dropped_bytes = 0  # Lost because a reader fell too far behind
+        self.starved_reads = 0  # Reads that timed out waiting for audio
+        self.callback_delay_ms = None  # ADC time to callback, last buffer
+        self.max_callback_delay_ms = 0.0
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            capture_profile=config["capture_profile"],
+            frames_per_buffer=config["audio_frames_per_buffer"],
+            keep_warm=config["audio_keep_warm"],
+        )
+
+    def warm_load(self, background=True):
+        with self.lock:
+            if self.load_started:
+                return
+            self.load_started = True
+        if background:
+            Thread(target=self.load, args=(True,), daemon=True).start()
+        else:
+            self.load()
+
+    def load(self, background=False):
+        start = time.perf_counter()
+        try:
+            with PROFILE.phase("open microphone", background):
+                with self.lock:
+                    self.open()
+        except Exception as e:
+            print(f"Audio: could not initialize PortAudio: {str(e)}")
+            self.load_error = e
+        finally:
+            setup_ms = (time.perf_counter() - start) * 1000
+            self.ready.set()
+        if self.load_error is None:
+            name = self.device["name"] if self.device else "no input device"
+            print(f"Audio: {name} at {self.rate} Hz, ready in {setup_ms:.0f} ms")
+
+    def open(self):
+        import pyaudio
+
+        self.pyaudio = pyaudio
+        self.format = pyaudio.paInt16
+        self.p = pyaudio.PyAudio()
+        self.rate, resampler = select_capture_format(
+            self.p, self.capture_profile, self.format, CHANNELS
+        )
+        self.resample_to = resampler.out_rate if resampler else None
+        self.sample_width = self.p.get_sample_size(self.format)
+        self.frame_bytes = self.sample_width * CHANNELS
+        self.ring = RingBuffer(self.rate * self.frame_bytes * self.ring_seconds)
+        try:
+            self.device = self.p.get_default_input_device_info()
+            self.open_stream()
+        except (IOError, OSError) as e:
+            # Retried when the first recording starts
+            print(f"Audio: could not open the microphone: {str(e)}")
+
+    @property
+    def output_rate(self):
+        return self.resample_to or self.rate
+
+    def open_stream(self):
+        self.stream = self.p.open(
+            format=self.format,
+            channels=CHANNELS,
+            rate=self.rate,
+            input=True,
+            input_device_index=self.device["index"] if self.device else None,
+            frames_per_buffer=self.frames_per_buffer,
+            start=self.keep_warm,
+            stream_callback=self.on_audio,
+        )
+
+    def on_audio(self, in_data, frame_count, time_info, status):
+        # Runs on the PortAudio thread: record, copy and return at once
+        pyaudio = self.pyaudio
+        if status & pyaudio.paInputOverflow:
+            self.overflows += 1
+        if status & pyaudio.paInputUnderflow:
+            self.underruns += 1
+        self.ring.write(in_data)
+        adc_time = time_info.get("input_buffer_adc_time")
+        now = time_info.get("current_time")
+        if adc_time and now:
+            self.callback_delay_ms = (now - adc_time) * 1000
+            self.max_callback_delay_ms = max(
+                self.max_callback_delay_ms, self.callback_delay_ms
+            )
+        return (None, pyaudio.paContinue)
+
+    def acquire(self, started_at=None):
+        """Start a recording; started_at is when the user asked for it."""
+        self.warm_load(background=False)
+        self.ready.wait()
+        if self.load_error is not None:
+            raise OSError(f"Audio input unavailable: {self.load_error}")
+        with self.lock:
+            if self.stream is None:
+                self.open_stream()
+            # Sessions start reading at the current write position, so
+            # audio buffered by a warm stream is skipped
+            session = CaptureSession(self, started_at)
+            if not self.stream.is_active():
+                self.stream.start_stream()
+        return session
+
+    def release(self):
+        with self.lock:
+            if not self.keep_warm and self.stream is not None:
+                self.stream.stop_stream()
+
+    def input_latency_ms(self):
+        if self.stream is None:
+            return None
+        return self.stream.get_input_latency() * 1000
+
+    def stats(self):
+        return {
+            "frames_per_buffer": self.frames_per_buffer,
+            "input_latency_ms": self.input_latency_ms(),
+            "callback_delay_ms": self.callback_delay_ms,
+            "max_callback_delay_ms": self.max_callback_delay_ms,
+            "overflows": self.overflows,
+            "underruns": self.underruns,
+            "dropped_bytes": self.dropped_bytes,
+            "starved_reads": self.starved_reads,
+        }
+
+    def describe(self):
+        stats = self.stats()
+        latency = stats["input_latency_ms"]
+        text = f"Audio: {self.frames_per_buffer} frames per buffer"
+        if latency is not None:
+            text += f", {latency:.0f} ms input latency"
+        if stats["callback_delay_ms"] is not None:
+            text += (
+                f", {stats['callback_delay_ms']:.0f} ms to callback "
+                f"(max {stats['max_callback_delay_ms']:.0f})"
+            )
+        return (
+            f"{text}, {stats['overflows']} overflows, {stats['underruns']} "
+            f"underruns, {stats['dropped_bytes']} bytes dropped, "
+            f"{stats['starved_reads']} starved reads"
+        )
+
+    def close(self):
+        with self.lock:
+            if self.stream is not None:
+                self.stream.stop_stream()
+                self.stream.close()
+                self.stream = None
+            if self.p is not None:
+                self.p.terminate()
+                self.p = None
@@ -0,0 +1,117 @@
+import time
+from collections import deque
+from threading import Event, Lock, Thread, current_thread
+
+from vad import VoiceActivityDetector, level_db
+
+
+class BargeInMonitor:
+    """Keeps the microphone armed while the tutor is speaking.
+
+    A VAD tuned for quick onsets watches the input; once the learner has
+    been talking for min_speech_ms, on_barge_in(session, noise_floor_db) is
+    called from the monitor thread with the capture session still open and
+    the last preroll_ms of audio pushed back into it, so recording carries on
+    without losing the first syllables. noise_floor_db is the background
+    level the monitor had settled on, to seed the VAD of the turn that
+    starts with speech. The noise floor starts at the level heard while the
+    reply is already playing, so the tutor's own voice leaking into the
+    microphone does not trigger it; arm() once playback has started.
+    """
+
+    def __init__(
+        self,
+        on_barge_in,
+        devices,
+        margin_db=15.0,
+        min_speech_ms=60,
+        chunk_ms=20,
+        preroll_ms=300,
+    ):
+        self.on_barge_in = on_barge_in
+        self.devices = devices
+        self.margin_db = margin_db
+        self.min_speech_ms = min_speech_ms
+        self.chunk_ms = chunk_ms
+        self.preroll_ms = preroll_ms
+        self.lock = Lock()
+        self.armed = Event()
+        self.thread = None
+        self.barge_ins = 0
+
+    @classmethod
+    def from_config(cls, on_barge_in, devices, config):
+        return cls(
+            on_barge_in,
+            devices,
+            margin_db=config["barge_in_margin_db"],
+            min_speech_ms=config["barge_in_min_speech_ms"],
+        )
+
+    def arm(self):
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.armed.set()
+            self.thread = Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+    def disarm(self):
+        with self.lock:
+            thread, self.thread = self.thread, None
+            self.armed.clear()
+        if thread is not None:
+            thread.join()
+
+    def run(self):
+        try:
+            session = self.devices.acquire()
+        except OSError as e:
+            # E.g. the microphone was unplugged; stay disarmed so a later
+            # arm() tries again
+            print(f"Error in barge-in monitor: {str(e)}")
+            with self.lock:
+                if self.thread is current_thread():
+                    self.thread = None
+                    self.armed.clear()
+            return
+        chunk = max(1, self.devices.rate * self.chunk_ms // 1000)
+        vad = None
+        preroll = deque()
+        preroll_bytes = 0
+        max_preroll = session.rate * session.sample_width * self.preroll_ms // 1000
+        armed_at = time.perf_counter()
+
+        while self.armed.is_set():
+            data = session.read(chunk)
+            preroll.append(data)
+            preroll_bytes += len(data)
+            while preroll_bytes - len(preroll[0]) >= max_preroll:
+                preroll_bytes -= len(preroll.popleft())
+
+            if vad is None:
+                # The floor starts at the level of the reply already playing
+                vad = VoiceActivityDetector(
+                    session.rate,
+                    frame_ms=self.chunk_ms,
+                    min_speech_ms=self.min_speech_ms,
+                    hangover_ms=0,
+                    energy_margin_db=self.margin_db,
+                    noise_floor_db=level_db(data),
+                )
+            vad.process(data)
+            if not vad.heard_speech:
+                continue
+            with self.lock:
+                if self.thread is not current_thread():
+                    break  # Disarmed in the meantime
+                self.thread = None
+                self.armed.clear()
+            self.barge_ins += 1
+            listened_ms = (time.perf_counter() - armed_at) * 1000
+            print(f"Barge-in: learner cut in {listened_ms:.0f} ms into the reply")
+            session.unread(b"".join(preroll))
+            self.on_barge_in(session, vad.noise_floor_db)
+            return
+
+        session.close()
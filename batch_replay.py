@@ -0,0 +1,279 @@
+"""Replay recorded learner turns through STT -> LLM -> (optional) TTS in bulk.
+
+The input is a folder of WAV files or a JSONL manifest with one
+{"audio": path, "scenario": name, "id": optional} object per line. In a
+folder, a file inside a subfolder named after a scenario belongs to that
+scenario; any other file uses --scenario. Each file is answered as one learner
+turn in its scenario, with a fresh history. A reference transcript in foo.txt
+next to foo.wav adds the word error rate.
+
+Each result is appended to the --out JSONL file with its stage timings as
+soon as it finishes. Rerunning with the same --out skips the files that
+already succeeded, so a crashed or partly failed run resumes where it
+stopped.
+
+    python batch_replay.py recordings/ --out replay.jsonl [--workers 8]
+        [--processes] [--stt-concurrency 2] [--llm-concurrency 4]
+        [--tts pyttsx3|edge] [--tts-concurrency 2]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+
+from audio_capture import CapturedAudio
+from bench_stt import word_errors
+from config import load_config
+from conversation_engine import (
+    TTS_ENGINES,
+    ConversationEngine,
+    TranscriptionError,
+    create_tts,
+)
+from history_manager import token_budget_for
+from model_manager import ModelManager
+from ollama_client import OllamaClient
+from scenarios import SCENARIOS
+from stt_backends import SpeechToText
+from turn_trace import percentile
+
+STAGES = ("stt", "llm", "tts")
+
+# Backends of this worker process, set up by init_worker()
+CONTEXT = None
+
+
+def load_items(source, default_scenario):
+    if source.endswith(".jsonl"):
+        base = os.path.dirname(source)
+        items = []
+        with open(source, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                audio = os.path.join(base, entry["audio"])
+                items.append(
+                    {
+                        "id": entry.get("id", entry["audio"]),
+                        "audio": audio,
+                        "scenario": entry.get("scenario", default_scenario),
+                    }
+                )
+    elif os.path.isdir(source):
+        items = []
+        for folder, _, files in sorted(os.walk(source)):
+            label = os.path.basename(folder)
+            scenario = label if label in SCENARIOS else default_scenario
+            for name in sorted(files):
+                if name.lower().endswith(".wav"):
+                    audio = os.path.join(folder, name)
+                    items.append(
+                        {
+                            "id": os.path.relpath(audio, source),
+                            "audio": audio,
+                            "scenario": scenario,
+                        }
+                    )
+    else:
+        items = [{"id": source, "audio": source, "scenario": default_scenario}]
+
+    for item in items:
+        if item["scenario"] not in SCENARIOS:
+            raise ValueError(f"{item['id']}: unknown scenario {item['scenario']!r}")
+        reference_file = os.path.splitext(item["audio"])[0] + ".txt"
+        if os.path.exists(reference_file):
+            with open(reference_file, "r", encoding="utf-8") as f:
+                item["reference"] = f.read().strip()
+    return items
+
+
+def load_done(out):
+    """Ids that already succeeded in an earlier run with the same output."""
+    done = set()
+    if not os.path.exists(out):
+        return done
+    with open(out, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # Cut off by a crash mid-write
+            if record.get("status") == "ok":
+                done.add(record["id"])
+    return done
+
+
+class ReplayContext:
+    """Backends shared by every replay in one process, and the stage limits.
+
+    Each replay gets its own ConversationEngine, so histories never mix,
+    while the recognizer, the pooled model client and the synthesizer are
+    shared. limits holds one semaphore per stage; with --processes they are
+    process-shared, so the limits hold across the whole run.
+    """
+
+    def __init__(self, config, tts, limits):
+        self.config = config
+        self.models = ModelManager.from_config(
+            OllamaClient.from_config(config), config, default_model="mistral"
+        )
+        self.stt = SpeechToText(config, background=False)
+        self.tts = create_tts(tts, config)
+        self.limits = limits
+
+    @contextmanager
+    def stage(self, name, record):
+        queued = time.perf_counter()
+        with self.limits[name]:
+            start = time.perf_counter()
+            try:
+                yield
+            finally:
+                end = time.perf_counter()
+                record["timings"][name] = round((end - start) * 1000, 1)
+                record["timings"][f"{name}_wait"] = round((start - queued) * 1000, 1)
+
+    def replay(self, item):
+        record = dict(item, status="error", timings={})
+        engine = ConversationEngine(
+            self.models,
+            SCENARIOS,
+            stt=self.stt,
+            tts=self.tts,
+            token_budget=token_budget_for(self.config, self.models.model),
+        )
+        start = time.perf_counter()
+        try:
+            captured = CapturedAudio.from_wav(item["audio"])
+            record["audio_seconds"] = round(captured.duration, 3)
+            engine.start_scenario(item["scenario"])
+
+            with self.stage("stt", record):
+                record["transcript"] = engine.transcribe(captured)
+            if "reference" in item:
+                errors, words = word_errors(item["reference"], record["transcript"])
+                record["wer"] = round(errors / words, 4) if words else None
+
+            with self.stage("llm", record):
+                record["reply"] = engine.respond(record["transcript"])
+            if engine.last_error:
+                raise RuntimeError(engine.last_error)
+            first_token_ms = engine.last_response["first_token_ms"]
+            if first_token_ms is not None:
+                record["timings"]["first_token"] = round(first_token_ms, 1)
+
+            if self.tts is not None:
+                with self.stage("tts", record):
+                    record["audio_bytes"] = len(engine.synthesize(record["reply"]))
+            record["status"] = "ok"
+        except TranscriptionError as e:
+            record["error"] = str(e)
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {str(e)}"
+        record["timings"]["total"] = round((time.perf_counter() - start) * 1000, 1)
+        return record
+
+
+def init_worker(config, tts, limits):
+    global CONTEXT
+    CONTEXT = ReplayContext(config, tts, limits)
+
+
+def replay_item(item):
+    return CONTEXT.replay(item)
+
+
+def summarize(records):
+    print(f"{'stage':<12}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for name in STAGES + ("first_token", "total"):
+        values = [r["timings"][name] for r in records if name in r["timings"]]
+        if values:
+            print(
+                f"{name:<12}{percentile(values, 50):>10.0f}"
+                f"{percentile(values, 95):>10.0f}{max(values):>10.0f}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", help="folder of WAV files or a JSONL manifest")
+    parser.add_argument("--out", default="replay.jsonl", help="JSONL results file")
+    parser.add_argument("--scenario", default="Casual Chat", choices=list(SCENARIOS))
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument(
+        "--processes", action="store_true", help="use a process pool, not threads"
+    )
+    parser.add_argument("--stt-concurrency", type=int, default=2)
+    parser.add_argument("--llm-concurrency", type=int, default=4)
+    parser.add_argument("--tts", choices=TTS_ENGINES, help="also synthesize replies")
+    parser.add_argument("--tts-concurrency", type=int, default=2)
+    parser.add_argument("--model", help="Ollama model (default: ollama_model)")
+    args = parser.parse_args()
+
+    config = load_config()
+    if args.model:
+        config["ollama_model"] = args.model
+    # Enough pooled connections for every request that may run at once
+    config["ollama_pool_size"] = max(config["ollama_pool_size"], args.llm_concurrency)
+
+    items = load_items(args.source, args.scenario)
+    done = load_done(args.out)
+    pending = [item for item in items if item["id"] not in done]
+    print(
+        f"Replay: {len(items)} file(s), {len(items) - len(pending)} already done, "
+        f"{len(pending)} to run on {args.workers} "
+        f"{'processes' if args.processes else 'threads'}"
+    )
+
+    counts = {
+        "stt": args.stt_concurrency,
+        "llm": args.llm_concurrency,
+        "tts": args.tts_concurrency,
+    }
+    if args.processes:
+        limits = {name: multiprocessing.Semaphore(n) for name, n in counts.items()}
+        executor = ProcessPoolExecutor(
+            args.workers, initializer=init_worker, initargs=(config, args.tts, limits)
+        )
+    else:
+        limits = {name: threading.Semaphore(n) for name, n in counts.items()}
+        init_worker(config, args.tts, limits)
+        executor = ThreadPoolExecutor(args.workers)
+
+    records = []
+    start = time.perf_counter()
+    with open(args.out, "a", encoding="utf-8") as out, executor:
+        futures = [executor.submit(replay_item, item) for item in pending]
+        try:
+            for future in as_completed(futures):
+                record = future.result()
+                # Written at once, so an interrupted run loses nothing finished
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+                records.append(record)
+                if record["status"] != "ok":
+                    print(f"  {record['id']}: {record['error']}")
+        except KeyboardInterrupt:
+            print("Interrupted; rerun with the same --out to resume")
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    failed = sum(record["status"] != "ok" for record in records)
+    elapsed = time.perf_counter() - start
+    print(
+        f"Replay: {len(records) - failed} ok, {failed} failed in {elapsed:.1f} s "
+        f"({len(records) / elapsed if elapsed else 0:.2f} files/s)"
+    )
+    summarize([record for record in records if record["status"] == "ok"])
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Micro-benchmark for the capture profiles in audio_capture.py.
+
+Replays a recorded turn chunk by chunk the way a RecordedTurn does and reports
+the bytes kept per turn, the resampling cost and (with --stt) the Google STT
+latency for each profile.
+
+    python bench_capture.py [--wav temp_recording.wav] [--stt] [--repeat 3]
+"""
+
+import argparse
+import time
+import wave
+
+from audio_capture import (
+    CAPTURE_PROFILES,
+    RECOGNIZER_RATE,
+    CapturedAudio,
+    StreamingResampler,
+)
+
+CHUNK = 1024
+
+
+def load_wav(filename):
+    wf = wave.open(filename, "rb")
+    if wf.getnchannels() != 1 or wf.getsampwidth() != 2:
+        raise ValueError("Benchmark expects 16-bit mono audio")
+    rate = wf.getframerate()
+    pcm = wf.readframes(wf.getnframes())
+    wf.close()
+    return rate, pcm
+
+
+def simulate_capture(device_rate, pcm, resample_to=None):
+    # Feed the recording in CHUNK-sized reads, as the microphone loop does
+    resampler = None
+    if resample_to and resample_to != device_rate:
+        resampler = StreamingResampler(device_rate, resample_to)
+
+    captured = CapturedAudio(resampler.out_rate if resampler else device_rate, 2)
+    chunk_bytes = CHUNK * 2
+    start = time.perf_counter()
+    for i in range(0, len(pcm), chunk_bytes):
+        data = pcm[i : i + chunk_bytes]
+        if resampler:
+            data = resampler.process(data)
+        captured.append(data)
+    if resampler:
+        captured.append(resampler.flush())
+    elapsed = time.perf_counter() - start
+    return captured, elapsed
+
+
+def device_input(profile_name, source_rate, source_pcm):
+    # What the device would deliver for this profile, derived from the source
+    profile = CAPTURE_PROFILES[profile_name]
+    rate = profile.get("rate") or source_rate
+    if rate == source_rate:
+        return rate, source_pcm
+    captured, _ = simulate_capture(source_rate, source_pcm, rate)
+    return rate, captured.pcm
+
+
+def time_stt(captured):
+    import speech_recognition as sr
+
+    recognizer = sr.Recognizer()
+    start = time.perf_counter()
+    try:
+        text = recognizer.recognize_google(captured.to_audio_data())
+    except (sr.UnknownValueError, sr.RequestError) as e:
+        text = f"<{type(e).__name__}>"
+    return time.perf_counter() - start, text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--wav", default="temp_recording.wav")
+    parser.add_argument("--stt", action="store_true", help="also time Google STT")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    source_rate, source_pcm = load_wav(args.wav)
+    seconds = len(source_pcm) / 2 / source_rate
+    print(f"Source: {args.wav}, {source_rate} Hz, {seconds:.1f} s")
+    print(
+        f"{'profile':<18}{'device Hz':>10}{'bytes/turn':>12}"
+        f"{'KB/s':>8}{'capture ms':>12}{'STT ms':>10}"
+    )
+
+    for name, profile in CAPTURE_PROFILES.items():
+        rate, device_pcm = device_input(name, source_rate, source_pcm)
+        resample_to = profile.get("resample_to", None)
+
+        best = None
+        for _ in range(args.repeat):
+            captured, elapsed = simulate_capture(rate, device_pcm, resample_to)
+            best = elapsed if best is None else min(best, elapsed)
+
+        stt = "-"
+        if args.stt:
+            stt_seconds, text = time_stt(captured)
+            stt = f"{stt_seconds * 1000:.0f}"
+            print(f"  {name}: {text}")
+
+        print(
+            f"{name:<18}{rate:>10}{captured.num_bytes:>12}"
+            f"{captured.num_bytes / seconds / 1024:>8.1f}"
+            f"{best * 1000:>12.1f}{stt:>10}"
+        )
+
+    print(f"Recognizer rate: {RECOGNIZER_RATE} Hz")
+
+
+if __name__ == "__main__":
+    main()
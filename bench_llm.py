@@ -0,0 +1,256 @@
+"""Client-side overhead benchmark for the Ollama chat paths, against fake_ollama.py.
+
+Replays learner turns through ConversationEngine.respond() the way main.py
+asks for a reply (one non-streaming request) and the way main_edge_tts.py
+does (streamed, every chunk fed to the chat display and the sentence
+segmenter), against a local fake Ollama server with a known pace. Whatever
+a turn takes beyond the time the server spent answering it is client
+overhead: HTTP, JSON, history and callback work. It is reported per turn,
+for the first token and per token.
+
+With --save-baseline the results are stored in --baseline; later runs
+compare their medians against it and exit with status 1 when an overhead
+grew by more than --tolerance (and by more than --min-delta-ms per turn,
+which is noise). The p95 is reported but not compared: a few dozen turns
+are too few for a tail that does not move with scheduler noise.
+
+    python bench_llm.py [--turns 50] [--reply-tokens 120] [--chunk-tokens 1]
+        [--token-rate 0] [--first-token-ms 0] [--error-rate 0]
+        [--baseline bench_llm_baseline.json] [--save-baseline]
+"""
+
+import argparse
+import json
+import os
+import time
+from contextlib import redirect_stdout
+
+from config import load_config
+from conversation_engine import ConversationEngine
+from fake_ollama import ERROR_MODES, FakeOllamaServer
+from history_manager import token_budget_for
+from model_manager import ModelManager
+from ollama_client import OllamaClient
+from scenarios import SCENARIOS
+from sentence_tts import SentenceSegmenter
+from turn_trace import percentile
+
+# Client path -> whether it streams and the app's default model
+PATHS = {
+    "main.py": {"stream": False, "model": "mistral"},
+    "main_edge_tts.py": {"stream": True, "model": "llama3.2"},
+}
+
+LEARNER_TURN = "I went to the park with my friends and we played football."
+
+# Overheads checked against the baseline, all medians; larger is worse
+COMPARED = (
+    "overhead_turn_ms_p50",
+    "overhead_first_token_ms_p50",
+    "overhead_token_us",
+)
+
+# Server settings a baseline is only comparable under
+SETTINGS = ("reply_tokens", "chunk_tokens", "token_rate", "first_token_ms")
+
+
+def edge_token_handler():
+    # What main_edge_tts.py does per chunk: queue it for the chat display
+    # and cut completed sentences off for the speaker
+    shown = []
+    sentences = []
+    segmenter = SentenceSegmenter()
+
+    def on_token(text):
+        shown.append(text)
+        sentences.extend(segmenter.feed(text))
+
+    return on_token
+
+
+def run_path(name, server, config, turns, warmup):
+    client = OllamaClient.from_config(config, endpoint=server.endpoint)
+    models = ModelManager.from_config(client, config, PATHS[name]["model"])
+    engine = ConversationEngine(
+        models, SCENARIOS, token_budget=token_budget_for(config, models.model)
+    )
+    samples = []
+    errors = 0
+    try:
+        for turn in range(warmup + turns):
+            # A fresh history each turn, so every request is the same size
+            engine.start_scenario("Casual Chat")
+            on_token = edge_token_handler() if PATHS[name]["stream"] else None
+            server.take_records()
+
+            start = time.perf_counter()
+            # The engine's per-request logging is part of the client path,
+            # it is only kept off the screen
+            with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+                engine.respond(LEARNER_TURN, on_token=on_token)
+            turn_ms = (time.perf_counter() - start) * 1000
+            handled = server.take_records(count=1)
+
+            if turn < warmup:
+                continue
+            if engine.last_error or len(handled) != 1 or handled[0]["error"]:
+                errors += 1
+                continue
+            record = handled[0]
+            server_ms = record["handled_s"] * 1000
+            samples.append(
+                {
+                    "turn_ms": turn_ms,
+                    "first_token_ms": engine.last_response["first_token_ms"],
+                    "overhead_ms": turn_ms - server_ms,
+                    "overhead_first_token_ms": (
+                        engine.last_response["first_token_ms"]
+                        - record["first_chunk_s"] * 1000
+                    ),
+                    "tokens": record["tokens"],
+                }
+            )
+    finally:
+        engine.close()
+    return summarize(samples, errors)
+
+
+def summarize(samples, errors):
+    result = {"turns": len(samples), "errors": errors}
+    if not samples:
+        return result
+
+    def values(key):
+        return [sample[key] for sample in samples]
+
+    tokens_per_turn = sum(values("tokens")) / len(samples)
+    overhead_p50 = percentile(values("overhead_ms"), 50)
+    result.update(
+        {
+            "tokens_per_turn": tokens_per_turn,
+            "turn_ms_p50": percentile(values("turn_ms"), 50),
+            "first_token_ms_p50": percentile(values("first_token_ms"), 50),
+            "overhead_turn_ms_p50": overhead_p50,
+            "overhead_turn_ms_p95": percentile(values("overhead_ms"), 95),
+            "overhead_first_token_ms_p50": percentile(
+                values("overhead_first_token_ms"), 50
+            ),
+            # The median turn's overhead spread over its tokens
+            "overhead_token_us": (
+                overhead_p50 * 1000 / tokens_per_turn if tokens_per_turn else 0.0
+            ),
+        }
+    )
+    return {
+        key: round(value, 3) if isinstance(value, float) else value
+        for key, value in result.items()
+    }
+
+
+def report(results):
+    print(
+        f"{'path':<18}{'turns':>6}{'errors':>7}{'turn p50':>10}{'ttft p50':>10}"
+        f"{'ovh p50':>9}{'ovh p95':>9}{'ovh ttft':>10}{'ovh/token':>11}"
+    )
+    for name, result in results.items():
+        if not result["turns"]:
+            print(f"{name:<18}{0:>6}{result['errors']:>7}")
+            continue
+        print(
+            f"{name:<18}{result['turns']:>6}{result['errors']:>7}"
+            f"{result['turn_ms_p50']:>8.1f}ms{result['first_token_ms_p50']:>8.1f}ms"
+            f"{result['overhead_turn_ms_p50']:>7.2f}ms"
+            f"{result['overhead_turn_ms_p95']:>7.2f}ms"
+            f"{result['overhead_first_token_ms_p50']:>8.2f}ms"
+            f"{result['overhead_token_us']:>9.1f}us"
+        )
+
+
+def find_regressions(results, baseline, tolerance, min_delta_ms):
+    regressions = []
+    for name, result in results.items():
+        base = baseline["paths"].get(name)
+        if not base or not result["turns"]:
+            continue
+        for key in COMPARED:
+            # The per-token overhead gets the per-turn noise spread over a turn
+            min_delta = min_delta_ms
+            if key == "overhead_token_us":
+                min_delta = min_delta_ms * 1000 / max(result["tokens_per_turn"], 1)
+            current, previous = result[key], base[key]
+            if current > previous * (1 + tolerance) and current - previous > min_delta:
+                regressions.append(f"{name} {key}: {previous} -> {current}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=3, help="untimed turns first")
+    parser.add_argument(
+        "--paths", default=",".join(PATHS), help="comma-separated client paths"
+    )
+    parser.add_argument("--reply-tokens", type=int, default=120)
+    parser.add_argument("--chunk-tokens", type=int, default=1)
+    parser.add_argument(
+        "--token-rate", type=float, default=0.0, help="tokens/s, 0 = unpaced"
+    )
+    parser.add_argument("--first-token-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-mode", choices=ERROR_MODES, default="status")
+    parser.add_argument("--baseline", default="bench_llm_baseline.json")
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="store these results instead"
+    )
+    parser.add_argument("--tolerance", type=float, default=0.5)
+    parser.add_argument("--min-delta-ms", type=float, default=1.0)
+    args = parser.parse_args()
+
+    paths = [name.strip() for name in args.paths.split(",") if name.strip()]
+    for name in paths:
+        if name not in PATHS:
+            parser.error(f"unknown path {name!r}, expected one of {list(PATHS)}")
+
+    settings = {key: getattr(args, key) for key in SETTINGS}
+    server = FakeOllamaServer(
+        error_rate=args.error_rate, error_mode=args.error_mode, **settings
+    ).start()
+    config = load_config()
+    print(f"Fake Ollama on {server.endpoint}: {json.dumps(settings)}")
+    try:
+        results = {
+            name: run_path(name, server, config, args.turns, args.warmup)
+            for name in paths
+        }
+    finally:
+        server.stop()
+    report(results)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"settings": settings, "paths": results}, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to store one")
+        return
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline["settings"] != settings:
+        raise SystemExit(
+            f"{args.baseline} was recorded with {json.dumps(baseline['settings'])}; "
+            "rerun with those settings or store a new baseline"
+        )
+    regressions = find_regressions(
+        results, baseline, args.tolerance, args.min_delta_ms
+    )
+    if regressions:
+        print("Regressions against the baseline:")
+        for line in regressions:
+            print(f"  {line}")
+        raise SystemExit(1)
+    print(f"No regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
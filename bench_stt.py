@@ -0,0 +1,141 @@
+"""Latency/accuracy benchmark for the STT backends in stt_backends.py.
+
+Replays a corpus of WAV files through each backend and reports load time,
+real-time factor, p50/p95 latency and word error rate. A reference
+transcript for foo.wav is read from foo.txt next to it, when present.
+
+    python bench_stt.py [--corpus DIR] [--backends google,sphinx,vosk,fake]
+"""
+
+import argparse
+import glob
+import os
+import time
+
+import speech_recognition as sr
+
+from audio_capture import CapturedAudio
+from config import load_config
+from stt_backends import STT_BACKENDS, create_stt_backend
+from turn_trace import percentile
+
+
+def load_corpus(corpus):
+    if corpus is None:
+        files = ["temp_recording.wav"]
+    elif os.path.isdir(corpus):
+        files = sorted(glob.glob(os.path.join(corpus, "*.wav")))
+    else:
+        files = [corpus]
+
+    items = []
+    for filename in files:
+        reference = None
+        reference_file = os.path.splitext(filename)[0] + ".txt"
+        if os.path.exists(reference_file):
+            with open(reference_file, "r", encoding="utf-8") as f:
+                reference = f.read().strip()
+        items.append((filename, CapturedAudio.from_wav(filename), reference))
+    return items
+
+
+def normalize_words(text):
+    words = "".join(c if c.isalnum() or c == "'" else " " for c in text.lower())
+    return words.split()
+
+
+def word_errors(reference, hypothesis):
+    # Word-level Levenshtein distance: substitutions + deletions + insertions
+    ref, hyp = normalize_words(reference), normalize_words(hypothesis)
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hyp, 1):
+            current.append(
+                min(
+                    previous[j] + 1,
+                    current[j - 1] + 1,
+                    previous[j - 1] + (ref_word != hyp_word),
+                )
+            )
+        previous = current
+    return previous[-1], len(ref)
+
+
+def run_backend(name, config, corpus, repeat):
+    backend = create_stt_backend(name, config, background=False)
+    if backend.load_error is not None:
+        return {"name": name, "error": str(backend.load_error)}
+
+    latencies = []
+    audio_seconds = 0.0
+    errors = 0
+    reference_words = 0
+    failures = 0
+    for filename, captured, reference in corpus:
+        for attempt in range(repeat):
+            start = time.perf_counter()
+            try:
+                text = backend.transcribe(captured)
+            except sr.UnknownValueError:
+                text = ""
+            except sr.RequestError as e:
+                print(f"  {name}: {filename}: {str(e)}")
+                failures += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+            audio_seconds += captured.duration
+            if attempt == 0:
+                print(f"  {name}: {os.path.basename(filename)}: {text!r}")
+                if reference is not None:
+                    file_errors, file_words = word_errors(reference, text)
+                    errors += file_errors
+                    reference_words += file_words
+
+    return {
+        "name": name,
+        "load": backend.load_seconds,
+        "rtf": sum(latencies) / audio_seconds if audio_seconds else None,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "wer": errors / reference_words if reference_words else None,
+        "failures": failures,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", help="WAV file or folder of WAV files")
+    parser.add_argument("--backends", default=",".join(STT_BACKENDS))
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    config = load_config()
+    corpus = load_corpus(args.corpus)
+    total = sum(captured.duration for _, captured, _ in corpus)
+    print(f"Corpus: {len(corpus)} file(s), {total:.1f} s of audio")
+
+    results = [
+        run_backend(name.strip(), config, corpus, args.repeat)
+        for name in args.backends.split(",")
+    ]
+
+    print(
+        f"{'backend':<10}{'load ms':>10}{'RTF':>8}{'p50 ms':>10}"
+        f"{'p95 ms':>10}{'WER':>8}{'failed':>8}"
+    )
+    for result in results:
+        if "error" in result:
+            print(f"{result['name']:<10}  not available: {result['error']}")
+            continue
+        rtf = f"{result['rtf']:.3f}" if result["rtf"] is not None else "-"
+        wer = f"{result['wer']:.1%}" if result["wer"] is not None else "-"
+        print(
+            f"{result['name']:<10}{result['load'] * 1000:>10.0f}{rtf:>8}"
+            f"{result['p50'] * 1000:>10.0f}{result['p95'] * 1000:>10.0f}"
+            f"{wer:>8}{result['failures']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import tkinter as tk
+from threading import Lock
+
+
+class ChatRenderBuffer:
+    """Coalesces streamed text into a tk.Text widget at a fixed frame rate.
+
+    Worker threads call write() as often as they like; the Tk loop flushes
+    whatever has arrived once per frame with one insert per run of same-tag
+    text and at most one see() call, instead of one of each per token.
+    """
+
+    def __init__(self, root, text_widget, fps=30):
+        self.root = root
+        self.text_widget = text_widget
+        self.frame_ms = max(1, int(1000 / fps))
+        self.lock = Lock()
+        self.pending = []  # (text, tag) pieces waiting for the next frame
+
+        self.writes = 0
+        self.inserts = 0
+        self.see_calls = 0
+        self.see_skipped = 0
+
+        self.root.after(self.frame_ms, self.tick)
+
+    def write(self, text, tag=None):
+        # Safe to call from any thread
+        if text:
+            with self.lock:
+                self.pending.append((text, tag))
+                self.writes += 1
+
+    def tick(self):
+        self.flush()
+        self.root.after(self.frame_ms, self.tick)
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, []
+        if not pending:
+            return
+
+        # Only follow the output if the user has not scrolled up to read
+        at_bottom = self.text_widget.yview()[1] >= 0.999
+
+        # Merge consecutive pieces that share a tag into a single insert
+        runs = []
+        for text, tag in pending:
+            if runs and runs[-1][1] == tag:
+                runs[-1][0].append(text)
+            else:
+                runs.append(([text], tag))
+        for texts, tag in runs:
+            self.text_widget.insert(tk.END, "".join(texts), tag)
+            self.inserts += 1
+
+        if at_bottom:
+            self.text_widget.see(tk.END)
+            self.see_calls += 1
+        else:
+            self.see_skipped += 1
+
+    @property
+    def inserts_avoided(self):
+        return self.writes - self.inserts
+
+    def stats(self):
+        return {
+            "writes": self.writes,
+            "inserts": self.inserts,
+            "inserts_avoided": self.inserts_avoided,
+            "see_calls": self.see_calls,
+            "see_skipped": self.see_skipped,
+        }
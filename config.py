@@ -0,0 +1,107 @@
+import json
+import os
+
+# Optional JSON file with per-deployment overrides of the defaults below
+CONFIG_FILENAME = "config.json"
+
+DEFAULTS = {
+    # Also write every recording to temp_recording.wav (debugging only)
+    "save_debug_wav": False,
+    # One of audio_capture.CAPTURE_PROFILES
+    "capture_profile": "direct_16k",
+    # Keep the microphone stream running between recordings so capture starts
+    # at once; when false it is stopped and restarted for each recording
+    "audio_keep_warm": True,
+    # Frames PortAudio delivers per callback; smaller means lower latency but
+    # more wakeups, raise it on slow machines that report overflows
+    "audio_frames_per_buffer": 1024,
+    # End the turn automatically after this much silence following speech
+    "vad_enabled": True,
+    "vad_silence_gap_ms": 1200,
+    "vad_min_speech_ms": 250,
+    "vad_hangover_ms": 300,
+    # Speech-to-text engine, one of stt_backends.STT_BACKENDS
+    "stt_backend": "google",
+    # Used when the main backend cannot be reached, e.g. "sphinx" or "vosk"
+    "stt_fallback_backend": None,
+    "fake_stt_transcript": "hello I would like to practice my english",
+    # Ollama chat API, shared by every request through one pooled session
+    "ollama_endpoint": "http://localhost:11434/api/chat",
+    "ollama_connect_timeout": 3.05,
+    "ollama_read_timeout": 120,
+    "ollama_pool_size": 4,
+    # Model to chat with; None keeps each app's default (mistral / llama3.2)
+    "ollama_model": None,
+    # Sent with every request so Ollama keeps the model loaded between turns
+    "ollama_keep_alive": "30m",
+    # Prompt token budget per model for the conversation history; older
+    # turns beyond it are folded into a running summary
+    "history_token_budget": {"default": 2048, "mistral": 3072, "llama3.2": 3072},
+    # Scenario openers generated ahead of time and served instantly
+    "opener_cache_enabled": True,
+    "opener_cache_path": "opener_cache.json",
+    "opener_variants": 3,
+    "opener_cache_ttl_hours": 168,
+    "opener_cache_max_entries": 64,
+    "opener_workers": 2,
+    # Synthesized speech reused across turns and runs, capped on disk and in
+    # memory with least recently used eviction
+    "tts_cache_enabled": True,
+    "tts_cache_dir": "tts_cache",
+    "tts_cache_max_mb": 64,
+    "tts_cache_memory_mb": 8,
+    # Let the learner interrupt the tutor by starting to speak
+    "barge_in_enabled": True,
+    "barge_in_margin_db": 15.0,
+    "barge_in_min_speech_ms": 60,
+    # Commands the pyttsx3 worker holds before speak() waits for room
+    "tts_queue_size": 8,
+    # Print the pyttsx3 worker's synthesis time and queue depth (and the TTS
+    # cache hit rate) after every utterance
+    "tts_log_utterances": False,
+    # pyttsx3 voice chosen on the first launch, reused to skip enumerating
+    # every installed voice at startup; None always enumerates
+    "voice_cache_path": "voice_cache.json",
+    # Audio buffered before a streamed edge-tts sentence starts playing
+    "tts_stream_start_ms": 300,
+    # How often streamed reply text is flushed into the chat window
+    "chat_render_fps": 30,
+    # Transcribe while recording: None (off), "vosk" or "fake"
+    "streaming_stt_engine": None,
+    "vosk_model_path": "model",
+    # How long to wait for the streaming transcript once recording stops
+    "streaming_final_timeout_ms": 1500,
+    # Latency points of every turn, appended as JSONL and rotated by size;
+    # None turns the log off. The stats panel covers the last
+    # trace_stats_window turns
+    "trace_log_path": "turn_traces.jsonl",
+    "trace_log_max_mb": 5,
+    "trace_log_backups": 3,
+    "trace_stats_window": 50,
+    # tutor_server.py: where it listens and its TTS engine ("edge",
+    # "pyttsx3" or None for text only)
+    "server_host": "127.0.0.1",
+    "server_port": 8765,
+    "server_tts": "edge",
+    # Sessions kept at once; one without a connection is dropped after this
+    # long idle
+    "server_max_sessions": 500,
+    "server_session_idle_minutes": 30,
+    # Turns allowed in each stage at once, across all sessions
+    "server_stt_concurrency": 2,
+    "server_llm_concurrency": 4,
+    "server_tts_concurrency": 4,
+    # Longest recording accepted for one turn
+    "server_max_audio_seconds": 60,
+}
+
+
+def load_config(path=CONFIG_FILENAME):
+    config = dict(DEFAULTS)
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                config.update(json.load(f))
+        except (OSError, ValueError) as e:
+            print(f"Error reading {path}: {str(e)}")
+    return config
@@ -0,0 +1,370 @@
+import json
+import time
+
+import requests
+
+from edge_speech import EdgeSynthesizer
+from history_manager import (
+    ConversationHistory,
+    describe_prompt,
+    ollama_summarizer,
+    token_budget_for,
+)
+from model_manager import ModelManager
+from ollama_client import OllamaClient
+from opener_cache import OpenerCache
+from pyttsx3_tts import Pyttsx3Worker
+from stt_backends import SpeechToText
+from tts_cache import TTSCache
+
+TTS_ENGINES = ("pyttsx3", "edge")
+
+
+def create_tts(name, config):
+    """The synthesizer for a TTS engine name, or None for no speech."""
+    if not name:
+        return None
+    cache = None
+    if config["tts_cache_enabled"]:
+        cache = TTSCache.from_config(config)
+    if name == "pyttsx3":
+        # One worker thread owns the pyttsx3 engine, everything else queues
+        # commands for it
+        return Pyttsx3Worker(
+            cache=cache,
+            max_queue=config["tts_queue_size"],
+            voice_cache_path=config["voice_cache_path"],
+            log_utterances=config["tts_log_utterances"],
+        )
+    if name == "edge":
+        return EdgeSynthesizer(cache=cache)
+    raise ValueError(f"Unknown TTS engine {name!r}, expected one of {TTS_ENGINES}")
+
+
+class TranscriptionError(Exception):
+    """No text could be taken from a recording; the message is user-facing."""
+
+
+class TurnResult:
+    """What one turn produced: transcript, reply, audio and stage timings."""
+
+    def __init__(self, transcript=None):
+        self.transcript = transcript
+        self.reply = None
+        self.error = None
+        self.audio = None
+        self.audio_format = None
+        self.timings = {}  # stage -> milliseconds
+
+    def as_dict(self):
+        return {
+            "transcript": self.transcript,
+            "reply": self.reply,
+            "error": self.error,
+            "audio_bytes": len(self.audio) if self.audio else 0,
+            "audio_format": self.audio_format,
+            "timings": {name: round(ms, 1) for name, ms in self.timings.items()},
+        }
+
+
+class ConversationEngine:
+    """One learner's conversation with the tutor, without any user interface.
+
+    Owns the scenario table, the token-budgeted history, the recognizer,
+    the model and the TTS synthesizer. A turn goes in as recorded audio (a
+    CapturedAudio) or typed text and comes back as the reply text and, with
+    a synthesizer, its audio. Front ends only capture, display and play:
+    the Tk apps and tutor_cli.py are thin clients of this class.
+
+    The pieces that are expensive to create (recognizer, model client,
+    synthesizer) are passed in, so several engines can share them. With a
+    turn_trace.TurnTracer the STT and LLM points of each turn are marked on
+    it; the front end marks recording, TTS and playback.
+    """
+
+    def __init__(
+        self,
+        models,
+        scenarios,
+        stt=None,
+        tts=None,
+        opener_cache=None,
+        token_budget=2048,
+        tracer=None,
+    ):
+        self.models = models
+        self.scenarios = scenarios
+        self.stt = stt
+        self.tts = tts
+        self.opener_cache = opener_cache
+        self.tracer = tracer
+        self.scenario = None
+        self.last_error = None
+        self.last_response = None
+
+        # Kept within the model's token budget, older turns are summarized
+        self.history = ConversationHistory(
+            token_budget, summarize=ollama_summarizer(models)
+        )
+
+    @classmethod
+    def from_config(
+        cls,
+        config,
+        scenarios,
+        default_model,
+        tts=None,
+        warm_stt=True,
+        ollama=None,
+        tracer=None,
+    ):
+        # One pooled keep-alive session for all requests
+        ollama = ollama or OllamaClient.from_config(config)
+        models = ModelManager.from_config(ollama, config, default_model=default_model)
+        opener_cache = None
+        if config["opener_cache_enabled"]:
+            opener_cache = OpenerCache.from_config(models, config)
+        return cls(
+            models,
+            scenarios,
+            stt=SpeechToText(config, warm=warm_stt),
+            tts=create_tts(tts, config),
+            opener_cache=opener_cache,
+            token_budget=token_budget_for(config, models.model),
+            tracer=tracer,
+        )
+
+    def warm_up(self):
+        # Load the model and generate scenario openers in the background
+        self.models.warm_up()
+        if self.opener_cache:
+            self.opener_cache.pregenerate_async(self.scenarios)
+
+    def start_scenario(self, scenario):
+        """Begin a new conversation; returns a cached opener or None.
+
+        Without a cached opener the caller asks respond() for one with the
+        scenario's initial_prompt.
+        """
+        self.scenario = scenario
+        self.last_response = None
+        system_prompt = self.scenarios[scenario]["system_prompt"]
+        initial_prompt = self.scenarios[scenario]["initial_prompt"]
+
+        # The system prompt and opener stay pinned in every request
+        self.history.start_scenario(system_prompt)
+
+        opener = None
+        if self.opener_cache:
+            opener = self.opener_cache.get(system_prompt, initial_prompt)
+        if opener:
+            self.history.add_user(initial_prompt)
+            self.history.add_assistant(opener)
+        return opener
+
+    def peek_opener(self, scenario):
+        # The opener start_scenario() will serve next, if one is cached
+        if not self.opener_cache:
+            return None
+        return self.opener_cache.peek(
+            self.scenarios[scenario]["system_prompt"],
+            self.scenarios[scenario]["initial_prompt"],
+        )
+
+    def mark(self, point):
+        if self.tracer is not None:
+            self.tracer.mark(point)
+
+    def transcribe(self, captured):
+        import speech_recognition as sr
+
+        if captured is None or captured.is_empty():
+            raise TranscriptionError("No speech detected")
+        # stt_start/stt_end are marked by the caller, whose STT stage may
+        # also wait for a streaming transcript first
+        try:
+            return self.stt.transcribe(captured)
+        except sr.UnknownValueError:
+            raise TranscriptionError("Could not understand audio") from None
+        except sr.RequestError:
+            raise TranscriptionError("Could not request results") from None
+
+    def respond(self, user_message, on_token=None, interrupted=None):
+        """Ask the model for the tutor's reply to user_message.
+
+        With on_token the reply is streamed and on_token(text) is called
+        for every chunk as it arrives; interrupted() returning True stops
+        reading the stream early. Failures come back as an error message in
+        place of the reply, also kept in last_error.
+        """
+        self.last_error = None
+        self.last_response = None
+        try:
+            # Add user message to conversation history
+            self.history.add_user(user_message)
+            messages = self.history.messages()
+
+            # Make the request to Ollama
+            stream = on_token is not None
+            payload = self.models.payload(messages, stream=stream)
+            request_start = time.perf_counter()
+            self.mark("llm_sent")
+            response = self.models.client.chat(payload, stream=stream)
+            print(self.models.client.describe_last_request())
+
+            if response.status_code != 200:
+                response.close()
+                self.last_error = (
+                    f"Error: Received status code {response.status_code} from Ollama"
+                )
+                return self.last_error
+
+            if stream:
+                ai_message = self.read_stream(
+                    response, request_start, on_token, interrupted
+                )
+            else:
+                ai_message = self.read_reply(response, request_start)
+            print(describe_prompt(messages, self.last_response["prompt_eval_count"]))
+
+            # Add AI response to conversation history
+            self.history.add_assistant(ai_message)
+            return ai_message
+
+        except requests.exceptions.ConnectionError:
+            self.last_error = "Error: Could not connect to Ollama. Make sure Ollama is running on localhost:11434"
+        except requests.exceptions.Timeout:
+            self.last_error = "Error: Ollama did not respond in time"
+        except Exception as e:
+            self.last_error = f"Error getting AI response: {str(e)}"
+        return self.last_error
+
+    def read_reply(self, response, request_start):
+        response_data = response.json()
+        reply_seconds = time.perf_counter() - request_start
+        self.mark("first_token")
+        self.mark("last_token")
+
+        # Without streaming the first token arrives with the whole reply
+        self.models.record_response(reply_seconds, response_data.get("load_duration"))
+        self.last_response = {
+            "first_token_ms": reply_seconds * 1000,
+            "reply_ms": reply_seconds * 1000,
+            "prompt_eval_count": response_data.get("prompt_eval_count"),
+        }
+        return response_data["message"]["content"]
+
+    def read_stream(self, response, request_start, on_token, interrupted):
+        ai_message = ""
+        prompt_eval_count = None
+        load_duration = None
+        first_token_seconds = None
+        try:
+            for chunk in response.iter_lines():
+                # The learner cut in, the rest of the reply is not needed
+                if interrupted and interrupted():
+                    break
+                if not chunk:
+                    continue
+                chunk_data = json.loads(chunk.decode("utf-8"))
+
+                # The final chunk carries the prompt token count
+                if chunk_data.get("done"):
+                    prompt_eval_count = chunk_data.get("prompt_eval_count")
+                    load_duration = chunk_data.get("load_duration")
+                if "message" in chunk_data and "content" in chunk_data["message"]:
+                    new_content = chunk_data["message"]["content"]
+                    if first_token_seconds is None:
+                        first_token_seconds = time.perf_counter() - request_start
+                        self.mark("first_token")
+                    ai_message += new_content
+                    on_token(new_content)
+        finally:
+            # Hand the connection back to the pool
+            response.close()
+        self.mark("last_token")
+
+        if first_token_seconds is not None:
+            self.models.record_response(first_token_seconds, load_duration)
+        self.last_response = {
+            "first_token_ms": (
+                first_token_seconds * 1000 if first_token_seconds is not None else None
+            ),
+            "reply_ms": (time.perf_counter() - request_start) * 1000,
+            "prompt_eval_count": prompt_eval_count,
+        }
+        return ai_message
+
+    def synthesize(self, text):
+        """The reply's audio in the synthesizer's audio_format, or None."""
+        if self.tts is None or not text:
+            return None
+        return self.tts.synthesize(text)
+
+    def mark_partially_heard(self, heard):
+        self.history.mark_partially_heard(heard)
+
+    def open_scenario(self, scenario, speak=True):
+        """start_scenario() plus the opener's text and audio as a TurnResult."""
+        result = TurnResult()
+        start = time.perf_counter()
+        opener = self.start_scenario(scenario)
+        if opener is None:
+            opener = self.respond(self.scenarios[scenario]["initial_prompt"])
+            result.error = self.last_error
+        result.reply = opener
+        self.add_reply_timings(result, start)
+        if speak:
+            self.add_audio(result)
+        return result
+
+    def take_turn(self, audio=None, text=None, speak=True):
+        """Run one learner turn from recorded audio or typed text.
+
+        Returns a TurnResult; when the recording yields no text its error is
+        set and there is no reply.
+        """
+        result = TurnResult(text)
+        if audio is not None:
+            start = time.perf_counter()
+            try:
+                result.transcript = self.transcribe(audio)
+            except TranscriptionError as e:
+                result.error = str(e)
+            result.timings["stt"] = (time.perf_counter() - start) * 1000
+            if result.error:
+                return result
+
+        start = time.perf_counter()
+        result.reply = self.respond(result.transcript)
+        result.error = self.last_error
+        self.add_reply_timings(result, start)
+        if speak:
+            self.add_audio(result)
+        return result
+
+    def add_reply_timings(self, result, start):
+        result.timings["llm"] = (time.perf_counter() - start) * 1000
+        # Only requests that reached the model have a first token (a cached
+        # opener makes none)
+        if result.error is None and self.last_response is not None:
+            if self.last_response["first_token_ms"] is not None:
+                result.timings["first_token"] = self.last_response["first_token_ms"]
+
+    def add_audio(self, result):
+        if self.tts is None:
+            return
+        start = time.perf_counter()
+        try:
+            result.audio = self.synthesize(result.reply)
+            result.audio_format = self.tts.audio_format
+        except Exception as e:
+            print(f"TTS error: {str(e)}")
+        result.timings["tts"] = (time.perf_counter() - start) * 1000
+
+    def close(self):
+        if self.tts is not None:
+            self.tts.close()
+        if self.opener_cache is not None:
+            self.opener_cache.close()
+        self.models.client.close()
@@ -0,0 +1,56 @@
+import asyncio
+import time
+
+from tts_cache import speech_key
+
+EDGE_VOICE = "en-US-JennyNeural"
+
+
+class EdgeSynthesizer:
+    """edge-tts speech as MP3, through the TTS cache when one is given.
+
+    stream() yields the MP3 chunks as they arrive, for playback that starts
+    before the sentence is complete; synthesize() returns the whole clip.
+    edge_tts is imported on first use.
+    """
+
+    audio_format = "mp3"
+
+    def __init__(self, voice=EDGE_VOICE, cache=None):
+        self.voice = voice
+        self.cache = cache
+
+    async def stream(self, text):
+        import edge_tts
+
+        key = speech_key("edge-tts", self.voice, "+0%", "+0%", text)
+        if self.cache:
+            audio = self.cache.get(key)
+            if audio is not None:
+                yield audio
+                return
+
+        # Pass the MP3 chunks on as they arrive so playback can start early
+        start = time.perf_counter()
+        communicate = edge_tts.Communicate(text, voice=self.voice)
+        audio = bytearray()
+        async for chunk in communicate.stream():
+            if chunk["type"] == "audio":
+                audio.extend(chunk["data"])
+                yield chunk["data"]
+
+        if self.cache:
+            self.cache.put(key, bytes(audio), (time.perf_counter() - start) * 1000)
+
+    async def collect(self, text):
+        audio = bytearray()
+        async for chunk in self.stream(text):
+            audio.extend(chunk)
+        return bytes(audio)
+
+    def synthesize(self, text):
+        # For callers without an event loop of their own
+        return asyncio.run(self.collect(text))
+
+    def close(self):
+        pass
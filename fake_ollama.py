@@ -0,0 +1,285 @@
+"""Local stand-in for Ollama's /api/chat, for benchmarks and offline runs.
+
+Answers every chat request with a canned reply at a set pace: the first
+token after --first-token-ms, then --token-rate tokens per second (0 sends
+them as fast as possible), --chunk-tokens tokens per NDJSON line when the
+request streams. A share of requests (--error-rate) fails on purpose,
+either with an HTTP 500 or by dropping the connection halfway through the
+reply (--error-mode). Point ollama_endpoint at it to run the apps without a
+model:
+
+    python fake_ollama.py [--port 11435] [--token-rate 40] [--first-token-ms 300]
+        [--chunk-tokens 1] [--reply-tokens 60] [--error-rate 0.1]
+        [--error-mode status|disconnect]
+"""
+
+import argparse
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Condition, Thread
+
+ERROR_MODES = ("status", "disconnect")
+
+# Cycled through to build replies of any length; tokens carry their spaces
+# the way Ollama's do
+REPLY_TEXT = (
+    "That sounds great! What do you usually do on the weekend? "
+    "I like to go for a walk in the park and then have coffee with friends. "
+    "Do you have any plans for this Saturday, or will you stay at home? "
+)
+
+
+def canned_tokens(count):
+    words = REPLY_TEXT.split(" ")[:-1]
+    return [
+        (" " if index else "") + words[index % len(words)] for index in range(count)
+    ]
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    # Keep-alive, like Ollama, so the client's pooled connections are reused
+    protocol_version = "HTTP/1.1"
+    # TCP_NODELAY, like Ollama: otherwise a reply written as headers then
+    # body waits out the client's delayed ACK (~40 ms)
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        fake = self.server.fake
+        received = time.perf_counter()
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path != "/api/chat":
+            self.send_json(404, {"error": f"unknown endpoint {self.path}"})
+            return
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            self.send_json(400, {"error": "invalid JSON"})
+            return
+
+        record = {
+            "stream": payload.get("stream", True),
+            "tokens": 0,
+            "error": None,
+            "first_chunk_s": None,
+        }
+        error = fake.pick_error()
+        try:
+            if error == "status":
+                record["error"] = error
+                self.send_json(500, {"error": "injected failure"})
+            elif record["stream"]:
+                self.stream_reply(fake, payload, received, record, error)
+            else:
+                self.send_reply(fake, payload, received, record, error)
+        finally:
+            record["handled_s"] = time.perf_counter() - received
+            fake.record(record)
+
+    def stream_reply(self, fake, payload, received, record, error):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        tokens = fake.tokens_for(payload)
+        chunks = [
+            tokens[start : start + fake.chunk_tokens]
+            for start in range(0, len(tokens), fake.chunk_tokens)
+        ]
+        sent = 0
+        for index, chunk in enumerate(chunks):
+            # Paced from the request's arrival, so slow writes do not add up
+            fake.wait_for_token(received, sent)
+            if error == "disconnect" and index >= len(chunks) // 2:
+                record["error"] = error
+                self.close_connection = True
+                return
+            self.write_chunk(fake.message(payload, "".join(chunk), done=False))
+            if record["first_chunk_s"] is None:
+                record["first_chunk_s"] = time.perf_counter() - received
+            sent += len(chunk)
+        final = fake.message(payload, "", done=True)
+        final.update(fake.durations(received, len(tokens)))
+        self.write_chunk(final)
+        self.wfile.write(b"0\r\n\r\n")
+        record["tokens"] = len(tokens)
+
+    def send_reply(self, fake, payload, received, record, error):
+        tokens = fake.tokens_for(payload)
+        fake.wait_for_token(received, max(len(tokens) - 1, 0))
+        if error == "disconnect":
+            record["error"] = error
+            self.close_connection = True
+            return
+        reply = fake.message(payload, "".join(tokens), done=True)
+        reply.update(fake.durations(received, len(tokens)))
+        self.send_json(200, reply)
+        record["first_chunk_s"] = time.perf_counter() - received
+        record["tokens"] = len(tokens)
+
+    def write_chunk(self, data):
+        line = json.dumps(data).encode("utf-8") + b"\n"
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakeOllamaServer:
+    """A fake Ollama chat endpoint served from a background thread.
+
+    Every handled request is recorded (tokens sent, injected error, seconds
+    to the first chunk and in total) so a benchmark can take the server's
+    own time out of what the client measured. port=0 picks a free port;
+    endpoint is the URL to give OllamaClient.
+    """
+
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=0,
+        token_rate=0.0,
+        first_token_ms=0.0,
+        chunk_tokens=1,
+        reply_tokens=60,
+        error_rate=0.0,
+        error_mode="status",
+        seed=0,
+    ):
+        if error_mode not in ERROR_MODES:
+            raise ValueError(
+                f"Unknown error mode {error_mode!r}, expected one of {ERROR_MODES}"
+            )
+        self.host = host
+        self.port = port
+        self.token_rate = token_rate
+        self.first_token_ms = first_token_ms
+        self.chunk_tokens = max(1, chunk_tokens)
+        self.reply_tokens = reply_tokens
+        self.error_rate = error_rate
+        self.error_mode = error_mode
+        self.random = random.Random(seed)
+        self.lock = Condition()
+        self.records = []
+        self.httpd = None
+        self.thread = None
+
+    @property
+    def endpoint(self):
+        return f"http://{self.host}:{self.port}/api/chat"
+
+    def start(self):
+        self.httpd = ThreadingHTTPServer((self.host, self.port), FakeOllamaHandler)
+        self.httpd.fake = self
+        self.port = self.httpd.server_address[1]
+        self.thread = Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+    def pick_error(self):
+        with self.lock:
+            if self.error_rate and self.random.random() < self.error_rate:
+                return self.error_mode
+        return None
+
+    def tokens_for(self, payload):
+        # A request without messages only loads the model, like Ollama's
+        return canned_tokens(self.reply_tokens if payload.get("messages") else 0)
+
+    def wait_for_token(self, received, index):
+        # Token `index` (0 = the first) is due at this offset from arrival
+        due = self.first_token_ms / 1000
+        if self.token_rate:
+            due += index / self.token_rate
+        delay = received + due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+    def message(self, payload, content, done):
+        data = {
+            "model": payload.get("model", "fake"),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "message": {"role": "assistant", "content": content},
+            "done": done,
+        }
+        if done:
+            data["done_reason"] = "stop"
+        return data
+
+    def durations(self, received, tokens):
+        total_ns = int((time.perf_counter() - received) * 1e9)
+        return {
+            "total_duration": total_ns,
+            "load_duration": 0,
+            "prompt_eval_count": 12,
+            "prompt_eval_duration": int(self.first_token_ms * 1e6),
+            "eval_count": tokens,
+            "eval_duration": max(total_ns - int(self.first_token_ms * 1e6), 0),
+        }
+
+    def record(self, record):
+        with self.lock:
+            self.records.append(record)
+            self.lock.notify_all()
+
+    def take_records(self, count=0, timeout=1.0):
+        """The requests handled since the last call, oldest first.
+
+        Waits up to timeout for at least count of them: the client can be
+        done reading a reply just before its handler has finished.
+        """
+        with self.lock:
+            self.lock.wait_for(lambda: len(self.records) >= count, timeout)
+            records, self.records = self.records, []
+        return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--token-rate", type=float, default=40.0, help="tokens/s")
+    parser.add_argument("--first-token-ms", type=float, default=300.0)
+    parser.add_argument("--chunk-tokens", type=int, default=1)
+    parser.add_argument("--reply-tokens", type=int, default=60)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-mode", choices=ERROR_MODES, default="status")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = FakeOllamaServer(
+        args.host,
+        args.port,
+        token_rate=args.token_rate,
+        first_token_ms=args.first_token_ms,
+        chunk_tokens=args.chunk_tokens,
+        reply_tokens=args.reply_tokens,
+        error_rate=args.error_rate,
+        error_mode=args.error_mode,
+        seed=args.seed,
+    ).start()
+    print(f"Fake Ollama listening on {server.endpoint}")
+    try:
+        server.thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
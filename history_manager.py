@@ -0,0 +1,233 @@
+from threading import Lock, Thread
+
+# Rough token estimate for budgeting (about four characters per token for
+# English) plus a few tokens of chat-template overhead per message
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD = 4
+
+
+def estimate_tokens(messages):
+    return sum(
+        len(message["content"]) // CHARS_PER_TOKEN + MESSAGE_OVERHEAD
+        for message in messages
+    )
+
+
+def token_budget_for(config, model):
+    budgets = config["history_token_budget"]
+    return budgets.get(model, budgets["default"])
+
+
+class ConversationHistory:
+    """Token-budgeted chat history for one conversation.
+
+    The scenario's system prompt and the opening exchange are pinned and
+    always sent. Recent turns are kept whole while they fit the budget;
+    older ones are folded into a running summary that the summarize
+    callable produces on a background thread, so the prompt size stays flat
+    however long the session runs. Turns waiting for the summarizer are
+    still sent whole; while it keeps failing, the oldest of them beyond
+    pending_share of the budget are dropped.
+    """
+
+    def __init__(
+        self, token_budget=2048, summarize=None, summary_share=0.2, pending_share=0.5
+    ):
+        self.token_budget = token_budget
+        self.summarize = summarize  # summarize(previous_summary, turns) -> text
+        self.summary_budget = int(token_budget * summary_share)
+        self.pending_budget = int(token_budget * pending_share)
+        self.lock = Lock()
+        self.generation = 0
+        self.summarizing = False
+        self.start_scenario()
+
+    def start_scenario(self, system_prompt=None):
+        with self.lock:
+            # Bumping the generation discards summaries still running for
+            # the previous conversation
+            self.generation += 1
+            self.pinned = []
+            if system_prompt:
+                self.pinned.append({"role": "system", "content": system_prompt})
+            self.pin_opening = True
+            self.turns = []  # [user message, assistant message] pairs
+            self.summary = ""
+            self.to_summarize = []
+            self.summarizing_turns = []
+
+    def add_user(self, content):
+        with self.lock:
+            # The request for the previous user message failed and the model
+            # never answered it; drop it so the roles keep alternating
+            if self.turns and self.turns[-1][-1]["role"] == "user":
+                self.turns.pop()
+                # Before the opening is pinned that was the opener prompt,
+                # and the next exchange is not an opening to pin
+                self.pin_opening = False
+            self.turns.append([{"role": "user", "content": content}])
+
+    def add_assistant(self, content):
+        with self.lock:
+            message = {"role": "assistant", "content": content}
+            if self.turns and self.turns[-1][-1]["role"] == "user":
+                self.turns[-1].append(message)
+            else:
+                self.turns.append([message])
+
+            # The scenario opener stays in every prompt
+            if self.pin_opening:
+                self.pin_opening = False
+                self.pinned.extend(self.turns.pop())
+            self.fold_overflow()
+
+    def mark_partially_heard(self, heard):
+        """Record that the learner cut the last reply off after hearing heard."""
+        with self.lock:
+            replies = [
+                message
+                for message in self.pinned + [m for turn in self.turns for m in turn]
+                if message["role"] == "assistant"
+            ]
+            if not replies:
+                return
+            # Tell the model what the learner actually heard of its reply
+            if heard:
+                note = "[The learner interrupted here and did not hear the rest.]"
+                replies[-1]["content"] = f"{heard} {note}"
+            else:
+                replies[-1]["content"] = (
+                    "[The learner interrupted before hearing this reply.]"
+                )
+
+    def __len__(self):
+        with self.lock:
+            return len(self.pinned) + sum(len(turn) for turn in self.unsummarized())
+
+    def messages(self):
+        with self.lock:
+            messages = list(self.pinned)
+            if self.summary:
+                messages.append(
+                    {
+                        "role": "system",
+                        "content": "Summary of the earlier conversation: "
+                        + self.summary,
+                    }
+                )
+            for turn in self.unsummarized():
+                messages.extend(turn)
+            return messages
+
+    def unsummarized(self):
+        # Called with the lock held: every turn not in the summary yet, oldest
+        # first, including those the summarizer is working on
+        return self.summarizing_turns + self.to_summarize + self.turns
+
+    def fold_overflow(self):
+        # Keep the newest whole turns that fit; everything older is summarized
+        available = self.token_budget - estimate_tokens(self.pinned)
+        available -= self.summary_budget
+        kept = []
+        used = 0
+        for turn in reversed(self.turns):
+            cost = estimate_tokens(turn)
+            if kept and used + cost > available:
+                break
+            kept.insert(0, turn)
+            used += cost
+
+        overflow = self.turns[: len(self.turns) - len(kept)]
+        if overflow:
+            self.turns = kept
+            self.to_summarize.extend(overflow)
+            self.cap_pending()
+            self.start_summary()
+
+    def cap_pending(self):
+        # Called with the lock held. Turns waiting for a summary pile up
+        # while the summarizer fails; past pending_budget the oldest go
+        def pending_tokens():
+            turns = self.summarizing_turns + self.to_summarize
+            return estimate_tokens([message for turn in turns for message in turn])
+
+        dropped = 0
+        while self.to_summarize and pending_tokens() > self.pending_budget:
+            self.to_summarize.pop(0)
+            dropped += 1
+        if dropped:
+            print(f"Dropped {dropped} turns from the history, not summarized")
+
+    def start_summary(self):
+        # Called with the lock held
+        if self.summarize is None:
+            self.to_summarize = []
+            return
+        if self.summarizing or not self.to_summarize:
+            return
+        batch, self.to_summarize = self.to_summarize, []
+        self.summarizing = True
+        self.summarizing_turns = batch
+        Thread(
+            target=self.run_summary,
+            args=(self.generation, self.summary, batch),
+            daemon=True,
+        ).start()
+
+    def run_summary(self, generation, previous_summary, batch):
+        try:
+            summary = self.summarize(previous_summary, batch)
+        except Exception as e:
+            print(f"Error summarizing conversation history: {str(e)}")
+            summary = None
+
+        with self.lock:
+            self.summarizing = False
+            if generation != self.generation:
+                # Turns the new conversation queued meanwhile had to wait
+                # for this one to finish
+                self.start_summary()
+                return
+            self.summarizing_turns = []
+            if summary:
+                max_chars = self.summary_budget * CHARS_PER_TOKEN
+                self.summary = summary[:max_chars]
+                self.start_summary()
+            else:
+                # Try again together with the next batch
+                self.to_summarize = batch + self.to_summarize
+                self.cap_pending()
+
+
+def ollama_summarizer(models):
+    """Build a summarize callable that asks the model through the shared client."""
+
+    def summarize(previous_summary, turns):
+        transcript = "\n".join(
+            f"{message['role']}: {message['content']}"
+            for turn in turns
+            for message in turn
+        )
+        prompt = (
+            "Summarize this English practice conversation in at most five "
+            "short sentences. Keep names, facts the learner shared and "
+            "mistakes worth revisiting.\n\n"
+        )
+        if previous_summary:
+            prompt += f"Summary so far: {previous_summary}\n\n"
+        prompt += f"New turns:\n{transcript}"
+
+        response = models.client.chat(
+            models.payload([{"role": "user", "content": prompt}], stream=False)
+        )
+        response.raise_for_status()
+        return response.json()["message"]["content"].strip()
+
+    return summarize
+
+
+def describe_prompt(messages, prompt_eval_count=None):
+    text = f"Prompt: {len(messages)} messages, ~{estimate_tokens(messages)} tokens"
+    if prompt_eval_count is not None:
+        text += f", {prompt_eval_count} evaluated by Ollama"
+    return text
@@ -0,0 +1,46 @@
+import tkinter as tk
+from tkinter import ttk
+
+# Panel labels for the stages of turn_trace.STAGE_SPANS
+STAGE_LABELS = {
+    "stt": "Speech to text",
+    "first_token": "AI first token",
+    "llm": "AI full reply",
+    "tts_first_audio": "TTS first audio",
+    "playback": "Playback",
+    "response": "Stop -> first audio",
+}
+
+
+class LatencyPanel:
+    """Rolling p50/p95 per turn stage, from a turn_trace.LatencyStats.
+
+    refresh() must run on the Tk loop; worker threads call schedule_refresh().
+    """
+
+    def __init__(self, root, parent, stats):
+        self.root = root
+        self.stats = stats
+        self.frame = ttk.LabelFrame(
+            parent, text=f"Latency (last {stats.window} turns)", padding="5"
+        )
+        self.text = tk.StringVar()
+        ttk.Label(
+            self.frame, textvariable=self.text, font="TkFixedFont", justify="left"
+        ).pack(anchor="w")
+        self.refresh()
+
+    def schedule_refresh(self, *_):
+        self.root.after(0, self.refresh)
+
+    def refresh(self):
+        lines = [f"{'stage':<20}{'p50':>8}{'p95':>8}{'turns':>7}"]
+        for stage, summary in self.stats.summary().items():
+            label = STAGE_LABELS.get(stage, stage)
+            if summary is None:
+                lines.append(f"{label:<20}{'-':>8}{'-':>8}{0:>7}")
+                continue
+            p50, p95, turns = summary
+            lines.append(f"{label:<20}{p50:>6.0f}ms{p95:>6.0f}ms{turns:>7}")
+        self.text.set("\n".join(lines))
+
@@ -1,11 +1,20 @@
+import argparse
 import tkinter as tk
 from tkinter import ttk
-import speech_recognition as sr
-import pyttsx3
-import pyaudio
-import wave
 from threading import Thread
-import requests  # Added for Ollama API calls
+import time
+
+from audio_device import AudioDeviceManager
+from barge_in import BargeInMonitor
+from config import load_config
+from conversation_engine import ConversationEngine, TranscriptionError
+from latency_panel import LatencyPanel
+from scenarios import SCENARIOS
+from startup_profile import PROFILE
+from streaming_stt import create_streaming_recognizer
+from turn_pipeline import STAGE_STATUS, TurnPipeline
+from turn_recorder import TurnRecorder
+from turn_trace import TurnTracer
 
 
 class EnglishPracticeApp:
@@ -13,26 +22,54 @@ class EnglishPracticeApp:
         self.root = root
         self.root.title("English Speaking Practice with AI")
         self.root.geometry("800x600")
-        self.scenarios = {}
+        self.config = load_config()
+        self.setup_scenarios()
 
-        # Initialize Ollama endpoint
-        self.ollama_endpoint = "http://localhost:11434/api/chat"
+        # Per-turn latency points, logged as JSONL and summed up in the
+        # latency panel
+        self.tracer = TurnTracer.from_config(self.config, "main.py")
+
+        # History, recognizer, model and TTS live in the engine; this window
+        # only records, displays and plays
+        self.engine = ConversationEngine.from_config(
+            self.config,
+            self.scenarios,
+            default_model="mistral",
+            tts="pyttsx3",
+            warm_stt=False,
+            tracer=self.tracer,
+        )
+        self.tts = self.engine.tts
+        self.tts.on_first_audio = self.report_first_audio
 
-        # Initialize TTS engine
-        self.setup_tts_engine()
+        # Model kept loaded with keep_alive, scenario openers generated in
+        # the background and served instantly
+        self.engine.warm_up()
 
         # Initialize variables
         self.is_recording = False
-        self.audio_filename = "temp_recording.wav"
         self.conversation_active = False
         self.is_speaking = False  # Add flag to track TTS state
 
-        self.setup_scenarios()
-        self.setup_gui()
-        self.setup_audio()
+        with PROFILE.phase("build window"):
+            self.setup_gui()
+        with PROFILE.phase("set up audio"):
+            self.setup_audio()
+        self.setup_pipeline()
 
-        # Initialize conversation history
-        self.conversation_history = []
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        # Backends are set up once the window has been drawn
+        self.root.after_idle(self.warm_backends)
+
+    def on_close(self):
+        # Release the audio devices before the window goes away
+        if self.barge_in:
+            self.barge_in.disarm()
+        self.tracer.finish()
+        self.engine.close()
+        self.devices.close()
+        self.root.destroy()
 
     def setup_gui(self):
         # Main container with padding
@@ -74,6 +111,11 @@ class EnglishPracticeApp:
         self.start_button.pack(fill="x", pady=10)
         self.start_button.config(state="disabled")
 
+        # Rolling latency per stage of the recent turns
+        self.latency_panel = LatencyPanel(self.root, left_panel, self.tracer.stats)
+        self.latency_panel.frame.pack(fill="x", pady=10)
+        self.tracer.on_finish = self.latency_panel.schedule_refresh
+
         # Right Panel - Conversation
         right_panel = ttk.Frame(main_container)
         right_panel.pack(side="right", fill="both", expand=True)
@@ -146,50 +188,12 @@ class EnglishPracticeApp:
         # Configure tags for user and bot messages
         self.chat_display.tag_configure("user", justify="right", foreground="blue")
         self.chat_display.tag_configure("bot", justify="left", foreground="green")
+        self.chat_display.tag_configure(
+            "partial", justify="right", foreground="gray"
+        )
 
     def setup_scenarios(self):
-        self.scenarios = {
-            "Casual Chat": {
-                "system_prompt": "You are a friendly conversation partner. Keep responses natural and casual. Ask follow-up questions to maintain conversation flow.",
-                "initial_prompt": "you are my english tutor, please help me practice talking in english, i want us to talk about Chitchat topic. please ask me first",
-                "description": "Practice casual conversation with topics like weather, hobbies, and daily life. Perfect for building basic conversation skills.",
-            },
-            "Daily Routines": {
-                "system_prompt": "You are helping someone practice discussing daily routines and activities in English. Ask about their schedule and habits.",
-                "initial_prompt": "you are my english tutor, please help me practice talking in english, i want us to talk about Daily Routines topic. please ask me first",
-                "description": "Practice describing your daily schedule, habits, and regular activities. Learn time-related vocabulary and expressions.",
-            },
-            "Giving Directions": {
-                "system_prompt": "You are a local helping someone find their way. Ask where they want to go and practice giving directions.",
-                "initial_prompt": "you are my english tutor, please help me practice talking in english, i want us to talk about Giving Directions topic. please ask me first",
-                "description": "Learn to give and follow directions in English. Practice using location-based vocabulary and prepositions.",
-            },
-            "Personal Information": {
-                "system_prompt": "You are meeting someone new and exchanging basic personal information. Ask appropriate questions about their background.",
-                "initial_prompt": "you are my english tutor, please help me practice talking in english, i want us to talk about Personal Information topic. please ask me first",
-                "description": "Practice introducing yourself and sharing basic personal information. Learn to ask and answer common questions about yourself.",
-            },
-            "Time Expressions": {
-                "system_prompt": "You are helping someone practice telling time and using time expressions in English.",
-                "initial_prompt": "you are my english tutor, please help me practice talking in english, i want us to talk about Time Expressions topic. please ask me first",
-                "description": "Learn to tell time and use time-related expressions in English. Practice different ways to talk about time and schedules.",
-            },
-            "Numbers Practice": {
-                "system_prompt": "You are helping someone practice using numbers in English conversation.",
-                "initial_prompt": "you are my english tutor, please help me practice talking in english, i want us to talk about Numbers Practice topic. please ask me first",
-                "description": "Practice using numbers in different contexts like prices, dates, phone numbers, and measurements.",
-            },
-            "Party Meeting": {
-                "system_prompt": "You are at a party meeting new people. Keep the conversation light and social.",
-                "initial_prompt": "you are my english tutor, please help me practice talking in english, i want us to talk about Party Meeting topic. please ask me first",
-                "description": "Practice social interactions at parties or gatherings. Learn small talk and how to make new connections.",
-            },
-            "Dating Scenario": {
-                "system_prompt": "You are on a first date. Keep the conversation appropriate and friendly.",
-                "initial_prompt": "you are my english tutor, please help me practice talking in english, i want us to talk about Dating Scenario topic. please ask me first",
-                "description": "Practice conversation skills for dating scenarios. Learn appropriate topics and questions for first dates.",
-            },
-        }
+        self.scenarios = SCENARIOS
 
     def on_scenario_selected(self):
         scenario = self.scenario_var.get()
@@ -205,26 +209,88 @@ class EnglishPracticeApp:
             self.status_label.config(text="Click 'Start Conversation' to begin")
 
     def setup_audio(self):
-        # Initialize speech recognizer
-        self.recognizer = sr.Recognizer()
+        # Microphone opened once for the whole session
+        self.devices = AudioDeviceManager.from_config(self.config)
+        self.record_requested_at = None
+
+        # Records each learner turn, transcribing it while the learner is
+        # speaking when a streaming engine is configured
+        self.recorder = TurnRecorder(
+            self.config,
+            self.devices,
+            create_streaming_recognizer(self.config, self.engine.stt),
+            on_partial=lambda turn, text: self.root.after(
+                0, self.show_partial_transcript, turn, text
+            ),
+            on_end_of_turn=lambda turn: self.root.after(
+                0, self.auto_stop_recording, turn
+            ),
+        )
+        self.turn = None
+
+        # Keeps the microphone armed while the tutor speaks so the learner
+        # can cut in
+        self.barge_in = None
+        self.interrupted = False
+        if self.config["barge_in_enabled"]:
+            self.barge_in = BargeInMonitor.from_config(
+                self.on_barge_in, self.devices, self.config
+            )
+
+    def setup_pipeline(self):
+        # capture -> STT -> LLM -> TTS, each stage on its own worker thread
+        self.pipeline = TurnPipeline(
+            self.root,
+            on_state=self.show_stage_state,
+            on_idle=self.on_turn_done,
+        )
+        self.pipeline.add_stage("capture", self.capture_stage)
+        self.pipeline.add_stage("stt", self.stt_stage)
+        self.pipeline.add_stage("llm", self.llm_stage)
+        self.pipeline.add_stage("tts", self.tts_stage)
+        self.pipeline.start()
+
+    def capture_stage(self, turn):
+        # Let the recording thread flush and trim its buffer
+        turn.join()
+        return turn
+
+    def stt_stage(self, turn):
+        self.tracer.mark("stt_start")
+        text = self.finish_transcript(turn)
+        self.tracer.mark("stt_end")
+        if text:
+            self.root.after(0, self.display_message, "You: " + text, "user")
+        return text
+
+    def llm_stage(self, text):
+        response = self.get_ai_response(text)
+        self.root.after(0, self.display_message, "AI: " + response, "bot")
+        return response
+
+    def tts_stage(self, response):
+        self.speak_text_blocking(response)
+
+    def show_stage_state(self, stage, running):
+        if running:
+            self.status_label.configure(text=STAGE_STATUS[stage])
+
+    def set_status(self, text):
+        # Safe to call from worker threads
+        self.root.after(0, lambda: self.status_label.configure(text=text))
 
     def on_scenario_selected(self):
         scenario = self.scenario_var.get()
         if scenario in self.scenarios:
+            # Make sure the model is loaded (no-op if it was used recently)
+            self.engine.models.warm_up()
+
             self.chat_display.delete(1.0, tk.END)
             self.start_conversation(scenario)
 
     def start_conversation(self, scenario):
-        # system_prompt = self.scenarios[scenario]["system_prompt"]
-        initial_prompt = self.scenarios[scenario]["initial_prompt"]
-
-        # Get AI response
-        # response = self.get_ai_response(system_prompt, initial_prompt)
-        response = self.get_ai_response(initial_prompt)
-
-        # Display and speak response
-        self.display_message("AI: " + response, "bot")
-        self.speak_text(response)
+        self.conversation_active = True
+        self.start_opener(scenario)
 
     def start_new_conversation(self):
         # Clear chat display
@@ -238,245 +304,167 @@ class EnglishPracticeApp:
 
         # Start conversation
         self.conversation_active = True
-        # system_prompt = self.scenarios[scenario]["system_prompt"]
-        initial_prompt = self.scenarios[scenario]["initial_prompt"]
-
-        # Get AI response
-        # response = self.get_ai_response(system_prompt, initial_prompt)
-        response = self.get_ai_response(initial_prompt)
-
-        # Display and speak response
-        self.display_message("AI: " + response, role="bot")
-        self.speak_text(response)
-
-        # Update status
-        self.status_label.config(text="Ready for your response")
-
-    # [Rest of the methods remain the same...]
-    def toggle_recording(self):
-        if not self.is_recording:
-            self.start_recording()
+        self.start_opener(scenario)
+
+    def start_opener(self, scenario):
+        # Serve a pre-generated opener instantly when one is cached
+        opener = self.engine.start_scenario(scenario)
+        if opener:
+            self.display_message("AI: " + opener, "bot")
+            self.tracer.begin(kind="opener")
+            self.pipeline.submit("tts", opener)
         else:
-            self.stop_recording()
-
-    def start_recording(self):
-        self.is_recording = True
-        self.record_button.configure(text="Stop Recording")
-        self.status_label.configure(text="Recording...")
-
-        # Start recording in a separate thread
-        self.recording_thread = Thread(target=self.record_audio)
-        self.recording_thread.start()
-
-    def stop_recording(self):
-        self.is_recording = False
-        self.record_button.configure(text="Start Recording")
-        self.status_label.configure(text="Processing...")
+            # Get, display and speak the AI response on the pipeline workers
+            self.tracer.begin(kind="opener")
+            self.pipeline.submit("llm", self.scenarios[scenario]["initial_prompt"])
+
+    def show_partial_transcript(self, turn, text):
+        # Late updates can arrive after the turn has been finalized
+        if turn.finished:
+            return
+
+        # Replace the previous partial line in place
+        self.clear_partial_transcript()
+        self.chat_display.insert(tk.END, "You: " + text + " ...\n\n", "partial")
+        self.chat_display.see(tk.END)
 
-        # Wait for recording thread to finish
-        self.recording_thread.join()
+    def clear_partial_transcript(self):
+        ranges = self.chat_display.tag_ranges("partial")
+        if ranges:
+            self.chat_display.delete(ranges[0], ranges[-1])
 
-        # Process the recording
-        text = self.speech_to_text()
+    def finish_transcript(self, turn):
+        # Prefer the streaming transcript, it is normally ready by now
+        timeout = self.config["streaming_final_timeout_ms"] / 1000
+        text = turn.streamed_transcript(timeout)
+        self.root.after(0, self.clear_partial_transcript)
         if text:
-            self.display_message("You: " + text)
-
-            # Get AI response
-            # scenario = self.scenario_var.get()
-            # system_prompt = self.scenarios[scenario]["system_prompt"]
-            # response = self.get_ai_response(system_prompt, text)
-            response = self.get_ai_response(text)
-
-            # Display and speak AI response
-            self.display_message("AI: " + response)
-            self.speak_text(response)
-
-        self.status_label.configure(text="Ready")
-
-    def record_audio(self):
-        CHUNK = 1024
-        FORMAT = pyaudio.paInt16
-        CHANNELS = 1
-        RATE = 44100
-
-        p = pyaudio.PyAudio()
-        stream = p.open(
-            format=FORMAT,
-            channels=CHANNELS,
-            rate=RATE,
-            input=True,
-            frames_per_buffer=CHUNK,
-        )
-
-        frames = []
-        while self.is_recording:
-            data = stream.read(CHUNK)
-            frames.append(data)
-
-        stream.stop_stream()
-        stream.close()
-        p.terminate()
-
-        # Save the recording
-        wf = wave.open(self.audio_filename, "wb")
-        wf.setnchannels(CHANNELS)
-        wf.setsampwidth(p.get_sample_size(FORMAT))
-        wf.setframerate(RATE)
-        wf.writeframes(b"".join(frames))
-        wf.close()
-
-    def speech_to_text(self):
-        with sr.AudioFile(self.audio_filename) as source:
-            audio = self.recognizer.record(source)
-            try:
-                text = self.recognizer.recognize_google(audio)
-                return text
-            except sr.UnknownValueError:
-                self.status_label.configure(text="Could not understand audio")
-                return None
-            except sr.RequestError:
-                self.status_label.configure(text="Could not request results")
-                return None
-
-    def get_ai_response(self, user_message):
-        try:
-            # Add user message to conversation history
-            self.conversation_history.append({"role": "user", "content": user_message})
-
-            # Prepare the request payload for Ollama
-            payload = {
-                "model": "mistral",
-                "messages": self.conversation_history,
-                "stream": False,
-            }
-
-            # Make the request to Ollama
-            response = requests.post(self.ollama_endpoint, json=payload)
-
-            if response.status_code == 200:
-                response_data = response.json()
-                ai_message = response_data["message"]["content"]
-
-                # Add AI response to conversation history
-                self.conversation_history.append(
-                    {"role": "assistant", "content": ai_message}
-                )
-
-                return ai_message
-            else:
-                return f"Error: Received status code {response.status_code} from Ollama"
-
-        except requests.exceptions.ConnectionError:
-            return "Error: Could not connect to Ollama. Make sure Ollama is running on localhost:11434"
-        except Exception as e:
-            return f"Error getting AI response: {str(e)}"
+            return text
+        return self.speech_to_text(turn.captured)
 
-    def setup_tts_engine(self):
+    def auto_stop_recording(self, turn):
+        # Called from the Tk loop; the user may already have pressed Stop
+        if self.is_recording and turn is self.turn:
+            self.stop_recording()
 
+    def speech_to_text(self, captured):
         try:
-            self.engine = pyttsx3.init()
-
-            # Get available voices
-            voices = self.engine.getProperty("voices")
-
-            # Find and set English voice
-            english_voice = None
-            for voice in voices:
-                # Print voice information for debugging
-                print(f"Voice ID: {voice.id}")
-                print(f"Voice Name: {voice.name}")
-                print(f"Voice Languages: {voice.languages}")
-                print("---")
-
-                # Try to find an English voice
-                if "EN" in voice.id.upper():
-                    english_voice = voice
-                    break
-
-            if english_voice:
-                self.engine.setProperty("voice", english_voice.id)
-                print(f"Selected voice: {english_voice.name}")
-            else:
-                print("No English voice found, using default voice")
-
-            # Set default properties
-            self.engine.setProperty("rate", 150)  # Speed of speech
-            self.engine.setProperty("volume", 1.0)  # Volume (0.0 to 1.0)
+            return self.engine.transcribe(captured)
+        except TranscriptionError as e:
+            self.set_status(str(e))
+            return None
 
-        except Exception as e:
-            print(f"Error initializing TTS engine: {str(e)}")
-            self.status_label.configure(text="TTS initialization failed")
+    def get_ai_response(self, user_message):
+        return self.engine.respond(user_message)
+
+    def warm_backends(self):
+        # The window is up: open the microphone and load the speech engines
+        # off the Tk thread
+        PROFILE.mark("window shown")
+        PROFILE.report("window shown")
+        self.devices.warm_load()
+        self.engine.stt.warm_load()
+        self.tts.start()
+        if PROFILE.enabled:
+            Thread(target=self.report_backends_warm, daemon=True).start()
+
+    def report_backends_warm(self):
+        self.devices.ready.wait()
+        self.engine.stt.wait_loaded()
+        self.tts.ready.wait()
+        PROFILE.report("backends warm")
+
+    def on_barge_in(self, session, noise_floor_db):
+        # Called from the monitor thread: stop speaking and keep recording
+        # from the open mic
+        self.interrupted = True
+        self.tts.stop()
+        self.root.after(0, self.start_recording, session, noise_floor_db)
+
+    def report_first_audio(self):
+        # Called on the TTS worker thread once the reply starts playing. The
+        # utterance is rendered first, so arming the monitor only now makes
+        # its noise floor the level of the reply rather than of the silence
+        # before it
+        self.tracer.mark("first_audio")
+        if self.barge_in and self.is_speaking:
+            self.barge_in.arm()
 
     def update_voice_settings(self):
         try:
-            # Update the TTS engine settings based on the current values of speed and volume
-            self.engine.setProperty("rate", self.speed_var.get())
-            self.engine.setProperty("volume", self.volume_var.get())
+            # The TTS worker applies the new speed and volume between utterances
+            self.tts.set_rate(self.speed_var.get())
+            self.tts.set_volume(self.volume_var.get())
             self.status_label.configure(text="Voice settings updated")
         except Exception as e:
             self.status_label.configure(text=f"Error updating voice settings: {str(e)}")
 
     def speak_text(self, text):
+        # Queue speech without waiting for it
+        self.tts.speak(text, wait=False)
+
+    def speak_text_blocking(self, text):
         try:
             # Set speaking flag
             self.is_speaking = True
-
-            def speak():
-                try:
-                    self.engine.say(text)
-                    self.engine.runAndWait()
-                finally:
-                    # Clear speaking flag and ensure recording button is enabled
-                    self.is_speaking = False
-                    self.root.after(0, self.enable_recording_button)
-
-            Thread(target=speak).start()
+            self.interrupted = False
+            self.tracer.mark("tts_start")
+            self.tts.speak(text)
+            self.tracer.mark("playback_end")
         except Exception as e:
+            self.set_status(f"TTS Error: {str(e)}")
+        finally:
+            if self.barge_in:
+                self.barge_in.disarm()
+            # A reply cut off by the learner is remembered as far as it was heard
+            if self.interrupted:
+                self.engine.mark_partially_heard(
+                    self.tts.heard_text(text)
+                )
+            # Clear speaking flag and ensure recording button is enabled
             self.is_speaking = False
-            self.status_label.configure(text=f"TTS Error: {str(e)}")
-            self.enable_recording_button()
+            self.root.after(0, self.enable_recording_button)
+
+    def on_turn_done(self):
+        # No turn in flight: log its trace and update the latency panel
+        self.tracer.finish()
+        self.enable_recording_button()
 
     def enable_recording_button(self):
-        if self.conversation_active:
+        # After a barge-in the learner is already recording
+        if self.is_recording:
+            return
+        if self.conversation_active and not self.pipeline.busy:
             self.record_button.config(state="normal")
             self.status_label.configure(text="Ready for your response")
 
     def toggle_recording(self):
-        if not self.is_recording and not self.is_speaking:
+        if not self.is_recording and not self.is_speaking and not self.pipeline.busy:
             self.start_recording()
         elif self.is_recording:
             self.stop_recording()
 
-    def start_recording(self):
+    def start_recording(self, session=None, noise_floor_db=None):
         self.is_recording = True
-        self.record_button.configure(text="Stop Recording")
+        self.record_requested_at = time.perf_counter()
+        self.record_button.configure(text="Stop Recording", state="normal")
         self.status_label.configure(text="Recording...")
 
-        # Start recording in a separate thread
-        self.recording_thread = Thread(target=self.record_audio)
-        self.recording_thread.start()
+        # Record on a separate thread
+        self.turn = self.recorder.start(
+            session, self.record_requested_at, noise_floor_db
+        )
 
     def stop_recording(self):
         self.is_recording = False
         self.record_button.configure(text="Start Recording")
         self.status_label.configure(text="Processing...")
 
-        # Wait for recording thread to finish
-        self.recording_thread.join()
-
-        # Process the recording
-        text = self.speech_to_text()
-        if text:
-            self.display_message("You: " + text, "user")
-
-            # Get AI response
-            response = self.get_ai_response(text)
-
-            # Display and speak AI response
-            self.display_message("AI: " + response, "bot")
-            self.speak_text(response)
-
-        self.status_label.configure(text="Ready")
+        # Transcribe, answer and speak on the pipeline workers, the Tk loop
+        # never waits for them
+        self.tracer.begin(first_point="recording_stop")
+        self.turn.stop()
+        self.pipeline.submit("capture", self.turn)
         # Note: Recording button will be re-enabled after speaking is complete
 
     def display_message(self, message, role):
@@ -489,6 +477,16 @@ class EnglishPracticeApp:
 
 
 if __name__ == "__main__":
-    root = tk.Tk()
-    app = EnglishPracticeApp(root)
+    parser = argparse.ArgumentParser(description="English speaking practice with AI")
+    parser.add_argument(
+        "--startup-profile",
+        action="store_true",
+        help="print how long each startup phase took",
+    )
+    PROFILE.enabled = parser.parse_args().startup_profile
+
+    with PROFILE.phase("create window"):
+        root = tk.Tk()
+    with PROFILE.phase("build app"):
+        app = EnglishPracticeApp(root)
     root.mainloop()
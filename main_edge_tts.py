@@ -1,16 +1,23 @@
+import argparse
 import tkinter as tk
 from tkinter import ttk
-import speech_recognition as sr
-import os
-import pyaudio
-import wave
 from threading import Thread
-import requests  # Added for Ollama API calls
-import json
-import edge_tts
-import asyncio
+import time
 import subprocess
-import pygame
+
+from audio_device import AudioDeviceManager
+from barge_in import BargeInMonitor
+from chat_render import ChatRenderBuffer
+from config import load_config
+from conversation_engine import ConversationEngine, TranscriptionError
+from latency_panel import LatencyPanel
+from playback import PygameSegmentPlayer
+from sentence_tts import SentenceSpeaker
+from startup_profile import PROFILE
+from streaming_stt import create_streaming_recognizer
+from turn_pipeline import STAGE_STATUS, TurnPipeline
+from turn_recorder import TurnRecorder
+from turn_trace import TurnTracer
 
 
 class EnglishPracticeApp:
@@ -19,25 +26,54 @@ class EnglishPracticeApp:
         self.root.title("English Speaking Practice with AI")
         self.root.geometry("1280x720")
         # self.root.attributes("-topmost", True)  # Make the window always on top
-        self.scenarios = {}
+        self.config = load_config()
+        self.setup_scenarios()
+
+        # Per-turn latency points, logged as JSONL and summed up in the
+        # latency panel
+        self.tracer = TurnTracer.from_config(self.config, "main_edge_tts.py")
+
+        # History, recognizer, model and TTS live in the engine; this window
+        # only records, displays and plays
+        self.engine = ConversationEngine.from_config(
+            self.config,
+            self.scenarios,
+            default_model="llama3.2",
+            tts="edge",
+            warm_stt=False,
+            tracer=self.tracer,
+        )
 
-        # Initialize Ollama endpoint
-        self.ollama_endpoint = "http://localhost:11434/api/chat"
+        # Model kept loaded with keep_alive, scenario openers generated in
+        # the background and served instantly
+        self.engine.warm_up()
 
         # Initialize variables
         self.is_recording = False
-        self.audio_filename = "temp_recording.wav"
         self.conversation_active = False
         self.is_speaking = False  # Add flag to track TTS state
 
-        self.setup_scenarios()
-        self.setup_gui()
-        self.setup_audio()
+        with PROFILE.phase("build window"):
+            self.setup_gui()
+        with PROFILE.phase("set up audio"):
+            self.setup_audio()
+        self.setup_tts()
+        self.setup_pipeline()
+
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
-        # Initialize conversation history
-        self.conversation_history = []
+        # Backends are set up once the window has been drawn
+        self.root.after_idle(self.warm_backends)
 
-        self.recording_thread = None
+    def on_close(self):
+        # Release the audio devices before the window goes away
+        if self.barge_in:
+            self.barge_in.disarm()
+        self.player.close()
+        self.tracer.finish()
+        self.engine.close()
+        self.devices.close()
+        self.root.destroy()
 
     def setup_gui(self):
         # Main container with padding
@@ -73,6 +109,11 @@ class EnglishPracticeApp:
         self.start_button.pack(fill="x", pady=10)
         self.start_button.config(state="disabled")
 
+        # Rolling latency per stage of the recent turns
+        self.latency_panel = LatencyPanel(self.root, left_panel, self.tracer.stats)
+        self.latency_panel.frame.pack(fill="x", pady=10)
+        self.tracer.on_finish = self.latency_panel.schedule_refresh
+
         # Right Panel - Conversation
         right_panel = ttk.Frame(main_container)
         right_panel.pack(side="right", fill="both", expand=True)
@@ -110,6 +151,14 @@ class EnglishPracticeApp:
         # Configure tags for user and bot messages
         self.chat_display.tag_configure("user", justify="right", foreground="blue")
         self.chat_display.tag_configure("bot", justify="left", foreground="green")
+        self.chat_display.tag_configure(
+            "partial", justify="right", foreground="gray"
+        )
+
+        # Streamed tokens are rendered in batches at a fixed frame rate
+        self.chat_buffer = ChatRenderBuffer(
+            self.root, self.chat_display, fps=self.config["chat_render_fps"]
+        )
 
     def setup_scenarios(self):
         self.scenarios = {
@@ -156,12 +205,157 @@ class EnglishPracticeApp:
         }
 
     def setup_audio(self):
-        # Initialize speech recognizer
-        self.recognizer = sr.Recognizer()
+        # Microphone opened once for the whole session
+        self.devices = AudioDeviceManager.from_config(self.config)
+        self.record_requested_at = None
+
+        # Records each learner turn, transcribing it while the learner is
+        # speaking when a streaming engine is configured
+        self.recorder = TurnRecorder(
+            self.config,
+            self.devices,
+            create_streaming_recognizer(self.config, self.engine.stt),
+            on_partial=lambda turn, text: self.root.after(
+                0, self.show_partial_transcript, turn, text
+            ),
+            on_end_of_turn=lambda turn: self.root.after(
+                0, self.auto_stop_recording, turn
+            ),
+        )
+        self.turn = None
+
+    def setup_tts(self):
+        # Sentences already synthesized once are replayed from the engine's
+        # TTS cache
+        self.tts_cache = self.engine.tts.cache
+
+        # One mixer for the whole session, opened once rather than per reply
+        self.player = PygameSegmentPlayer()
+        self.tts_warmup = None
+
+        # Keeps the microphone armed while the tutor speaks so the learner
+        # can cut in
+        self.barge_in = None
+        if self.config["barge_in_enabled"]:
+            self.barge_in = BargeInMonitor.from_config(
+                self.on_barge_in, self.devices, self.config
+            )
+
+        # Speaks each sentence of the reply as soon as the LLM completes it
+        self.speaker = SentenceSpeaker(
+            self.engine.tts.stream,
+            self.player,
+            on_first_audio=self.report_first_audio,
+            start_ms=self.config["tts_stream_start_ms"],
+        )
+
+    def warm_backends(self):
+        # The window is up: open the microphone and the mixer and load the
+        # speech engines off the Tk thread
+        PROFILE.mark("window shown")
+        PROFILE.report("window shown")
+        self.devices.warm_load()
+        self.engine.stt.warm_load()
+        self.tts_warmup = Thread(target=self.warm_tts, daemon=True)
+        self.tts_warmup.start()
+        if PROFILE.enabled:
+            Thread(target=self.report_backends_warm, daemon=True).start()
+
+    def warm_tts(self):
+        with PROFILE.phase("import edge_tts", background=True):
+            import edge_tts  # noqa: F401
+        self.player.start(background=True)
+
+    def report_backends_warm(self):
+        self.devices.ready.wait()
+        self.engine.stt.wait_loaded()
+        self.tts_warmup.join()
+        PROFILE.report("backends warm")
+
+    def report_first_audio(self, seconds):
+        self.tracer.mark("first_audio")
+        self.set_status(f"Speaking... (first audio after {seconds * 1000:.0f} ms)")
+        if self.barge_in:
+            self.barge_in.arm()
+
+    def on_barge_in(self, session, noise_floor_db):
+        # Called from the monitor thread: silence the reply, drop the
+        # sentences not yet synthesized and keep recording from the open mic
+        self.speaker.stop()
+        self.root.after(0, self.start_recording, session, noise_floor_db)
+
+    def end_barge_in(self):
+        if self.barge_in:
+            self.barge_in.disarm()
+        # A reply cut off by the learner is remembered as far as it was heard
+        if self.speaker.interrupted:
+            self.engine.mark_partially_heard(self.speaker.heard_text())
+
+    def setup_pipeline(self):
+        # capture -> STT -> LLM -> TTS, each stage on its own worker thread
+        self.pipeline = TurnPipeline(
+            self.root,
+            on_state=self.show_stage_state,
+            on_idle=self.on_turn_done,
+        )
+        self.pipeline.add_stage("capture", self.capture_stage)
+        self.pipeline.add_stage("stt", self.stt_stage)
+        self.pipeline.add_stage("llm", self.llm_stage)
+        self.pipeline.add_stage("tts", self.tts_stage)
+        self.pipeline.start()
+
+    def capture_stage(self, turn):
+        # Let the recording thread flush and trim its buffer
+        turn.join()
+        return turn
+
+    def stt_stage(self, turn):
+        self.tracer.mark("stt_start")
+        text = self.finish_transcript(turn)
+        self.tracer.mark("stt_end")
+        if text:
+            self.chat_buffer.write("You: " + text + "\n\n", "user")
+        return text
+
+    def llm_stage(self, text):
+        # get_ai_response streams the reply into the chat display and feeds
+        # completed sentences to the speaker as they arrive
+        self.speaker.begin_turn()
+        return self.get_ai_response(text)
+
+    def tts_stage(self, response):
+        try:
+            self.is_speaking = True
+            # Cached openers and error messages are not streamed, speak them
+            # in one go; a streamed reply's last sentence is still in the
+            # segmenter and finish() flushes it
+            self.tracer.mark("tts_start")
+            if not self.speaker.fed:
+                self.speaker.feed(response)
+            self.speaker.finish()
+            self.speaker.wait()
+            self.tracer.mark("playback_end")
+            if self.tts_cache:
+                print(self.tts_cache.describe())
+        finally:
+            self.end_barge_in()
+            self.is_speaking = False
+
+    def show_stage_state(self, stage, running):
+        if running:
+            self.status_label.configure(text=STAGE_STATUS[stage])
+
+    def set_status(self, text):
+        # Safe to call from worker threads
+        self.root.after(0, lambda: self.status_label.configure(text=text))
 
     def on_scenario_selected(self):
         scenario = self.scenario_var.get()
         if scenario in self.scenarios:
+            # Load the model now so the opener does not wait for it
+            self.engine.models.warm_up()
+            self.prepare_opener(scenario)
+
             # Enable start button
             self.start_button.config(state="normal")
             self.status_label.config(text="Click 'Start Conversation' to begin")
@@ -184,15 +378,27 @@ class EnglishPracticeApp:
 
         # Start conversation
         self.conversation_active = True
-        initial_prompt = self.scenarios[scenario]["initial_prompt"]
-
-        # Get AI response
-        response = self.get_ai_response(initial_prompt)
-
-        asyncio.run(self.speak_text(response))
+        self.start_opener(scenario)
+
+    def start_opener(self, scenario):
+        # Serve a pre-generated opener instantly when one is cached
+        opener = self.engine.start_scenario(scenario)
+        if opener:
+            self.chat_buffer.write("AI: " + opener + "\n\n", "bot")
+            self.tracer.begin(kind="opener")
+            self.speaker.begin_turn()
+            self.pipeline.submit("tts", opener)
+        else:
+            # Get and speak the AI response on the pipeline workers
+            self.tracer.begin(kind="opener")
+            self.pipeline.submit("llm", self.scenarios[scenario]["initial_prompt"])
 
-        # Update status
-        self.status_label.config(text="Ready for your response")
+    def prepare_opener(self, scenario):
+        # Synthesize the opener that will be served next while the learner
+        # is still reading the scenario
+        opener = self.engine.peek_opener(scenario)
+        if opener:
+            self.speaker.prepare(opener)
 
     # [Rest of the methods remain the same...]
     def toggle_recording(self):
@@ -201,189 +407,138 @@ class EnglishPracticeApp:
         else:
             self.stop_recording()
 
-    def record_audio(self):
-        CHUNK = 1024
-        FORMAT = pyaudio.paInt16
-        CHANNELS = 1
-        RATE = 44100
-
-        p = pyaudio.PyAudio()
-        stream = p.open(
-            format=FORMAT,
-            channels=CHANNELS,
-            rate=RATE,
-            input=True,
-            frames_per_buffer=CHUNK,
-        )
+    def show_partial_transcript(self, turn, text):
+        # Late updates can arrive after the turn has been finalized
+        if turn.finished:
+            return
 
-        frames = []
-        while self.is_recording:
-            data = stream.read(CHUNK)
-            frames.append(data)
-
-        stream.stop_stream()
-        stream.close()
-        p.terminate()
-
-        # Save the recording
-        wf = wave.open(self.audio_filename, "wb")
-        wf.setnchannels(CHANNELS)
-        wf.setsampwidth(p.get_sample_size(FORMAT))
-        wf.setframerate(RATE)
-        wf.writeframes(b"".join(frames))
-        wf.close()
-
-    def speech_to_text(self):
-        with sr.AudioFile(self.audio_filename) as source:
-            audio = self.recognizer.record(source)
-            try:
-                text = self.recognizer.recognize_google(audio)
-                return text
-            except sr.UnknownValueError:
-                self.status_label.configure(text="Could not understand audio")
-                return None
-            except sr.RequestError:
-                self.status_label.configure(text="Could not request results")
-                return None
+        # Replace the previous partial line in place
+        self.clear_partial_transcript()
+        self.chat_display.insert(tk.END, "You: " + text + " ...\n\n", "partial")
+        self.chat_display.see(tk.END)
 
-    def get_ai_response(self, user_message):
+    def clear_partial_transcript(self):
+        ranges = self.chat_display.tag_ranges("partial")
+        if ranges:
+            self.chat_display.delete(ranges[0], ranges[-1])
+
+    def finish_transcript(self, turn):
+        # Prefer the streaming transcript, it is normally ready by now
+        timeout = self.config["streaming_final_timeout_ms"] / 1000
+        text = turn.streamed_transcript(timeout)
+        self.root.after(0, self.clear_partial_transcript)
+        if text:
+            return text
+        return self.speech_to_text(turn.captured)
+
+    def auto_stop_recording(self, turn):
+        # Called from the Tk loop; the user may already have pressed Stop
+        if self.is_recording and turn is self.turn:
+            self.stop_recording()
+
+    def speech_to_text(self, captured):
         try:
-            # Add user message to conversation history
-            self.conversation_history.append({"role": "user", "content": user_message})
-
-            # Prepare the request payload for Ollama
-            payload = {
-                "model": "llama3.2",
-                "messages": self.conversation_history[-10:],
-                "stream": True,
-            }
-
-            # Make the request to Ollama
-            response = requests.post(self.ollama_endpoint, json=payload, stream=True)
-
-            if response.status_code == 200:
-                ai_message = ""
-
-                # Track if we've started displaying the message
-                message_started = False
-
-                for chunk in response.iter_lines():
-                    if chunk:
-                        chunk_data = json.loads(chunk.decode("utf-8"))
-                        if (
-                            "message" in chunk_data
-                            and "content" in chunk_data["message"]
-                        ):
-                            # Get the new content
-                            new_content = chunk_data["message"]["content"]
-                            ai_message += new_content
-
-                            # If this is the first chunk, insert new message
-                            if not message_started:
-                                self.chat_display.insert(tk.END, "AI: ", "bot")
-                                message_started = True
-
-                            # Insert the new content
-                            self.chat_display.insert(tk.END, new_content, "bot")
-                            self.chat_display.see(tk.END)
-                            self.root.update_idletasks()
-
-                # Add newlines after the complete message
-                self.chat_display.insert(tk.END, "\n\n")
-
-                # Add AI response to conversation history
-                self.conversation_history.append(
-                    {"role": "assistant", "content": ai_message}
-                )
-
-                return ai_message
-            else:
-                return f"Error: Received status code {response.status_code} from Ollama"
-
-        except requests.exceptions.ConnectionError:
-            return "Error: Could not connect to Ollama. Make sure Ollama is running on localhost:11434"
-        except Exception as e:
-            return f"Error getting AI response: {str(e)}"
+            return self.engine.transcribe(captured)
+        except TranscriptionError as e:
+            self.set_status(str(e))
+            return None
 
-    async def speak_text(self, text):
+    def get_ai_response(self, user_message):
+        message_started = False
+
+        def show_token(new_content):
+            nonlocal message_started
+            # If this is the first chunk, insert new message
+            if not message_started:
+                self.chat_buffer.write("AI: ", "bot")
+                message_started = True
+
+            # Queue the new content, the Tk loop renders it once per frame
+            self.chat_buffer.write(new_content, "bot")
+
+            # Start speaking each sentence once it is complete
+            self.speaker.feed(new_content)
+            if self.speaker.has_text:
+                self.tracer.mark("tts_start")
+
+        ai_message = self.engine.respond(
+            user_message,
+            on_token=show_token,
+            interrupted=lambda: self.speaker.interrupted,
+        )
+        if message_started:
+            # Add newlines after the complete message
+            self.chat_buffer.write("\n\n")
+            print(
+                f"Chat render: {self.chat_buffer.inserts_avoided} insert calls "
+                "avoided so far"
+            )
+        return ai_message
+
+    def speak_text(self, text):
+        # Run the speak function in a separate thread
+        Thread(target=self.speak_text_blocking, args=(text,)).start()
+
+    def speak_text_blocking(self, text):
         try:
             # Set speaking flag
             self.is_speaking = True
-
-            async def speak():
-                try:
-                    communicate = edge_tts.Communicate(text, voice="en-US-JennyNeural")
-                    await communicate.save("output.mp3")
-                    print("TTS: output.mp3 saved successfully")
-
-                    if os.path.exists("output.mp3"):
-                        # Initialize pygame mixer
-                        pygame.mixer.init()
-                        pygame.mixer.music.load("output.mp3")
-                        pygame.mixer.music.play()
-
-                        # Wait for the music to finish playing
-                        while pygame.mixer.music.get_busy():
-                            await asyncio.sleep(1)
-
-                        # Quit the mixer after playback
-                        pygame.mixer.quit()
-                    else:
-                        print("TTS: output.mp3 file not found")
-                finally:
-                    # Clear speaking flag and ensure recording button is enabled
-                    self.is_speaking = False
-                    self.root.after(0, self.enable_recording_button)
-
-            def run_speak():
-                asyncio.run(speak())
-
-            # Run the speak function in a separate thread
-            Thread(target=run_speak).start()
+            self.tracer.mark("tts_start")
+            self.speaker.begin_turn()
+            self.speaker.feed(text)
+            self.speaker.finish()
+            self.speaker.wait()
+            self.tracer.mark("playback_end")
+            if self.tts_cache:
+                print(self.tts_cache.describe())
         except Exception as e:
+            self.set_status(f"TTS Error: {str(e)}")
+        finally:
+            self.end_barge_in()
+            # Clear speaking flag and ensure recording button is enabled
             self.is_speaking = False
-            self.status_label.configure(text=f"TTS Error: {str(e)}")
-            self.enable_recording_button()
+            self.root.after(0, self.enable_recording_button)
+
+    def on_turn_done(self):
+        # No turn in flight: log its trace and update the latency panel
+        self.tracer.finish()
+        self.enable_recording_button()
 
     def enable_recording_button(self):
-        if self.conversation_active:
+        # After a barge-in the learner is already recording
+        if self.is_recording:
+            return
+        if self.conversation_active and not self.pipeline.busy:
             self.record_button.config(state="normal")
             self.status_label.configure(text="Ready for your response")
 
     def toggle_recording(self):
-        if not self.is_recording and not self.is_speaking:
+        if not self.is_recording and not self.is_speaking and not self.pipeline.busy:
             self.start_recording()
         elif self.is_recording:
             self.stop_recording()
 
-    def start_recording(self):
+    def start_recording(self, session=None, noise_floor_db=None):
         self.is_recording = True
-        self.record_button.configure(text="Stop Recording")
+        self.record_requested_at = time.perf_counter()
+        self.record_button.configure(text="Stop Recording", state="normal")
         self.status_label.configure(text="Recording...")
 
-        # Start recording in a separate thread
-        self.recording_thread = Thread(target=self.record_audio)
-        self.recording_thread.start()
+        # Record on a separate thread
+        self.turn = self.recorder.start(
+            session, self.record_requested_at, noise_floor_db
+        )
 
     def stop_recording(self):
         self.is_recording = False
         self.record_button.configure(text="Start Recording")
         self.status_label.configure(text="Processing...")
 
-        # Wait for recording thread to finish
-        self.recording_thread.join()
-
-        # Process the recording
-        text = self.speech_to_text()
-        if text:
-            self.display_message("You: " + text, "user")
-
-            # Get AI response
-            response = self.get_ai_response(text)
-
-            asyncio.run(self.speak_text(response))
-
-        self.status_label.configure(text="Ready")
+        # Transcribe, answer and speak on the pipeline workers, the Tk loop
+        # never waits for them
+        self.tracer.begin(first_point="recording_stop")
+        self.turn.stop()
+        self.pipeline.submit("capture", self.turn)
 
     def display_message(self, message, role):
         if role == "user":
@@ -396,6 +551,16 @@ class EnglishPracticeApp:
 
 
 if __name__ == "__main__":
-    root = tk.Tk()
-    app = EnglishPracticeApp(root)
+    parser = argparse.ArgumentParser(description="English speaking practice with AI")
+    parser.add_argument(
+        "--startup-profile",
+        action="store_true",
+        help="print how long each startup phase took",
+    )
+    PROFILE.enabled = parser.parse_args().startup_profile
+
+    with PROFILE.phase("create window"):
+        root = tk.Tk()
+    with PROFILE.phase("build app"):
+        app = EnglishPracticeApp(root)
     root.mainloop()
@@ -1,38 +1,80 @@
+import argparse
 import tkinter as tk
 from tkinter import ttk
 import requests
-import speech_recognition as sr
-import pyttsx3
 import json
 import os
-import pyaudio
-import wave
 from threading import Thread
 import time
 
+from audio_device import AudioDeviceManager
+from config import load_config
+from conversation_engine import ConversationEngine, TranscriptionError
+from latency_panel import LatencyPanel
+from ollama_client import OllamaClient
+from startup_profile import PROFILE
+from streaming_stt import create_streaming_recognizer
+from turn_pipeline import STAGE_STATUS, TurnPipeline
+from turn_recorder import TurnRecorder
+from turn_trace import TurnTracer
+
 
 class EnglishPracticeApp:
     def __init__(self, root):
         self.root = root
         self.root.title("English Speaking Practice with AI")
         self.root.geometry("800x600")
-        self.scenarios = {}
+        self.config = load_config()
+        self.setup_scenarios()
+
+        # Per-turn latency points, logged as JSONL and summed up in the
+        # latency panel
+        self.tracer = TurnTracer.from_config(self.config, "main_streamlit.py")
 
         # Initialize Ollama API
         self.ollama_api_url = "https://api.ollama.com/v1/chat"
         self.ollama_api_key = "your_ollama_api_key_here"
+        self.ollama = OllamaClient.from_config(
+            self.config,
+            endpoint=self.ollama_api_url,
+            headers={"Authorization": f"Bearer {self.ollama_api_key}"},
+        )
 
-        # Initialize TTS engine
-        self.setup_tts_engine()
+        # Recognizer and TTS live in the engine. The hosted API answers each
+        # message on its own, so replies are still requested here, without
+        # the engine's history
+        self.engine = ConversationEngine.from_config(
+            self.config,
+            self.scenarios,
+            default_model="ollama-chat",
+            tts="pyttsx3",
+            warm_stt=False,
+            ollama=self.ollama,
+            tracer=self.tracer,
+        )
+        self.tts = self.engine.tts
+        self.tts.on_first_audio = lambda: self.tracer.mark("first_audio")
 
         # Initialize variables
         self.is_recording = False
-        self.audio_filename = "temp_recording.wav"
         self.conversation_active = False
 
-        self.setup_scenarios()
-        self.setup_gui()
-        self.setup_audio()
+        with PROFILE.phase("build window"):
+            self.setup_gui()
+        with PROFILE.phase("set up audio"):
+            self.setup_audio()
+        self.setup_pipeline()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        # Backends are set up once the window has been drawn
+        self.root.after_idle(self.warm_backends)
+
+    def on_close(self):
+        # Release the audio devices before the window goes away
+        self.tracer.finish()
+        self.engine.close()
+        self.devices.close()
+        self.root.destroy()
 
     def setup_gui(self):
         # Main container with padding
@@ -74,6 +116,11 @@ class EnglishPracticeApp:
         self.start_button.pack(fill="x", pady=10)
         self.start_button.config(state="disabled")
 
+        # Rolling latency per stage of the recent turns
+        self.latency_panel = LatencyPanel(self.root, left_panel, self.tracer.stats)
+        self.latency_panel.frame.pack(fill="x", pady=10)
+        self.tracer.on_finish = self.latency_panel.schedule_refresh
+
         # Right Panel - Conversation
         right_panel = ttk.Frame(main_container)
         right_panel.pack(side="right", fill="both", expand=True)
@@ -92,6 +139,7 @@ class EnglishPracticeApp:
         )
         scrollbar.pack(side="right", fill="y")
         self.chat_display.configure(yscrollcommand=scrollbar.set)
+        self.chat_display.tag_configure("partial", foreground="gray")
 
         # Control Frame
         control_frame = ttk.Frame(right_panel, padding="10")
@@ -201,8 +249,77 @@ class EnglishPracticeApp:
             self.status_label.config(text="Click 'Start Conversation' to begin")
 
     def setup_audio(self):
-        # Initialize speech recognizer
-        self.recognizer = sr.Recognizer()
+        # Microphone opened once for the whole session
+        self.devices = AudioDeviceManager.from_config(self.config)
+        self.record_requested_at = None
+
+        # Records each learner turn, transcribing it while the learner is
+        # speaking when a streaming engine is configured
+        self.recorder = TurnRecorder(
+            self.config,
+            self.devices,
+            create_streaming_recognizer(self.config, self.engine.stt),
+            on_partial=lambda turn, text: self.root.after(
+                0, self.show_partial_transcript, turn, text
+            ),
+            on_end_of_turn=lambda turn: self.root.after(
+                0, self.auto_stop_recording, turn
+            ),
+        )
+        self.turn = None
+
+    def setup_pipeline(self):
+        # capture -> STT -> LLM -> TTS, each stage on its own worker thread
+        self.system_prompt = None
+        self.pipeline = TurnPipeline(
+            self.root,
+            on_state=self.show_stage_state,
+            on_idle=self.on_turn_done,
+        )
+        self.pipeline.add_stage("capture", self.capture_stage)
+        self.pipeline.add_stage("stt", self.stt_stage)
+        self.pipeline.add_stage("llm", self.llm_stage)
+        self.pipeline.add_stage("tts", self.tts_stage)
+        self.pipeline.start()
+
+    def capture_stage(self, turn):
+        # Let the recording thread flush and trim its buffer
+        turn.join()
+        return turn
+
+    def stt_stage(self, turn):
+        self.tracer.mark("stt_start")
+        text = self.finish_transcript(turn)
+        self.tracer.mark("stt_end")
+        if text:
+            self.root.after(0, self.display_message, "You: " + text)
+        return text
+
+    def llm_stage(self, text):
+        response = self.get_ai_response(self.system_prompt, text)
+        self.root.after(0, self.display_message, "AI: " + response)
+        return response
+
+    def tts_stage(self, response):
+        self.speak_text_blocking(response)
+
+    def show_stage_state(self, stage, running):
+        if running:
+            self.status_label.configure(text=STAGE_STATUS[stage])
+
+    def set_status(self, text):
+        # Safe to call from worker threads
+        self.root.after(0, lambda: self.status_label.configure(text=text))
+
+    def on_turn_done(self):
+        # No turn in flight: log its trace and update the latency panel
+        self.tracer.finish()
+        self.enable_recording_button()
+
+    def enable_recording_button(self):
+        if self.conversation_active and not self.pipeline.busy:
+            self.record_button.config(state="normal")
+            self.status_label.configure(text="Ready for your response")
 
     def on_scenario_selected(self):
         scenario = self.scenario_var.get()
@@ -211,15 +328,13 @@ class EnglishPracticeApp:
             self.start_conversation(scenario)
 
     def start_conversation(self, scenario):
-        system_prompt = self.scenarios[scenario]["system_prompt"]
+        self.conversation_active = True
+        self.system_prompt = self.scenarios[scenario]["system_prompt"]
         initial_prompt = self.scenarios[scenario]["initial_prompt"]
 
-        # Get AI response
-        response = self.get_ai_response(system_prompt, initial_prompt)
-
-        # Display and speak response
-        self.display_message("AI: " + response)
-        self.speak_text(response)
+        # Get, display and speak the AI response on the pipeline workers
+        self.tracer.begin(kind="opener")
+        self.pipeline.submit("llm", initial_prompt)
 
     def start_new_conversation(self):
         # Clear chat display
@@ -233,108 +348,76 @@ class EnglishPracticeApp:
 
         # Start conversation
         self.conversation_active = True
-        system_prompt = self.scenarios[scenario]["system_prompt"]
+        self.system_prompt = self.scenarios[scenario]["system_prompt"]
         initial_prompt = self.scenarios[scenario]["initial_prompt"]
 
-        # Get AI response
-        response = self.get_ai_response(system_prompt, initial_prompt)
-
-        # Display and speak response
-        self.display_message("AI: " + response)
-        self.speak_text(response)
-
-        # Update status
-        self.status_label.config(text="Ready for your response")
+        # Get, display and speak the AI response on the pipeline workers
+        self.tracer.begin(kind="opener")
+        self.pipeline.submit("llm", initial_prompt)
 
     def toggle_recording(self):
-        if not self.is_recording:
+        if not self.is_recording and not self.pipeline.busy:
             self.start_recording()
-        else:
+        elif self.is_recording:
             self.stop_recording()
 
     def start_recording(self):
         self.is_recording = True
+        self.record_requested_at = time.perf_counter()
         self.record_button.configure(text="Stop Recording")
         self.status_label.configure(text="Recording...")
 
-        # Start recording in a separate thread
-        self.recording_thread = Thread(target=self.record_audio)
-        self.recording_thread.start()
+        # Record on a separate thread
+        self.turn = self.recorder.start(requested_at=self.record_requested_at)
 
     def stop_recording(self):
         self.is_recording = False
         self.record_button.configure(text="Start Recording")
         self.status_label.configure(text="Processing...")
 
-        # Wait for recording thread to finish
-        self.recording_thread.join()
+        # Transcribe, answer and speak on the pipeline workers, the Tk loop
+        # never waits for them
+        self.tracer.begin(first_point="recording_stop")
+        self.turn.stop()
+        self.pipeline.submit("capture", self.turn)
 
-        # Process the recording
-        text = self.speech_to_text()
+    def show_partial_transcript(self, turn, text):
+        # Late updates can arrive after the turn has been finalized
+        if turn.finished:
+            return
+
+        # Replace the previous partial line in place
+        self.clear_partial_transcript()
+        self.chat_display.insert(tk.END, "You: " + text + " ...\n\n", "partial")
+        self.chat_display.see(tk.END)
+
+    def clear_partial_transcript(self):
+        ranges = self.chat_display.tag_ranges("partial")
+        if ranges:
+            self.chat_display.delete(ranges[0], ranges[-1])
+
+    def finish_transcript(self, turn):
+        # Prefer the streaming transcript, it is normally ready by now
+        timeout = self.config["streaming_final_timeout_ms"] / 1000
+        text = turn.streamed_transcript(timeout)
+        self.root.after(0, self.clear_partial_transcript)
         if text:
-            self.display_message("You: " + text)
-
-            # Get AI response
-            scenario = self.scenario_var.get()
-            system_prompt = self.scenarios[scenario]["system_prompt"]
-            response = self.get_ai_response(system_prompt, text)
-
-            # Display and speak AI response
-            self.display_message("AI: " + response)
-            self.speak_text(response)
-
-        self.status_label.configure(text="Ready")
-
-    def record_audio(self):
-        CHUNK = 1024
-        FORMAT = pyaudio.paInt16
-        CHANNELS = 1
-        RATE = 44100
-
-        p = pyaudio.PyAudio()
-        stream = p.open(
-            format=FORMAT,
-            channels=CHANNELS,
-            rate=RATE,
-            input=True,
-            frames_per_buffer=CHUNK,
-        )
+            return text
+        return self.speech_to_text(turn.captured)
+
+    def auto_stop_recording(self, turn):
+        # Called from the Tk loop; the user may already have pressed Stop
+        if self.is_recording and turn is self.turn:
+            self.stop_recording()
 
-        frames = []
-        while self.is_recording:
-            data = stream.read(CHUNK)
-            frames.append(data)
-
-        stream.stop_stream()
-        stream.close()
-        p.terminate()
-
-        # Save the recording
-        wf = wave.open(self.audio_filename, "wb")
-        wf.setnchannels(CHANNELS)
-        wf.setsampwidth(p.get_sample_size(FORMAT))
-        wf.setframerate(RATE)
-        wf.writeframes(b"".join(frames))
-        wf.close()
-
-    def speech_to_text(self):
-        with sr.AudioFile(self.audio_filename) as source:
-            audio = self.recognizer.record(source)
-            try:
-                text = self.recognizer.recognize_google(audio)
-                return text
-            except sr.UnknownValueError:
-                self.status_label.configure(text="Could not understand audio")
-                return None
-            except sr.RequestError:
-                self.status_label.configure(text="Could not request results")
-                return None
+    def speech_to_text(self, captured):
+        try:
+            return self.engine.transcribe(captured)
+        except TranscriptionError as e:
+            self.set_status(str(e))
+            return None
 
     def get_ai_response(self, system_prompt, user_message):
-        headers = {
-            "Authorization": f"Bearer {self.ollama_api_key}",
-            "Content-Type": "application/json",
-        }
         data = {
             "model": "ollama-chat",
             "messages": [
@@ -343,67 +426,55 @@ class EnglishPracticeApp:
             ],
         }
         try:
-            response = requests.post(self.ollama_api_url, headers=headers, json=data)
+            self.tracer.mark("llm_sent")
+            response = self.ollama.chat(data)
+            print(self.ollama.describe_last_request())
             response.raise_for_status()
-            return response.json()["choices"][0]["message"]["content"]
+            content = response.json()["choices"][0]["message"]["content"]
+            # Not streamed: the first token arrives with the whole reply
+            self.tracer.mark("first_token")
+            self.tracer.mark("last_token")
+            return content
         except requests.exceptions.RequestException as e:
             return f"Error getting AI response: {str(e)}"
 
-    def setup_tts_engine(self):
-
-        try:
-            self.engine = pyttsx3.init()
-
-            # Get available voices
-            voices = self.engine.getProperty("voices")
-
-            # Find and set English voice
-            english_voice = None
-            for voice in voices:
-                # Print voice information for debugging
-                print(f"Voice ID: {voice.id}")
-                print(f"Voice Name: {voice.name}")
-                print(f"Voice Languages: {voice.languages}")
-                print("---")
-
-                # Try to find an English voice
-                if "EN" in voice.id.upper():
-                    english_voice = voice
-                    break
-
-            if english_voice:
-                self.engine.setProperty("voice", english_voice.id)
-                print(f"Selected voice: {english_voice.name}")
-            else:
-                print("No English voice found, using default voice")
-
-            # Set default properties
-            self.engine.setProperty("rate", 150)  # Speed of speech
-            self.engine.setProperty("volume", 1.0)  # Volume (0.0 to 1.0)
-
-        except Exception as e:
-            print(f"Error initializing TTS engine: {str(e)}")
-            self.status_label.configure(text="TTS initialization failed")
+    def warm_backends(self):
+        # The window is up: open the microphone and load the speech engines
+        # off the Tk thread
+        PROFILE.mark("window shown")
+        PROFILE.report("window shown")
+        self.devices.warm_load()
+        self.engine.stt.warm_load()
+        self.tts.start()
+        if PROFILE.enabled:
+            Thread(target=self.report_backends_warm, daemon=True).start()
+
+    def report_backends_warm(self):
+        self.devices.ready.wait()
+        self.engine.stt.wait_loaded()
+        self.tts.ready.wait()
+        PROFILE.report("backends warm")
 
     def update_voice_settings(self):
         try:
-            # Update the TTS engine settings based on the current values of speed and volume
-            self.engine.setProperty("rate", self.speed_var.get())
-            self.engine.setProperty("volume", self.volume_var.get())
+            # The TTS worker applies the new speed and volume between utterances
+            self.tts.set_rate(self.speed_var.get())
+            self.tts.set_volume(self.volume_var.get())
             self.status_label.configure(text="Voice settings updated")
         except Exception as e:
             self.status_label.configure(text=f"Error updating voice settings: {str(e)}")
 
     def speak_text(self, text):
-        try:
-            # Run speech in a separate thread to prevent GUI freezing
-            def speak():
-                self.engine.say(text)
-                self.engine.runAndWait()
+        # Queue speech without waiting for it
+        self.tts.speak(text, wait=False)
 
-            Thread(target=speak).start()
+    def speak_text_blocking(self, text):
+        try:
+            self.tracer.mark("tts_start")
+            self.tts.speak(text)
+            self.tracer.mark("playback_end")
         except Exception as e:
-            self.status_label.configure(text=f"TTS Error: {str(e)}")
+            self.set_status(f"TTS Error: {str(e)}")
 
     def display_message(self, message):
         self.chat_display.insert(tk.END, message + "\n\n")
@@ -411,6 +482,16 @@ class EnglishPracticeApp:
 
 
 if __name__ == "__main__":
-    root = tk.Tk()
-    app = EnglishPracticeApp(root)
+    parser = argparse.ArgumentParser(description="English speaking practice with AI")
+    parser.add_argument(
+        "--startup-profile",
+        action="store_true",
+        help="print how long each startup phase took",
+    )
+    PROFILE.enabled = parser.parse_args().startup_profile
+
+    with PROFILE.phase("create window"):
+        root = tk.Tk()
+    with PROFILE.phase("build app"):
+        app = EnglishPracticeApp(root)
     root.mainloop()
@@ -0,0 +1,88 @@
+import time
+from threading import Lock, Thread
+
+# Ollama reports load_duration in nanoseconds; anything above this means the
+# model had to be loaded for the request
+COLD_LOAD_NS = 250_000_000
+
+
+class ModelManager:
+    """Picks the Ollama model and keeps it resident for the session.
+
+    Every request carries keep_alive so Ollama does not unload the model
+    between turns, and warm_up() loads it in the background when the app
+    starts or a scenario is picked, so the learner's first turn does not pay
+    the load time.
+    """
+
+    def __init__(self, client, model, keep_alive="30m", rewarm_after=60):
+        self.client = client
+        self.model = model
+        self.keep_alive = keep_alive
+        self.rewarm_after = rewarm_after
+        self.lock = Lock()
+        self.warming = False
+        self.last_used = None  # perf_counter() of the last successful request
+
+    @classmethod
+    def from_config(cls, client, config, default_model):
+        return cls(
+            client,
+            config["ollama_model"] or default_model,
+            keep_alive=config["ollama_keep_alive"],
+        )
+
+    def payload(self, messages, stream):
+        return {
+            "model": self.model,
+            "messages": messages,
+            "stream": stream,
+            "keep_alive": self.keep_alive,
+        }
+
+    def warm_up(self):
+        with self.lock:
+            recently_used = (
+                self.last_used is not None
+                and time.perf_counter() - self.last_used < self.rewarm_after
+            )
+            if self.warming or recently_used:
+                return
+            self.warming = True
+        Thread(target=self.run_warm_up, daemon=True).start()
+
+    def run_warm_up(self):
+        start = time.perf_counter()
+        try:
+            # A chat request without messages just loads the model
+            response = self.client.chat(self.payload([], stream=False))
+            response.raise_for_status()
+            load_ns = response.json().get("load_duration", 0)
+            self.mark_used()
+            print(
+                f"Model {self.model} warmed up in "
+                f"{(time.perf_counter() - start) * 1000:.0f} ms "
+                f"(load {load_ns / 1e6:.0f} ms)"
+            )
+        except Exception as e:
+            print(f"Error warming up model {self.model}: {str(e)}")
+        finally:
+            with self.lock:
+                self.warming = False
+
+    def mark_used(self):
+        with self.lock:
+            self.last_used = time.perf_counter()
+
+    def record_response(self, first_token_seconds, load_duration_ns):
+        """Log whether a reply hit a cold or warm model; returns the text."""
+        self.mark_used()
+        state = "cold" if (load_duration_ns or 0) > COLD_LOAD_NS else "warm"
+        text = (
+            f"Model {self.model} ({state}): first token after "
+            f"{first_token_seconds * 1000:.0f} ms"
+        )
+        if state == "cold":
+            text += f", {load_duration_ns / 1e6:.0f} ms spent loading"
+        print(text)
+        return text
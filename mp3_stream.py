@@ -0,0 +1,104 @@
+# MPEG audio layer III tables, indexed by the header fields
+BITRATES_KBPS = {
+    "mpeg1": [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    "mpeg2": [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+SAMPLE_RATES = {
+    3: [44100, 48000, 32000],  # MPEG-1
+    2: [22050, 24000, 16000],  # MPEG-2
+    0: [11025, 12000, 8000],  # MPEG-2.5
+}
+HEADER_SIZE = 4
+
+
+def parse_frame_header(header):
+    """(frame_bytes, samples, sample_rate) of a layer III frame header, or None."""
+    if len(header) < HEADER_SIZE:
+        return None
+    if header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return None
+    version = (header[1] >> 3) & 0x03
+    layer = (header[1] >> 1) & 0x03
+    bitrate_index = header[2] >> 4
+    rate_index = (header[2] >> 2) & 0x03
+    padding = (header[2] >> 1) & 0x01
+    if version == 1 or layer != 1 or rate_index == 3:
+        return None
+    if bitrate_index in (0, 15):
+        return None
+
+    sample_rate = SAMPLE_RATES[version][rate_index]
+    if version == 3:
+        bitrate = BITRATES_KBPS["mpeg1"][bitrate_index] * 1000
+        samples = 1152
+    else:
+        bitrate = BITRATES_KBPS["mpeg2"][bitrate_index] * 1000
+        samples = 576
+    frame_bytes = samples // 8 * bitrate // sample_rate + padding
+    return frame_bytes, samples, sample_rate
+
+
+class Mp3Chunker:
+    """Cuts a streamed MP3 into segments that can be decoded on their own.
+
+    Segments end on frame boundaries. The first one is emitted as soon as
+    first_ms of audio has arrived, later ones once segment_ms has built up.
+    Layer III frames may borrow bits from the frames before them, so each
+    segment after the first starts with prime_frames already played frames;
+    feed() and flush() return (audio, skip_seconds) pairs and the player
+    drops skip_seconds of decoded audio from the start of the segment.
+    """
+
+    def __init__(self, first_ms=300, segment_ms=1000, prime_frames=2):
+        self.first_ms = first_ms
+        self.segment_ms = segment_ms
+        self.prime_frames = prime_frames
+        self.buffer = bytearray()
+        self.frames = []  # complete frames not yet emitted
+        self.frames_ms = 0.0
+        self.played = []  # last emitted frames, used to prime the next segment
+        self.emitted = 0
+
+    def feed(self, data):
+        self.buffer.extend(data)
+        self.split_frames()
+        target_ms = self.segment_ms if self.emitted else self.first_ms
+        if self.frames_ms >= target_ms:
+            return [self.emit()]
+        return []
+
+    def flush(self):
+        # A partial frame at the very end cannot be decoded; drop it
+        self.split_frames()
+        self.buffer.clear()
+        if self.frames:
+            return [self.emit()]
+        return []
+
+    def split_frames(self):
+        pos = 0
+        while len(self.buffer) - pos >= HEADER_SIZE:
+            header = parse_frame_header(self.buffer[pos : pos + HEADER_SIZE])
+            if header is None:
+                # Not a frame start, e.g. a tag; resynchronize byte by byte
+                pos += 1
+                continue
+            frame_bytes, samples, sample_rate = header
+            if len(self.buffer) - pos < frame_bytes:
+                break
+            frame = bytes(self.buffer[pos : pos + frame_bytes])
+            self.frames.append((frame, samples / sample_rate))
+            self.frames_ms += samples * 1000 / sample_rate
+            pos += frame_bytes
+        del self.buffer[:pos]
+
+    def emit(self):
+        prime = self.played[-self.prime_frames :] if self.prime_frames else []
+        audio = b"".join(frame for frame, _ in prime + self.frames)
+        skip_seconds = sum(seconds for _, seconds in prime)
+        if self.prime_frames:
+            self.played = (prime + self.frames)[-self.prime_frames :]
+        self.frames = []
+        self.frames_ms = 0.0
+        self.emitted += 1
+        return audio, skip_seconds
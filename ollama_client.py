@@ -0,0 +1,149 @@
+import time
+from collections import deque
+from threading import Lock, local
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+
+class CountingAdapter(HTTPAdapter):
+    """HTTPAdapter that counts the TCP connections each thread opens.
+
+    Connecting happens on the thread making the request, so a request opened
+    a new connection exactly when opened_here() went up across it, whatever
+    requests other threads have in flight.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.local = local()
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": self.counting_pool(HTTPConnectionPool, HTTPConnection),
+            "https": self.counting_pool(HTTPSConnectionPool, HTTPSConnection),
+        }
+
+    def counting_pool(self, pool_class, connection_class):
+        counts = self.local
+
+        class CountingConnection(connection_class):
+            def connect(self):
+                counts.opened = getattr(counts, "opened", 0) + 1
+                super().connect()
+
+        class CountingPool(pool_class):
+            ConnectionCls = CountingConnection
+
+        return CountingPool
+
+    def opened_here(self):
+        return getattr(self.local, "opened", 0)
+
+
+class OllamaClient:
+    """Shared HTTP client for all Ollama traffic.
+
+    Keeps a pooled keep-alive requests.Session so turns reuse the same TCP
+    connection instead of opening a new one, applies connect/read timeouts,
+    and records whether each request reused a pooled connection.
+    """
+
+    def __init__(
+        self,
+        endpoint,
+        connect_timeout=3.05,
+        read_timeout=120,
+        pool_size=4,
+        headers=None,
+    ):
+        self.endpoint = endpoint
+        self.timeout = (connect_timeout, read_timeout)
+
+        self.session = requests.Session()
+        self.adapter = CountingAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+        self.session.headers["Connection"] = "keep-alive"
+        if headers:
+            self.session.headers.update(headers)
+
+        self.lock = Lock()
+        self.total_requests = 0
+        self.reused_connections = 0
+        self.recent = deque(maxlen=50)  # Per-request stats, newest last
+
+    @classmethod
+    def from_config(cls, config, endpoint=None, headers=None):
+        return cls(
+            endpoint or config["ollama_endpoint"],
+            connect_timeout=config["ollama_connect_timeout"],
+            read_timeout=config["ollama_read_timeout"],
+            pool_size=config["ollama_pool_size"],
+            headers=headers,
+        )
+
+    def connections_opened(self):
+        # Total TCP connections the pool manager has ever opened
+        pools = self.adapter.poolmanager.pools
+        return sum(pools[key].num_connections for key in pools.keys())
+
+    def chat(self, payload, stream=False):
+        """POST payload to the chat endpoint and return the response.
+
+        Streaming responses must be closed (or fully read) by the caller so
+        the connection goes back to the pool.
+        """
+        opened_before = self.adapter.opened_here()
+        start = time.perf_counter()
+        response = self.session.post(
+            self.endpoint, json=payload, stream=stream, timeout=self.timeout
+        )
+        elapsed = time.perf_counter() - start
+
+        # No new connection was opened on this thread, so the request used a
+        # pooled one
+        reused = self.adapter.opened_here() == opened_before
+        with self.lock:
+            self.total_requests += 1
+            self.reused_connections += reused
+            self.recent.append(
+                {
+                    "request": self.total_requests,
+                    "reused_connection": reused,
+                    "status": response.status_code,
+                    "seconds_to_headers": round(elapsed, 4),
+                    "model": payload.get("model"),
+                }
+            )
+        return response
+
+    @property
+    def last_request(self):
+        return self.recent[-1] if self.recent else None
+
+    def stats(self):
+        with self.lock:
+            return {
+                "requests": self.total_requests,
+                "reused_connections": self.reused_connections,
+                "new_connections": self.total_requests - self.reused_connections,
+                "connections_opened": self.connections_opened(),
+            }
+
+    def describe_last_request(self):
+        last = self.last_request
+        if last is None:
+            return "Ollama: no requests yet"
+        state = "reused" if last["reused_connection"] else "new"
+        return (
+            f"Ollama request #{last['request']}: {state} connection, "
+            f"{last['seconds_to_headers'] * 1000:.0f} ms to headers, "
+            f"{self.reused_connections}/{self.total_requests} reused so far"
+        )
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,180 @@
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock, Thread
+
+
+def opener_key(model, system_prompt, initial_prompt):
+    prompt = f"{system_prompt or ''}\n{initial_prompt}"
+    return f"{model}:{hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:16]}"
+
+
+class OpenerCache:
+    """Pre-generated scenario openers, persisted on disk.
+
+    Entries are keyed by model and prompt hash and hold a few opener
+    variants that are served in rotation. Entries expire after ttl_seconds
+    and the least recently used ones are evicted beyond max_entries. The
+    rotation is written back with the next pregenerated entry or on close().
+    """
+
+    def __init__(
+        self,
+        models,
+        path="opener_cache.json",
+        variants=3,
+        ttl_seconds=7 * 24 * 3600,
+        max_entries=64,
+        workers=2,
+    ):
+        self.models = models
+        self.path = path
+        self.variants = variants
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.workers = workers
+        self.lock = Lock()
+        self.entries = self.load()
+        self.dirty = False  # Served openers not written to disk yet
+
+    @classmethod
+    def from_config(cls, models, config):
+        return cls(
+            models,
+            path=config["opener_cache_path"],
+            variants=config["opener_variants"],
+            ttl_seconds=config["opener_cache_ttl_hours"] * 3600,
+            max_entries=config["opener_cache_max_entries"],
+            workers=config["opener_workers"],
+        )
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error reading opener cache: {str(e)}")
+            return {}
+
+    def save(self):
+        # Called with the lock held; write to a temp file and swap it in
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f, indent=1)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Error writing opener cache: {str(e)}")
+            return
+        self.dirty = False
+
+    def close(self):
+        with self.lock:
+            if self.dirty:
+                self.save()
+
+    def evict(self):
+        now = time.time()
+        for key in list(self.entries):
+            if now - self.entries[key]["created"] > self.ttl_seconds:
+                del self.entries[key]
+        if len(self.entries) > self.max_entries:
+            by_use = sorted(self.entries, key=lambda k: self.entries[k]["last_used"])
+            for key in by_use[: len(self.entries) - self.max_entries]:
+                del self.entries[key]
+
+    def peek(self, system_prompt, initial_prompt):
+        """The opener get() would return next, without using it up."""
+        key = opener_key(self.models.model, system_prompt, initial_prompt)
+        with self.lock:
+            entry = self.entries.get(key)
+            if not entry or time.time() - entry["created"] > self.ttl_seconds:
+                return None
+            return entry["variants"][entry["next"] % len(entry["variants"])]
+
+    def get(self, system_prompt, initial_prompt):
+        key = opener_key(self.models.model, system_prompt, initial_prompt)
+        with self.lock:
+            entry = self.entries.get(key)
+            if not entry or time.time() - entry["created"] > self.ttl_seconds:
+                return None
+            # Rotate through the variants so repeat sessions differ
+            opener = entry["variants"][entry["next"] % len(entry["variants"])]
+            entry["next"] += 1
+            entry["last_used"] = time.time()
+            self.dirty = True
+        return opener
+
+    def generate(self, system_prompt, initial_prompt, seed):
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": initial_prompt})
+        payload = self.models.payload(messages, stream=False)
+        payload["options"] = {"seed": seed, "temperature": 0.9}
+        response = self.models.client.chat(payload)
+        response.raise_for_status()
+        return response.json()["message"]["content"].strip()
+
+    def missing(self, scenarios):
+        with self.lock:
+            self.evict()
+            return [
+                scenario
+                for scenario in scenarios.values()
+                if opener_key(
+                    self.models.model,
+                    scenario["system_prompt"],
+                    scenario["initial_prompt"],
+                )
+                not in self.entries
+            ]
+
+    def pregenerate(self, scenarios):
+        """Generate openers for every scenario that has none cached yet."""
+        todo = self.missing(scenarios)
+        if not todo:
+            return
+
+        def fill(scenario):
+            variants = []
+            for seed in range(self.variants):
+                try:
+                    variants.append(
+                        self.generate(
+                            scenario["system_prompt"], scenario["initial_prompt"], seed
+                        )
+                    )
+                except Exception as e:
+                    print(f"Error pre-generating opener: {str(e)}")
+                    break
+            if not variants:
+                return
+            key = opener_key(
+                self.models.model, scenario["system_prompt"], scenario["initial_prompt"]
+            )
+            now = time.time()
+            with self.lock:
+                self.entries[key] = {
+                    "variants": variants,
+                    "next": 0,
+                    "created": now,
+                    "last_used": now,
+                }
+                self.evict()
+                self.save()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            list(pool.map(fill, todo))
+        print(
+            f"Pre-generated openers for {len(todo)} scenarios in "
+            f"{time.perf_counter() - start:.1f} s"
+        )
+
+    def pregenerate_async(self, scenarios):
+        Thread(target=self.pregenerate, args=(scenarios,), daemon=True).start()
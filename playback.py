@@ -0,0 +1,129 @@
+import io
+import queue
+import time
+from threading import Event, Lock, Thread
+
+from startup_profile import PROFILE
+
+# Tells the feeder thread to exit
+CLOSE = object()
+
+
+class PygameSegmentPlayer:
+    """Plays in-memory MP3 segments back-to-back on one long-lived channel.
+
+    pygame is imported and the mixer initialized once, by start() or the
+    first play(), and kept open. A feeder thread
+    queues each segment on the channel as soon as its queue slot frees up, so
+    SDL starts it without a gap. The end of playback is tracked from segment
+    lengths and signalled through an Event rather than by polling the
+    mixer. stop() silences the channel and drops queued segments at once.
+    """
+
+    def __init__(self, frequency=24000, channels=1):
+        # edge-tts sends 24 kHz mono; mixing at that rate avoids resampling
+        self.frequency = frequency
+        self.channels = channels
+        self.mixer = None
+        self.channel = None
+        self.start_lock = Lock()
+        self.pending = queue.Queue()
+        self.lock = Lock()
+        self.wake = Event()
+        self.idle = Event()
+        self.idle.set()
+        self.generation = 0  # bumped by stop() to discard queued segments
+        self.slot_free_at = 0.0  # when the channel can take another segment
+        self.ends_at = 0.0  # when everything handed to the channel has played
+
+    def start(self, background=False):
+        with self.start_lock:
+            if self.channel is not None:
+                return
+            with PROFILE.phase("open pygame mixer", background):
+                import pygame
+
+                self.mixer = pygame.mixer
+                self.mixer.init(frequency=self.frequency, channels=self.channels)
+                self.mixer.set_reserved(1)
+                self.channel = self.mixer.Channel(0)
+        Thread(target=self.run, daemon=True).start()
+
+    def decode(self, audio, skip_seconds=0.0):
+        sound = self.mixer.Sound(file=io.BytesIO(audio))
+        if skip_seconds <= 0:
+            return sound
+        # Drop the priming frames the segment starts with
+        frequency, sample_format, channels = self.mixer.get_init()
+        frame_bytes = abs(sample_format) // 8 * channels
+        skip_bytes = round(skip_seconds * frequency) * frame_bytes
+        return self.mixer.Sound(buffer=sound.get_raw()[skip_bytes:])
+
+    def play(self, audio, skip_seconds=0.0):
+        self.start()
+        # Decode on the caller's thread so the feeder only ever queues
+        sound = self.decode(audio, skip_seconds)
+        with self.lock:
+            self.idle.clear()
+            self.pending.put((self.generation, sound))
+
+    def wait_done(self, timeout=None):
+        return self.idle.wait(timeout)
+
+    def stop(self):
+        with self.lock:
+            self.generation += 1
+            while not self.pending.empty():
+                self.pending.get_nowait()
+            if self.channel is not None:
+                self.channel.stop()
+            self.slot_free_at = self.ends_at = 0.0
+            self.idle.set()
+        self.wake.set()
+
+    def close(self):
+        if self.channel is None:
+            return
+        self.stop()
+        self.pending.put(CLOSE)
+        self.mixer.quit()
+        self.channel = None
+
+    def run(self):
+        while True:
+            timeout = None
+            if not self.idle.is_set():
+                timeout = max(0.0, self.ends_at - time.perf_counter())
+            try:
+                item = self.pending.get(timeout=timeout)
+            except queue.Empty:
+                # Everything queued has played out
+                with self.lock:
+                    if self.pending.empty():
+                        self.idle.set()
+                continue
+            if item is CLOSE:
+                return
+            self.enqueue(*item)
+
+    def enqueue(self, generation, sound):
+        length = sound.get_length()
+        while True:
+            with self.lock:
+                if generation != self.generation:
+                    return
+                now = time.perf_counter()
+                if now >= self.ends_at:
+                    self.channel.play(sound)
+                    self.slot_free_at = now
+                    self.ends_at = now + length
+                    return
+                if now >= self.slot_free_at and self.channel.get_queue() is None:
+                    self.channel.queue(sound)
+                    self.slot_free_at = self.ends_at
+                    self.ends_at += length
+                    return
+                # A channel holds one queued sound; sleep until it is taken
+                delay = max(self.slot_free_at - now, 0.002)
+            self.wake.wait(delay)
+            self.wake.clear()
@@ -0,0 +1,380 @@
+import io
+import json
+import os
+import queue
+import tempfile
+import time
+import wave
+from collections import deque
+from threading import Event, Lock, Thread
+
+from startup_profile import PROFILE
+from tts_cache import speech_key
+from turn_trace import percentile
+
+
+def pyttsx3_key(engine, text):
+    return speech_key(
+        "pyttsx3",
+        engine.getProperty("voice"),
+        engine.getProperty("rate"),
+        engine.getProperty("volume"),
+        text,
+    )
+
+
+def render_wav(engine, text):
+    """Synthesize text with the engine's current settings, returning WAV bytes."""
+    fd, path = tempfile.mkstemp(suffix=".wav")
+    os.close(fd)
+    try:
+        engine.save_to_file(text, path)
+        engine.runAndWait()
+        with open(path, "rb") as f:
+            return f.read()
+    finally:
+        os.remove(path)
+
+
+def play_wav(audio, stop_event=None, p=None):
+    """Play WAV bytes on the default output device, blocking until done.
+
+    Returns early, within one 1024-frame block, once stop_event is set.
+    Returns the fraction of the clip that was played. p is a PyAudio
+    instance to play through; without one a temporary one is opened.
+    """
+    if p is None:
+        import pyaudio
+
+        p = pyaudio.PyAudio()
+        try:
+            return play_wav(audio, stop_event, p)
+        finally:
+            p.terminate()
+
+    with wave.open(io.BytesIO(audio), "rb") as wf:
+        total = wf.getnframes()
+        stream = p.open(
+            format=p.get_format_from_width(wf.getsampwidth()),
+            channels=wf.getnchannels(),
+            rate=wf.getframerate(),
+            output=True,
+        )
+        frame_bytes = wf.getsampwidth() * wf.getnchannels()
+        played = 0
+        try:
+            data = wf.readframes(1024)
+            while data and not (stop_event and stop_event.is_set()):
+                stream.write(data)
+                played += len(data) // frame_bytes
+                data = wf.readframes(1024)
+        finally:
+            stream.stop_stream()
+            stream.close()
+    return played / total if total else 1.0
+
+
+def select_english_voice(engine):
+    voices = engine.getProperty("voices")
+
+    # Find and set English voice
+    english_voice = None
+    for voice in voices:
+        # Print voice information for debugging
+        print(f"Voice ID: {voice.id}")
+        print(f"Voice Name: {voice.name}")
+        print(f"Voice Languages: {voice.languages}")
+        print("---")
+
+        # Try to find an English voice
+        if "EN" in voice.id.upper():
+            english_voice = voice
+            break
+
+    if english_voice:
+        engine.setProperty("voice", english_voice.id)
+        print(f"Selected voice: {english_voice.name}")
+    else:
+        print("No English voice found, using default voice")
+    return english_voice.id if english_voice else None
+
+
+def load_voice(engine, path):
+    """Set the voice chosen on an earlier launch, skipping the enumeration.
+
+    The voice is chosen again, and the file rewritten, when it is missing
+    or names a voice the engine no longer has.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            voice = json.load(f)["voice"]
+        if voice:
+            engine.setProperty("voice", voice)
+            print(f"Using cached voice: {voice}")
+            return voice
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    except Exception as e:
+        # Drivers raise their own errors for unknown voice ids
+        print(f"Cached voice unavailable: {str(e)}")
+
+    voice = select_english_voice(engine)
+    try:
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"voice": voice}, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Error saving voice cache: {str(e)}")
+    return voice
+
+
+def heard_prefix(text, fraction):
+    # Words spoken in the first fraction of the clip, roughly
+    if fraction >= 1.0:
+        return text
+    cut = text[: int(len(text) * fraction)]
+    return cut.rsplit(" ", 1)[0] if " " in cut else ""
+
+
+class Pyttsx3Worker:
+    """Owns the pyttsx3 engine on one long-lived thread.
+
+    pyttsx3 engines are not thread-safe, so every other thread talks to the
+    engine through a bounded command queue. Rate and volume changes are
+    coalesced and applied between utterances; stop() cuts the current
+    utterance short and drops the queued ones. Speech is rendered to WAV
+    and played with PyAudio, through the TTS cache when one is given;
+    synthesize() returns the WAV without playing it.
+
+    The thread, and with it the pyttsx3 import and engine setup, starts on
+    start() or the first speak(). With voice_cache_path the chosen voice is
+    remembered between launches. Per-utterance timings are kept in recent;
+    log_utterances also prints them.
+    """
+
+    audio_format = "wav"
+
+    def __init__(
+        self,
+        cache=None,
+        max_queue=8,
+        rate=150,
+        volume=1.0,
+        voice_cache_path=None,
+        log_utterances=False,
+    ):
+        self.cache = cache
+        self.voice_cache_path = voice_cache_path
+        self.log_utterances = log_utterances
+        self.commands = queue.Queue(maxsize=max_queue)
+        self.lock = Lock()
+        self.properties = {"rate": rate, "volume": volume}
+        self.properties_pending = True
+        self.stopping = Event()
+        self.stopped_at = 0.0  # perf_counter() of the last stop()
+        self.ready = Event()
+        self.error = None
+        self.recent = deque(maxlen=50)  # per-utterance timings
+        self.last_utterance = None
+        self.on_first_audio = None  # Called on the worker thread per utterance
+        self.pyaudio = None  # Opened on the first utterance, kept until close
+        self.thread = None
+
+    def start(self):
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.thread = Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+    def speak(self, text, wait=True):
+        """Queue text; with wait, block until it has been spoken or stopped."""
+        self.start()
+        self.ready.wait()
+        if self.error:
+            raise RuntimeError(f"TTS engine unavailable: {self.error}")
+        done = Event()
+        self.commands.put(("speak", text, done, time.perf_counter()))
+        if wait:
+            done.wait()
+        return done
+
+    def synthesize(self, text):
+        """Render text to WAV bytes on the engine thread, without playing it."""
+        self.start()
+        self.ready.wait()
+        if self.error:
+            raise RuntimeError(f"TTS engine unavailable: {self.error}")
+        done = Event()
+        result = {}
+        self.commands.put(("render", text, done, result))
+        done.wait()
+        if "error" in result:
+            raise result["error"]
+        return result["audio"]
+
+    def set_rate(self, rate):
+        self.set_property("rate", rate)
+
+    def set_volume(self, volume):
+        self.set_property("volume", volume)
+
+    def set_property(self, name, value):
+        # Never blocks the Tk thread; at most one update is ever queued
+        with self.lock:
+            self.properties[name] = value
+            if self.properties_pending:
+                return
+            self.properties_pending = True
+        try:
+            self.commands.put_nowait(("properties",))
+        except queue.Full:
+            pass  # Applied before the next utterance anyway
+
+    def stop(self):
+        with self.lock:
+            self.stopped_at = time.perf_counter()
+            self.stopping.set()
+        kept = []
+        while True:
+            try:
+                command = self.commands.get_nowait()
+            except queue.Empty:
+                break
+            if command[0] == "speak":
+                command[2].set()
+            elif command[0] == "render":
+                kept.append(command)  # Someone is waiting for the audio
+            elif command[0] == "close":
+                kept.append(command)
+                break
+        for command in kept:
+            self.commands.put(command)
+
+    def close(self):
+        self.stop()
+        self.commands.put(("close",))
+
+    def queue_depth(self):
+        return self.commands.qsize()
+
+    def run(self):
+        try:
+            with PROFILE.phase("start pyttsx3", background=True):
+                import pyttsx3
+
+                self.engine = pyttsx3.init()
+                if self.voice_cache_path:
+                    load_voice(self.engine, self.voice_cache_path)
+                else:
+                    select_english_voice(self.engine)
+        except Exception as e:
+            print(f"Error initializing TTS engine: {str(e)}")
+            self.error = str(e)
+            return
+        finally:
+            self.ready.set()
+
+        while True:
+            command = self.commands.get()
+            if command[0] == "close":
+                if self.pyaudio is not None:
+                    self.pyaudio.terminate()
+                return
+            self.apply_properties()
+            if command[0] == "speak":
+                _, text, done, queued_at = command
+                with self.lock:
+                    # A stop() since the speak was queued still applies to
+                    # it; only a speak queued after the last stop starts over
+                    if queued_at > self.stopped_at:
+                        self.stopping.clear()
+                try:
+                    self.say(text, queued_at)
+                except Exception as e:
+                    print(f"TTS error: {str(e)}")
+                finally:
+                    done.set()
+            elif command[0] == "render":
+                _, text, done, result = command
+                try:
+                    result["audio"] = self.render(text)
+                except Exception as e:
+                    result["error"] = e
+                finally:
+                    done.set()
+
+    def apply_properties(self):
+        with self.lock:
+            if not self.properties_pending:
+                return
+            properties = dict(self.properties)
+            self.properties_pending = False
+        for name, value in properties.items():
+            self.engine.setProperty(name, value)
+
+    def render(self, text):
+        if self.cache is None:
+            return render_wav(self.engine, text)
+        # Render to a clip once, then replay it for repeated phrases
+        return self.cache.fetch(
+            pyttsx3_key(self.engine, text), lambda: render_wav(self.engine, text)
+        )
+
+    def say(self, text, queued_at):
+        start = time.perf_counter()
+        audio = self.render(text)
+        synthesized = time.perf_counter()
+        played = 0.0
+        if not self.stopping.is_set():
+            if self.pyaudio is None:
+                import pyaudio
+
+                self.pyaudio = pyaudio.PyAudio()
+            if self.on_first_audio:
+                self.on_first_audio()
+            played = play_wav(audio, self.stopping, self.pyaudio)
+
+        self.last_utterance = {
+            "text": text,
+            "chars": len(text),
+            "queue_ms": (start - queued_at) * 1000,
+            "synthesis_ms": (synthesized - start) * 1000,
+            "playback_ms": (time.perf_counter() - synthesized) * 1000,
+            "stopped": self.stopping.is_set(),
+            "heard_text": heard_prefix(text, played),
+            "queue_depth": self.queue_depth(),
+        }
+        self.recent.append(self.last_utterance)
+        if self.log_utterances:
+            print(self.describe_last_utterance())
+            if self.cache is not None:
+                print(self.cache.describe())
+
+    def heard_text(self, text):
+        """How much of text the learner heard before speech was stopped."""
+        last = self.last_utterance
+        if last is None or last["text"] != text:
+            return ""  # Dropped from the queue before it was spoken
+        return last["heard_text"]
+
+    def stats(self):
+        synthesis = [u["synthesis_ms"] for u in self.recent]
+        return {
+            "utterances": len(self.recent),
+            "queue_depth": self.queue_depth(),
+            "synthesis_ms_p50": percentile(synthesis, 50) if synthesis else None,
+            "synthesis_ms_max": max(synthesis) if synthesis else None,
+        }
+
+    def describe_last_utterance(self):
+        last = self.last_utterance
+        if last is None:
+            return "TTS: nothing spoken yet"
+        state = ", stopped" if last["stopped"] else ""
+        return (
+            f"TTS: {last['synthesis_ms']:.0f} ms to synthesize {last['chars']} chars "
+            f"after {last['queue_ms']:.0f} ms queued, "
+            f"{last['queue_depth']} waiting{state}"
+        )
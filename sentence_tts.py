@@ -0,0 +1,238 @@
+import asyncio
+import queue
+import re
+import time
+from threading import Event, Lock, Thread
+
+from mp3_stream import Mp3Chunker
+
+# End of a sentence: terminal punctuation (plus closing quotes/brackets)
+# followed by whitespace, or a line break
+SENTENCE_END = re.compile(r"[.!?]+[\"')\]]*\s+|\n+")
+
+# Words ending in a period that do not end a sentence
+ABBREVIATIONS = {"mr.", "mrs.", "ms.", "dr.", "st.", "vs.", "etc.", "e.g.", "i.e."}
+
+# Marks the end of a turn in the synthesis and playback queues
+END_OF_TURN = object()
+
+
+class SentenceSegmenter:
+    """Splits a stream of LLM tokens into sentences as soon as they complete."""
+
+    def __init__(self, min_chars=12):
+        self.min_chars = min_chars
+        self.buffer = ""
+
+    def reset(self):
+        self.buffer = ""
+
+    def feed(self, text):
+        self.buffer += text
+        sentences = []
+        start = 0
+        for match in SENTENCE_END.finditer(self.buffer):
+            candidate = self.buffer[start : match.end()].strip()
+            last_word = candidate.split()[-1].lower() if candidate else ""
+            # Keep very short fragments and abbreviations with what follows
+            if len(candidate) < self.min_chars or last_word in ABBREVIATIONS:
+                continue
+            sentences.append(candidate)
+            start = match.end()
+        self.buffer = self.buffer[start:]
+        return sentences
+
+    def flush(self):
+        rest = self.buffer.strip()
+        self.buffer = ""
+        return rest
+
+
+class SentenceSpeaker:
+    """Speaks an LLM reply sentence by sentence while it is still generating.
+
+    Each completed sentence goes to the synthesis worker right away and the
+    synthesized segments are handed to the player in order, which plays them
+    back-to-back. synthesize is an async generator function yielding the MP3
+    audio of a text as it streams in; playback of a sentence starts once
+    start_ms of it has arrived, without waiting for the rest. stop() cuts
+    the reply off, e.g. when the learner starts talking over it.
+    """
+
+    def __init__(self, synthesize, player, on_first_audio=None, start_ms=300):
+        self.synthesize = synthesize
+        self.player = player
+        self.on_first_audio = on_first_audio
+        self.start_ms = start_ms
+        self.segmenter = SentenceSegmenter()
+        self.sentences = queue.Queue()
+        self.segments = queue.Queue()
+        self.done = Event()
+        self.done.set()
+        self.has_text = False  # A sentence of this turn went to synthesis
+        self.fed = False  # Any text of this turn was fed, complete or not
+        self.turn_start = None
+        self.time_to_first_audio = None
+        # Ahead-of-time synthesis for the text of the last prepare() call:
+        # sentence -> audio once it is ready, and the sentences still wanted
+        self.prepared = {}
+        self.preparing = set()
+        self.prepare_lock = Lock()
+        self.lock = Lock()
+        self.turn = 0  # queued work from earlier turns is dropped
+        self.interrupted = False
+        self.spoken = []  # sentences of this turn whose audio has started
+
+        Thread(target=self.run_synthesis, daemon=True).start()
+        Thread(target=self.run_playback, daemon=True).start()
+
+    def begin_turn(self):
+        # Time to first audio is measured from here, i.e. the LLM request
+        self.segmenter.reset()
+        with self.lock:
+            self.turn += 1
+            self.interrupted = False
+            self.spoken = []
+        self.has_text = False
+        self.fed = False
+        self.turn_start = time.perf_counter()
+        self.time_to_first_audio = None
+        self.done.clear()
+
+    def feed(self, text):
+        self.fed = True
+        if self.interrupted:
+            return
+        for sentence in self.segmenter.feed(text):
+            self.sentences.put((self.turn, sentence))
+            self.has_text = True
+
+    def finish(self):
+        if self.interrupted:
+            return
+        rest = self.segmenter.flush()
+        if rest:
+            self.sentences.put((self.turn, rest))
+            self.has_text = True
+        self.sentences.put((self.turn, END_OF_TURN))
+
+    def stop(self):
+        """Silence the reply now and cancel the synthesis still pending."""
+        with self.lock:
+            self.turn += 1
+            self.interrupted = True
+            self.player.stop()
+        self.done.set()
+
+    def heard_text(self):
+        # The last sentence may only have been heard in part
+        return " ".join(self.spoken)
+
+    def wait(self):
+        self.done.wait()
+        return self.time_to_first_audio
+
+    def prepare(self, text):
+        """Synthesize text in the background so speaking it later is instant.
+
+        Only the last text prepared is kept; audio of earlier ones is dropped.
+        """
+        segmenter = SentenceSegmenter()
+        sentences = [s for s in segmenter.feed(text) + [segmenter.flush()] if s]
+        with self.prepare_lock:
+            self.prepared = {}
+            self.preparing = set(sentences)
+
+        async def collect(sentence):
+            audio = bytearray()
+            async for chunk in self.synthesize(sentence):
+                audio.extend(chunk)
+            return bytes(audio)
+
+        def run():
+            loop = asyncio.new_event_loop()
+            for sentence in sentences:
+                # Already spoken, or another text was prepared since
+                with self.prepare_lock:
+                    if sentence not in self.preparing:
+                        continue
+                try:
+                    audio = loop.run_until_complete(collect(sentence))
+                except Exception as e:
+                    print(f"TTS: could not prepare {sentence!r}: {str(e)}")
+                    continue
+                with self.prepare_lock:
+                    if sentence in self.preparing:
+                        self.preparing.discard(sentence)
+                        self.prepared[sentence] = audio
+            loop.close()
+
+        Thread(target=run, daemon=True).start()
+
+    async def stream_sentence(self, turn, sentence):
+        # A fresh chunker per sentence keeps every utterance's audio separate
+        chunker = Mp3Chunker(first_ms=self.start_ms)
+        segments = []
+        # Not ready yet: synthesize it here and let the late result go
+        with self.prepare_lock:
+            audio = self.prepared.pop(sentence, None)
+            self.preparing.discard(sentence)
+        if audio is not None:
+            segments = chunker.feed(audio)
+        else:
+            stream = self.synthesize(sentence)
+            async for chunk in stream:
+                if turn != self.turn:
+                    await stream.aclose()
+                    return
+                for segment in chunker.feed(chunk):
+                    self.segments.put((turn, sentence, segment))
+                    sentence = None  # Only the first segment starts it
+        for segment in segments + chunker.flush():
+            self.segments.put((turn, sentence, segment))
+            sentence = None
+
+    def run_synthesis(self):
+        loop = asyncio.new_event_loop()
+        while True:
+            turn, sentence = self.sentences.get()
+            if turn != self.turn:
+                continue  # Left over from a reply that was cut off
+            if sentence is END_OF_TURN:
+                self.segments.put((turn, None, END_OF_TURN))
+                continue
+            try:
+                loop.run_until_complete(self.stream_sentence(turn, sentence))
+            except Exception as e:
+                print(f"TTS: could not synthesize {sentence!r}: {str(e)}")
+
+    def run_playback(self):
+        started_turn = None
+        while True:
+            turn, sentence, segment = self.segments.get()
+            if turn != self.turn:
+                continue
+            if segment is END_OF_TURN:
+                if started_turn == turn:
+                    self.player.wait_done()
+                if turn == self.turn:
+                    self.done.set()
+                continue
+
+            if started_turn != turn:
+                started_turn = turn
+                self.time_to_first_audio = time.perf_counter() - self.turn_start
+                ttfa_ms = self.time_to_first_audio * 1000
+                print(f"TTS: time to first audio {ttfa_ms:.0f} ms")
+                if self.on_first_audio:
+                    self.on_first_audio(self.time_to_first_audio)
+            with self.lock:
+                # stop() may have run since the check above
+                if turn != self.turn:
+                    continue
+                if sentence:
+                    self.spoken.append(sentence)
+                try:
+                    self.player.play(*segment)
+                except Exception as e:
+                    print(f"TTS: playback error: {str(e)}")
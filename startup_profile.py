@@ -0,0 +1,51 @@
+import time
+from contextlib import contextmanager
+from threading import Lock
+
+
+class StartupProfile:
+    """Per-phase timings of application startup.
+
+    Phases are always recorded, which costs next to nothing; report() only
+    prints when the app was started with --startup-profile. Offsets are
+    measured from when this module was first imported. Backends are
+    imported inside the phase that first needs them, so their import time
+    is part of that phase.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.started = time.perf_counter()
+        self.lock = Lock()
+        self.phases = []  # (name, offset s, duration s, background)
+
+    @contextmanager
+    def phase(self, name, background=False):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter() - start, background)
+
+    def mark(self, name):
+        self.record(name, time.perf_counter(), 0.0, False)
+
+    def record(self, name, start, duration, background):
+        with self.lock:
+            self.phases.append((name, start - self.started, duration, background))
+
+    def report(self, title):
+        if not self.enabled:
+            return
+        with self.lock:
+            phases = sorted(self.phases, key=lambda phase: phase[1])
+        print(f"Startup profile, {title}:")
+        for name, offset, duration, background in phases:
+            where = "background" if background else ""
+            print(
+                f"  at {offset * 1000:6.0f} ms  {duration * 1000:6.0f} ms  "
+                f"{name} {where}".rstrip()
+            )
+
+
+PROFILE = StartupProfile()
@@ -0,0 +1,182 @@
+import json
+import queue
+from threading import Event, Thread
+
+
+class StreamingRecognizer:
+    """Interface for engines that can transcribe audio while it is recorded.
+
+    start() is called at the beginning of each turn, accept() with every PCM
+    chunk (returning the current partial transcript, if any) and finish()
+    once the audio has ended (returning the final transcript). A recognizer
+    is used for one turn at a time; fresh() gives another one for the next
+    turn, sharing whatever is slow to load.
+    """
+
+    name = "base"
+
+    def fresh(self):
+        raise NotImplementedError
+
+    def start(self, sample_rate):
+        raise NotImplementedError
+
+    def accept(self, data):
+        raise NotImplementedError
+
+    def finish(self):
+        raise NotImplementedError
+
+
+class VoskStreamingRecognizer(StreamingRecognizer):
+    """Offline streaming recognition with a local Vosk/Kaldi model."""
+
+    name = "vosk"
+
+    def __init__(self, model_path=None, model=None):
+        if model is None:
+            from vosk import Model
+
+            # Loading the model is slow, so do it once and reuse it every turn
+            model = Model(model_path)
+        self.model = model
+        self.recognizer = None
+        self.segments = []
+
+    def fresh(self):
+        return VoskStreamingRecognizer(model=self.model)
+
+    def start(self, sample_rate):
+        from vosk import KaldiRecognizer
+
+        self.recognizer = KaldiRecognizer(self.model, sample_rate)
+        self.segments = []
+
+    def accept(self, data):
+        if self.recognizer.AcceptWaveform(data):
+            # Vosk closed an utterance segment at a pause
+            text = json.loads(self.recognizer.Result()).get("text", "")
+            if text:
+                self.segments.append(text)
+            return " ".join(self.segments)
+        partial = json.loads(self.recognizer.PartialResult()).get("partial", "")
+        return " ".join(self.segments + ([partial] if partial else []))
+
+    def finish(self):
+        text = json.loads(self.recognizer.FinalResult()).get("text", "")
+        if text:
+            self.segments.append(text)
+        return " ".join(self.segments)
+
+
+class FakeStreamingRecognizer(StreamingRecognizer):
+    """Deterministic local stand-in that reveals a fixed transcript over time."""
+
+    name = "fake"
+
+    def __init__(
+        self,
+        transcript="hello I would like to practice my english",
+        words_per_second=2.5,
+    ):
+        self.words = transcript.split()
+        self.words_per_second = words_per_second
+        self.sample_rate = 16000
+        self.samples = 0
+
+    def fresh(self):
+        return FakeStreamingRecognizer(" ".join(self.words), self.words_per_second)
+
+    def start(self, sample_rate):
+        self.sample_rate = sample_rate
+        self.samples = 0
+
+    def accept(self, data):
+        self.samples += len(data) // 2
+        heard = int(self.samples / self.sample_rate * self.words_per_second)
+        return " ".join(self.words[:heard])
+
+    def finish(self):
+        return " ".join(self.words)
+
+
+def create_streaming_recognizer(config, stt=None):
+    engine = config.get("streaming_stt_engine")
+    if not engine:
+        return None
+    try:
+        # Share the model with the batch STT backend when it is the same engine
+        if stt is not None and stt.primary.name == engine:
+            recognizer = stt.primary.streaming_recognizer()
+            if recognizer is not None:
+                return recognizer
+        if engine == "vosk":
+            return VoskStreamingRecognizer(config["vosk_model_path"])
+        if engine == "fake":
+            return FakeStreamingRecognizer()
+        print(f"Unknown streaming STT engine {engine!r}")
+    except Exception as e:
+        print(f"Error loading streaming STT engine {engine}: {str(e)}")
+    return None
+
+
+class StreamingTranscriber:
+    """Runs a StreamingRecognizer on its own thread while audio is recorded.
+
+    The recording loop feed()s chunks and calls end() when the speech is
+    over; partial transcripts are passed to on_partial as they change.
+    cancel() drops a transcriber whose result is no longer wanted: it stops
+    at the next chunk and reports nothing more.
+    """
+
+    def __init__(self, recognizer, sample_rate, on_partial=None):
+        self.recognizer = recognizer
+        self.sample_rate = sample_rate
+        self.on_partial = on_partial
+        self.chunks = queue.Queue()
+        self.done = Event()
+        self.ended = False
+        self.cancelled = False
+        self.final_text = None
+
+        self.thread = Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def feed(self, data):
+        if not self.ended:
+            self.chunks.put(data)
+
+    def end(self):
+        if not self.ended:
+            self.ended = True
+            self.chunks.put(None)
+
+    def cancel(self):
+        self.cancelled = True
+        self.end()
+
+    def run(self):
+        last_partial = ""
+        try:
+            self.recognizer.start(self.sample_rate)
+            while True:
+                data = self.chunks.get()
+                if data is None or self.cancelled:
+                    break
+                partial = self.recognizer.accept(data)
+                if partial and partial != last_partial and not self.cancelled:
+                    last_partial = partial
+                    if self.on_partial:
+                        self.on_partial(partial)
+            if not self.cancelled:
+                self.final_text = self.recognizer.finish()
+        except Exception as e:
+            print(f"Streaming STT error: {str(e)}")
+            self.final_text = None
+        finally:
+            self.done.set()
+
+    def result(self, timeout=None):
+        self.end()
+        self.done.wait(timeout)
+        return self.final_text
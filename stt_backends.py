@@ -0,0 +1,211 @@
+import time
+from threading import Event, Lock, Thread
+
+from audio_capture import RECOGNIZER_RATE
+from startup_profile import PROFILE
+from streaming_stt import FakeStreamingRecognizer, VoskStreamingRecognizer
+
+
+class SpeechBackend:
+    """Base class for speech-to-text engines.
+
+    load() does the expensive one-time setup (model files, decoders) and is
+    run once, in the background once the app is up or on first use.
+    Engine modules, speech_recognition included, are imported there rather
+    than at module load. transcribe() takes a CapturedAudio
+    buffer and returns the text, raising sr.UnknownValueError when nothing
+    was recognized and sr.RequestError when the engine itself failed, the
+    same way speech_recognition does.
+    """
+
+    name = "base"
+    offline = True
+
+    def __init__(self, config):
+        self.config = config
+        self.loaded = Event()
+        self.load_lock = Lock()
+        self.load_started = False
+        self.load_error = None
+        self.load_seconds = None
+
+    def load(self):
+        pass
+
+    def warm_load(self, background=True):
+        with self.load_lock:
+            if self.load_started:
+                return
+            self.load_started = True
+
+        def run():
+            start = time.perf_counter()
+            try:
+                with PROFILE.phase(f"load {self.name} STT", background):
+                    self.load()
+            except Exception as e:
+                self.load_error = e
+                print(f"Error loading {self.name} STT backend: {str(e)}")
+            finally:
+                self.load_seconds = time.perf_counter() - start
+                self.loaded.set()
+
+        if background:
+            Thread(target=run, daemon=True).start()
+        else:
+            run()
+
+    def ensure_loaded(self):
+        import speech_recognition as sr
+
+        self.warm_load(background=False)
+        self.loaded.wait()
+        if self.load_error is not None:
+            raise sr.RequestError(f"{self.name} backend failed to load")
+
+    def transcribe(self, captured):
+        import speech_recognition as sr
+
+        self.ensure_loaded()
+        text = self.recognize(captured)
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+    def recognize(self, captured):
+        raise NotImplementedError
+
+    def streaming_recognizer(self):
+        # Backends that can also transcribe incrementally override this
+        return None
+
+
+class GoogleBackend(SpeechBackend):
+    """Google Web Speech API through speech_recognition (needs network)."""
+
+    name = "google"
+    offline = False
+
+    def load(self):
+        import speech_recognition as sr
+
+        self.recognizer = sr.Recognizer()
+
+    def recognize(self, captured):
+        return self.recognizer.recognize_google(captured.to_audio_data())
+
+
+class SphinxBackend(SpeechBackend):
+    """CMU PocketSphinx with its bundled US English model."""
+
+    name = "sphinx"
+
+    def load(self):
+        from pocketsphinx import Decoder
+
+        self.decoder = Decoder(samprate=RECOGNIZER_RATE)
+        # The decoder holds one utterance at a time; batch replay and the
+        # server transcribe from several threads
+        self.decoder_lock = Lock()
+
+    def recognize(self, captured):
+        audio = captured.resampled(RECOGNIZER_RATE)
+        with self.decoder_lock:
+            self.decoder.start_utt()
+            self.decoder.process_raw(audio.pcm, full_utt=True)
+            self.decoder.end_utt()
+            hypothesis = self.decoder.hyp()
+            return hypothesis.hypstr if hypothesis else ""
+
+
+class VoskBackend(SpeechBackend):
+    """Vosk/Kaldi offline model loaded from vosk_model_path."""
+
+    name = "vosk"
+
+    def load(self):
+        from vosk import Model
+
+        self.model = Model(self.config["vosk_model_path"])
+
+    def recognize(self, captured):
+        recognizer = self.streaming_recognizer()
+        recognizer.start(captured.sample_rate)
+        recognizer.accept(captured.pcm)
+        return recognizer.finish()
+
+    def streaming_recognizer(self):
+        self.ensure_loaded()
+        return VoskStreamingRecognizer(model=self.model)
+
+
+class FakeBackend(SpeechBackend):
+    """Deterministic stand-in that always returns the configured transcript."""
+
+    name = "fake"
+
+    def recognize(self, captured):
+        return self.config["fake_stt_transcript"]
+
+    def streaming_recognizer(self):
+        return FakeStreamingRecognizer(self.config["fake_stt_transcript"])
+
+
+STT_BACKENDS = {
+    "google": GoogleBackend,
+    "sphinx": SphinxBackend,
+    "vosk": VoskBackend,
+    "fake": FakeBackend,
+}
+
+
+def create_stt_backend(name, config, background=True, warm=True):
+    backend_class = STT_BACKENDS.get(name)
+    if backend_class is None:
+        print(f"Unknown STT backend {name!r}, using google")
+        backend_class = GoogleBackend
+    backend = backend_class(config)
+    if warm:
+        backend.warm_load(background)
+    return backend
+
+
+class SpeechToText:
+    """The deployment's configured STT backend plus an optional fallback.
+
+    The fallback (normally an offline engine) is used when the primary
+    backend cannot be reached, e.g. Google without a network connection.
+    With warm=False nothing is loaded until warm_load() or the first
+    transcription.
+    """
+
+    def __init__(self, config, background=True, warm=True):
+        self.primary = create_stt_backend(
+            config["stt_backend"], config, background, warm
+        )
+        self.fallback = None
+        if config.get("stt_fallback_backend"):
+            self.fallback = create_stt_backend(
+                config["stt_fallback_backend"], config, background, warm
+            )
+
+    def warm_load(self, background=True):
+        self.primary.warm_load(background)
+        if self.fallback is not None:
+            self.fallback.warm_load(background)
+
+    def wait_loaded(self):
+        for backend in (self.primary, self.fallback):
+            if backend is not None:
+                backend.loaded.wait()
+
+    def transcribe(self, captured):
+        import speech_recognition as sr
+
+        try:
+            return self.primary.transcribe(captured)
+        except sr.RequestError:
+            if self.fallback is None:
+                raise
+            print(f"{self.primary.name} STT unavailable, using {self.fallback.name}")
+            return self.fallback.transcribe(captured)
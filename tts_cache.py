@@ -0,0 +1,195 @@
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from threading import Event, Lock
+
+
+def speech_key(engine, voice, rate, volume, text):
+    params = f"{engine}\n{voice}\n{rate}\n{volume}\n{text.strip()}"
+    return hashlib.sha256(params.encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    """Synthesized speech kept in memory and on disk, keyed by speech_key().
+
+    The disk cache is capped at max_bytes and the in-memory copy at
+    memory_bytes; the least recently used clips are evicted first. Files are
+    written to a temp name and swapped in, so a crash never leaves a partial
+    clip behind. Safe to share between speaker threads.
+    """
+
+    INDEX_FILENAME = "index.json"
+
+    def __init__(self, directory="tts_cache", max_bytes=64 << 20, memory_bytes=8 << 20):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memory_bytes = memory_bytes
+        self.lock = Lock()
+        self.memory = OrderedDict()  # key -> audio, most recently used last
+        self.memory_size = 0
+        self.pending = {}  # key -> Event while one thread synthesizes it
+
+        self.hits = 0
+        self.misses = 0
+        self.saved_ms = 0.0
+        self.synthesis_ms = 0.0
+
+        os.makedirs(directory, exist_ok=True)
+        self.index = self.load_index()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            directory=config["tts_cache_dir"],
+            max_bytes=config["tts_cache_max_mb"] << 20,
+            memory_bytes=config["tts_cache_memory_mb"] << 20,
+        )
+
+    def path_for(self, key):
+        return os.path.join(self.directory, key)
+
+    def load_index(self):
+        path = os.path.join(self.directory, self.INDEX_FILENAME)
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error reading TTS cache index: {str(e)}")
+            return {}
+        # Drop entries whose clip went missing
+        return {k: v for k, v in index.items() if os.path.exists(self.path_for(k))}
+
+    def write_atomic(self, path, data):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def save_index(self):
+        # Called with the lock held
+        data = json.dumps(self.index, indent=1).encode("utf-8")
+        self.write_atomic(os.path.join(self.directory, self.INDEX_FILENAME), data)
+
+    def remember(self, key, audio):
+        # Called with the lock held
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            return
+        if len(audio) > self.memory_bytes:
+            return
+        self.memory[key] = audio
+        self.memory_size += len(audio)
+        while self.memory_size > self.memory_bytes:
+            _, evicted = self.memory.popitem(last=False)
+            self.memory_size -= len(evicted)
+
+    def evict(self):
+        # Called with the lock held
+        total = sum(entry["size"] for entry in self.index.values())
+        by_use = sorted(self.index, key=lambda k: self.index[k]["last_used"])
+        for key in by_use:
+            if total <= self.max_bytes:
+                break
+            total -= self.index.pop(key)["size"]
+            try:
+                os.remove(self.path_for(key))
+            except OSError:
+                pass
+
+    def get(self, key):
+        """Cached audio for key, or None. Counts a hit or a miss."""
+        with self.lock:
+            audio = self.memory.get(key)
+            entry = self.index.get(key)
+            if audio is None and entry is not None:
+                try:
+                    with open(self.path_for(key), "rb") as f:
+                        audio = f.read()
+                except OSError:
+                    del self.index[key]
+                    entry = None
+            if audio is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.remember(key, audio)
+            if entry is not None:
+                self.saved_ms += entry["synthesis_ms"]
+                entry["last_used"] = time.time()
+            return audio
+
+    def put(self, key, audio, synthesis_ms):
+        with self.lock:
+            self.synthesis_ms += synthesis_ms
+            self.remember(key, audio)
+            try:
+                self.write_atomic(self.path_for(key), audio)
+            except OSError as e:
+                print(f"Error writing TTS cache: {str(e)}")
+                return
+            self.index[key] = {
+                "size": len(audio),
+                "synthesis_ms": synthesis_ms,
+                "last_used": time.time(),
+            }
+            self.evict()
+            self.save_index()
+
+    def fetch(self, key, synthesize):
+        """Cached audio for key, calling synthesize() to fill it on a miss.
+
+        Concurrent callers asking for the same key wait for the first one
+        instead of synthesizing the clip twice.
+        """
+        while True:
+            audio = self.get(key)
+            if audio is not None:
+                return audio
+            with self.lock:
+                waiting = self.pending.get(key)
+                if waiting is None:
+                    self.pending[key] = Event()
+                    break
+            waiting.wait()
+            # The wait above counted a miss that turned into a hit
+            with self.lock:
+                self.misses -= 1
+
+        try:
+            start = time.perf_counter()
+            audio = synthesize()
+            self.put(key, audio, (time.perf_counter() - start) * 1000)
+            return audio
+        finally:
+            with self.lock:
+                self.pending.pop(key).set()
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hit_rate(),
+                "saved_ms": self.saved_ms,
+                "synthesis_ms": self.synthesis_ms,
+                "entries": len(self.index),
+                "bytes": sum(entry["size"] for entry in self.index.values()),
+                "memory_bytes": self.memory_size,
+            }
+
+    def describe(self):
+        stats = self.stats()
+        return (
+            f"TTS cache: {stats['hits']}/{stats['hits'] + stats['misses']} hits "
+            f"({stats['hit_rate']:.0%}), {stats['saved_ms']:.0f} ms synthesis saved, "
+            f"{stats['entries']} clips / {stats['bytes'] / 1e6:.1f} MB on disk"
+        )
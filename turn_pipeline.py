@@ -0,0 +1,92 @@
+import queue
+from threading import Lock, Thread
+
+# Status bar text while a stage is working on a turn
+STAGE_STATUS = {
+    "capture": "Finishing recording...",
+    "stt": "Transcribing...",
+    "llm": "Waiting for AI...",
+    "tts": "Speaking...",
+}
+
+
+class TurnPipeline:
+    """Staged worker pipeline for a conversation turn (capture -> STT -> LLM -> TTS).
+
+    Each stage runs its handler on its own worker thread and hands the result
+    to the next stage through a queue, so nothing blocking ever runs on the
+    Tk event loop. A handler returning None ends the turn early. Callbacks
+    into the GUI are always scheduled with root.after.
+    """
+
+    def __init__(self, root, on_state=None, on_idle=None):
+        self.root = root
+        self.on_state = on_state  # on_state(stage_name, running)
+        self.on_idle = on_idle  # Called once no turn is in flight any more
+        self.stages = []
+        self.lock = Lock()
+        self.in_flight = 0
+
+    def add_stage(self, name, handler, maxsize=4):
+        self.stages.append(
+            {"name": name, "handler": handler, "queue": queue.Queue(maxsize)}
+        )
+
+    def start(self):
+        for index, stage in enumerate(self.stages):
+            Thread(
+                target=self.run_stage, args=(index,), name=stage["name"], daemon=True
+            ).start()
+
+    def stage_index(self, name):
+        for index, stage in enumerate(self.stages):
+            if stage["name"] == name:
+                return index
+        raise KeyError(name)
+
+    def submit(self, stage_name, item):
+        # Start a turn at any stage, e.g. the scenario opener goes straight to the LLM
+        with self.lock:
+            self.in_flight += 1
+        self.stages[self.stage_index(stage_name)]["queue"].put(item)
+
+    @property
+    def busy(self):
+        with self.lock:
+            return self.in_flight > 0
+
+    def ui(self, callback, *args):
+        self.root.after(0, callback, *args)
+
+    def run_stage(self, index):
+        stage = self.stages[index]
+        while True:
+            item = stage["queue"].get()
+            if item is None:
+                break
+
+            if self.on_state:
+                self.ui(self.on_state, stage["name"], True)
+            try:
+                result = stage["handler"](item)
+            except Exception as e:
+                print(f"Error in {stage['name']} stage: {str(e)}")
+                result = None
+            if self.on_state:
+                self.ui(self.on_state, stage["name"], False)
+
+            if result is not None and index + 1 < len(self.stages):
+                self.stages[index + 1]["queue"].put(result)
+            else:
+                self.finish_turn()
+
+    def finish_turn(self):
+        with self.lock:
+            self.in_flight -= 1
+            idle = self.in_flight == 0
+        if idle and self.on_idle:
+            self.ui(self.on_idle)
+
+    def shutdown(self):
+        for stage in self.stages:
+            stage["queue"].put(None)
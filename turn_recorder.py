@@ -0,0 +1,156 @@
+from threading import Thread
+
+from audio_capture import CapturedAudio
+from streaming_stt import StreamingTranscriber
+from vad import VoiceActivityDetector
+
+CHUNK = 1024
+
+
+class TurnRecorder:
+    """Records learner turns from the shared microphone for the Tk apps.
+
+    start() begins a RecordedTurn on its own thread, with its own streaming
+    recognizer from streaming_recognizer.fresh(). Partial transcripts are
+    passed to on_partial(turn, text) and, with the VAD on, on_end_of_turn(turn)
+    is called once the learner has stopped talking; both are called from
+    worker threads.
+    """
+
+    def __init__(
+        self,
+        config,
+        devices,
+        streaming_recognizer=None,
+        on_partial=None,
+        on_end_of_turn=None,
+        debug_wav="temp_recording.wav",
+    ):
+        self.config = config
+        self.devices = devices
+        self.streaming_recognizer = streaming_recognizer
+        self.on_partial = on_partial
+        self.on_end_of_turn = on_end_of_turn
+        self.debug_wav = debug_wav  # Debug sink only, see save_debug_wav
+
+    def start(self, session=None, requested_at=None, noise_floor_db=None):
+        turn = RecordedTurn(self, session, requested_at, noise_floor_db)
+        turn.thread.start()
+        return turn
+
+    def create_vad(self, sample_rate, noise_floor_db=None):
+        if not self.config["vad_enabled"]:
+            return None
+        return VoiceActivityDetector(
+            sample_rate,
+            silence_gap_ms=self.config["vad_silence_gap_ms"],
+            min_speech_ms=self.config["vad_min_speech_ms"],
+            hangover_ms=self.config["vad_hangover_ms"],
+            noise_floor_db=noise_floor_db,
+        )
+
+    def create_transcriber(self, turn, sample_rate):
+        if self.streaming_recognizer is None:
+            return None
+        return StreamingTranscriber(
+            self.streaming_recognizer.fresh(),
+            sample_rate,
+            on_partial=lambda text: self.show_partial(turn, text),
+        )
+
+    def show_partial(self, turn, text):
+        # Late updates can arrive after the turn has been finalized
+        if self.on_partial and not turn.finished:
+            self.on_partial(turn, text)
+
+
+class RecordedTurn:
+    """One learner turn: its audio, VAD and streaming transcript.
+
+    Audio is read until stop(); join() waits until it has been flushed and
+    trimmed to the speech the VAD found, and returns it. A turn handed over
+    by the barge-in monitor already starts with speech, so its VAD is seeded
+    with noise_floor_db, the level the monitor measured.
+    """
+
+    def __init__(
+        self, recorder, session=None, requested_at=None, noise_floor_db=None
+    ):
+        self.recorder = recorder
+        self.session = session
+        self.requested_at = requested_at
+        self.noise_floor_db = noise_floor_db
+        self.recording = True
+        self.finished = False  # Transcript taken, later partials are stale
+        self.captured = None
+        self.transcriber = None
+        self.thread = Thread(target=self.run)
+
+    def stop(self):
+        self.recording = False
+
+    def join(self):
+        self.thread.join()
+        return self.captured
+
+    def run(self):
+        recorder = self.recorder
+
+        # The microphone stream is opened once at startup; a barge-in hands
+        # over a session that is already capturing
+        session = self.session
+        if session is None:
+            session = recorder.devices.acquire(self.requested_at)
+
+        # Keep the captured PCM in memory for the recognizer
+        captured = CapturedAudio(session.rate, session.sample_width, session.channels)
+        vad = recorder.create_vad(session.rate, self.noise_floor_db)
+        transcriber = self.transcriber = recorder.create_transcriber(
+            self, session.rate
+        )
+        auto_stopped = False
+        while self.recording:
+            data = session.read(CHUNK)
+            captured.append(data)
+            if transcriber:
+                transcriber.feed(data)
+
+            # End the turn on our own once the learner has stopped talking
+            if vad and vad.process(data) and not auto_stopped:
+                auto_stopped = True
+                if transcriber:
+                    transcriber.end()
+                if recorder.on_end_of_turn:
+                    recorder.on_end_of_turn(self)
+
+        captured.append(session.flush())
+        session.close()
+        if transcriber:
+            transcriber.end()
+
+        # Drop leading and trailing silence before it reaches the recognizer
+        if vad:
+            bounds = vad.speech_bounds(captured.num_samples)
+            # Without bounds (Stop pressed before any speech was found) the
+            # whole recording goes to the recognizer
+            if bounds:
+                captured.trim(*bounds)
+
+        self.captured = captured
+
+        # Optionally save the recording for debugging
+        if recorder.config["save_debug_wav"]:
+            captured.write_wav(recorder.debug_wav)
+
+    def streamed_transcript(self, timeout=None):
+        # The streaming transcript once the audio is in, None without one
+        self.finished = True
+        transcriber, self.transcriber = self.transcriber, None
+        if transcriber is None:
+            return None
+        text = transcriber.result(timeout)
+        if not transcriber.done.is_set():
+            # Too late: the caller falls back to batch STT, stop this one
+            # working through the rest of the audio
+            transcriber.cancel()
+        return text
@@ -0,0 +1,206 @@
+import json
+import logging
+import time
+from collections import deque
+from logging.handlers import RotatingFileHandler
+from threading import Lock
+
+# Points of a turn, in the order they normally happen
+TRACE_POINTS = (
+    "recording_stop",
+    "stt_start",
+    "stt_end",
+    "llm_sent",
+    "first_token",
+    "last_token",
+    "tts_start",
+    "first_audio",
+    "playback_end",
+)
+
+# Stage -> (start point, end point). "response" is the wait the learner
+# hears: from letting go of the record button to the tutor's first word.
+STAGE_SPANS = {
+    "stt": ("stt_start", "stt_end"),
+    "first_token": ("llm_sent", "first_token"),
+    "llm": ("llm_sent", "last_token"),
+    "tts_first_audio": ("tts_start", "first_audio"),
+    "playback": ("first_audio", "playback_end"),
+    "response": ("recording_stop", "first_audio"),
+}
+
+
+class TraceLog:
+    """Turn traces appended to a JSONL file, rotated by size.
+
+    Rotation is left to logging's RotatingFileHandler: path.1, path.2, ...
+    keep the older traces, up to `backups` files. Safe to share between
+    threads and conversations.
+    """
+
+    def __init__(self, path, max_bytes=5 * 1024 * 1024, backups=3):
+        self.path = path
+        handler = RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8", delay=True
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        # A logger of its own, so the traces never reach the root logger
+        self.logger = logging.getLogger(f"turn_trace.{path}")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        for old in list(self.logger.handlers):
+            self.logger.removeHandler(old)
+            old.close()
+        self.logger.addHandler(handler)
+
+    @classmethod
+    def from_config(cls, config):
+        if not config["trace_log_path"]:
+            return None
+        return cls(
+            config["trace_log_path"],
+            max_bytes=int(config["trace_log_max_mb"] * 1024 * 1024),
+            backups=config["trace_log_backups"],
+        )
+
+    def write(self, record):
+        self.logger.info(json.dumps(record))
+
+    def close(self):
+        for handler in self.logger.handlers:
+            handler.close()
+
+
+def percentile(values, pct):
+    # Nearest-rank percentile; the benchmarks report 0.0 for no samples
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class LatencyStats:
+    """Rolling p50/p95 per stage over the last `window` turns that had it."""
+
+    def __init__(self, window=50):
+        self.window = window
+        self.lock = Lock()
+        self.samples = {stage: deque(maxlen=window) for stage in STAGE_SPANS}
+
+    def add(self, spans):
+        with self.lock:
+            for stage, ms in spans.items():
+                self.samples[stage].append(ms)
+
+    def summary(self):
+        # stage -> (p50 ms, p95 ms, turns), None for stages not seen yet
+        with self.lock:
+            samples = {stage: list(values) for stage, values in self.samples.items()}
+        return {
+            stage: (
+                (percentile(values, 50), percentile(values, 95), len(values))
+                if values
+                else None
+            )
+            for stage, values in samples.items()
+        }
+
+
+class TurnTrace:
+    """The times at which one turn reached each of TRACE_POINTS."""
+
+    def __init__(self, turn, kind):
+        self.turn = turn
+        self.kind = kind  # "voice" for a recorded turn, "opener" for a scenario opener
+        self.wall_time = time.time()
+        self.started = time.perf_counter()
+        self.points = {}  # point -> seconds since started
+
+    def mark(self, point):
+        # A point marked twice keeps its first time
+        self.points.setdefault(point, time.perf_counter() - self.started)
+
+    def spans(self):
+        spans = {}
+        for stage, (start, end) in STAGE_SPANS.items():
+            if start in self.points and end in self.points:
+                spans[stage] = round((self.points[end] - self.points[start]) * 1000, 1)
+        return spans
+
+    def as_dict(self):
+        return {
+            "turn": self.turn,
+            "kind": self.kind,
+            "time": round(self.wall_time, 3),
+            "points_ms": {
+                point: round(seconds * 1000, 1)
+                for point, seconds in sorted(self.points.items(), key=lambda p: p[1])
+            },
+            "spans_ms": self.spans(),
+        }
+
+
+class TurnTracer:
+    """Traces the turns of one conversation, one turn at a time.
+
+    begin() opens a turn and mark() records a point of the current turn from
+    any thread; marks with no turn open are ignored. finish() writes the
+    turn to the log and adds its spans to the stats, which may be shared by
+    several conversations. Beginning a turn finishes the one before, e.g.
+    when the learner cut in while the tutor was still speaking.
+    """
+
+    def __init__(self, app, log=None, stats=None, on_finish=None):
+        self.app = app
+        self.log = log
+        self.stats = stats
+        self.on_finish = on_finish  # on_finish(trace), from the finishing thread
+        self.lock = Lock()
+        self.turns = 0
+        self.current = None
+
+    @classmethod
+    def from_config(cls, config, app, on_finish=None):
+        return cls(
+            app,
+            log=TraceLog.from_config(config),
+            stats=LatencyStats(config["trace_stats_window"]),
+            on_finish=on_finish,
+        )
+
+    def begin(self, kind="voice", first_point=None):
+        self.finish()
+        with self.lock:
+            self.turns += 1
+            self.current = TurnTrace(self.turns, kind)
+            if first_point:
+                self.current.mark(first_point)
+
+    def mark(self, point):
+        with self.lock:
+            if self.current is not None:
+                self.current.mark(point)
+
+    def finish(self):
+        with self.lock:
+            trace, self.current = self.current, None
+        if trace is None or not trace.points:
+            return None
+        spans = trace.spans()
+        if self.stats is not None:
+            self.stats.add(spans)
+        if self.log is not None:
+            record = trace.as_dict()
+            record["app"] = self.app
+            try:
+                self.log.write(record)
+            except Exception as e:
+                print(f"Trace: could not write turn {trace.turn}: {str(e)}")
+        print(
+            f"Trace: turn {trace.turn} "
+            + ", ".join(f"{stage} {ms:.0f} ms" for stage, ms in spans.items())
+        )
+        if self.on_finish:
+            self.on_finish(trace)
+        return trace
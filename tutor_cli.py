@@ -0,0 +1,98 @@
+"""Run a scripted tutoring session end to end, without the GUI.
+
+Each non-empty line of the script is one learner turn: the path of a WAV
+recording, which goes through speech-to-text, or typed text. The tutor's
+opener and replies are printed with per-stage timings; with --out the
+spoken replies are written there as audio files.
+
+    python tutor_cli.py --scenario "Casual Chat" --script turns.txt
+    python tutor_cli.py --say "I like football" --say recording.wav --tts edge --out replies
+"""
+
+import argparse
+import json
+import os
+
+from audio_capture import CapturedAudio
+from config import load_config
+from conversation_engine import TTS_ENGINES, ConversationEngine
+from scenarios import SCENARIOS
+
+
+def load_script(script, says):
+    turns = []
+    if script:
+        with open(script, "r", encoding="utf-8") as f:
+            turns.extend(line.strip() for line in f)
+    turns.extend(says or [])
+    return [turn for turn in turns if turn and not turn.startswith("#")]
+
+
+def run_turn(engine, turn, speak):
+    # A .wav line is a recording, anything else was typed
+    if turn.lower().endswith(".wav"):
+        return engine.take_turn(audio=CapturedAudio.from_wav(turn), speak=speak)
+    return engine.take_turn(text=turn, speak=speak)
+
+
+def report(result, index, out, as_json):
+    audio_file = None
+    if out and result.audio:
+        audio_file = os.path.join(out, f"turn{index:03d}.{result.audio_format}")
+        with open(audio_file, "wb") as f:
+            f.write(result.audio)
+
+    if as_json:
+        record = result.as_dict()
+        record["turn"] = index
+        record["audio_file"] = audio_file
+        print(json.dumps(record), flush=True)
+        return
+    if result.transcript:
+        print(f"You: {result.transcript}")
+    elif result.error and result.reply is None:
+        print(f"You: <{result.error}>")
+    if result.reply is not None:
+        print(f"AI: {result.reply}")
+    timings = ", ".join(f"{name} {ms:.0f} ms" for name, ms in result.timings.items())
+    print(f"  ({timings})", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", default="Casual Chat", choices=list(SCENARIOS))
+    parser.add_argument("--script", help="file with one learner turn per line")
+    parser.add_argument("--say", action="append", help="a learner turn (repeatable)")
+    parser.add_argument("--model", help="Ollama model (default: ollama_model)")
+    parser.add_argument("--tts", choices=TTS_ENGINES, help="synthesize the replies")
+    parser.add_argument("--out", help="folder for the synthesized replies")
+    parser.add_argument("--json", action="store_true", help="one JSON line per turn")
+    args = parser.parse_args()
+
+    config = load_config()
+    if args.model:
+        config["ollama_model"] = args.model
+    turns = load_script(args.script, args.say)
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+
+    engine = ConversationEngine.from_config(
+        config, SCENARIOS, default_model="mistral", tts=args.tts, warm_stt=False
+    )
+    speak = args.tts is not None
+    try:
+        # Only the backends the script needs are loaded
+        if any(turn.lower().endswith(".wav") for turn in turns):
+            engine.stt.warm_load(background=False)
+
+        result = engine.open_scenario(args.scenario, speak=speak)
+        report(result, 0, args.out, args.json)
+        for index, turn in enumerate(turns, 1):
+            result = run_turn(engine, turn, speak)
+            report(result, index, args.out, args.json)
+    finally:
+        engine.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,504 @@
+"""Serve tutoring sessions to many learners at once over HTTP and WebSocket.
+
+Every learner gets a session with its own history and in-memory audio;
+all sessions share one pooled Ollama client, the warm recognizer, the TTS
+synthesizer and the opener cache. A session holds no thread or task while
+the learner is not mid-turn, so hundreds of idle ones cost little more
+than their histories. Sessions outlive their connection (reconnect with
+?session=<id>) until they have been idle for server_session_idle_minutes.
+
+    python tutor_server.py [--host 0.0.0.0] [--port 8765] [--tts edge|pyttsx3|none]
+
+Protocol on GET /ws, one JSON object per text frame:
+
+    client -> {"type": "start", "scenario": "Casual Chat",
+               "sample_rate": 16000, "speak": true}
+           -> binary frames: 16-bit mono PCM of the learner's turn
+           -> {"type": "end_turn"}          transcribe the audio and answer
+           -> {"type": "text", "text": ...} answer typed text
+           -> {"type": "interrupt", "heard": "..."}  stop the reply
+    server <- {"type": "session", "id": ...}
+           <- {"type": "transcript", "text": ...}
+           <- {"type": "token", "text": ...} as the reply streams in
+           <- {"type": "audio_start", "sentence": n, "text": ..., "format": "mp3"},
+              binary frames of that sentence's audio, {"type": "audio_end", ...}
+           <- {"type": "reply", "text": ..., "spans_ms": {...}} when the turn is done
+           <- {"type": "error", "message": ...}
+
+GET /health counts sessions, GET /stats has the rolling per-stage latency
+of all sessions, GET /scenarios lists the scenarios.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing
+from threading import Event
+
+from aiohttp import WSMsgType, web
+
+from audio_capture import CapturedAudio
+from config import load_config
+from conversation_engine import (
+    TTS_ENGINES,
+    ConversationEngine,
+    TranscriptionError,
+    create_tts,
+)
+from history_manager import token_budget_for
+from model_manager import ModelManager
+from ollama_client import OllamaClient
+from opener_cache import OpenerCache
+from scenarios import SCENARIOS
+from sentence_tts import SentenceSegmenter
+from stt_backends import SpeechToText
+from turn_trace import LatencyStats, TraceLog, TurnTracer
+
+STAGES = ("stt", "llm", "tts")
+
+# Uploaded audio is 16-bit mono PCM
+SAMPLE_WIDTH = 2
+
+
+class SharedBackends:
+    """The backends every session shares, and how many turns may use each.
+
+    Blocking calls (recognizer, model requests, pyttsx3) run on one thread
+    pool; limits holds an asyncio semaphore per stage, across all sessions.
+    """
+
+    def __init__(self, config, tts):
+        self.config = config
+        # One pooled keep-alive session for all learners
+        self.models = ModelManager.from_config(
+            OllamaClient.from_config(config), config, default_model="llama3.2"
+        )
+        self.opener_cache = None
+        if config["opener_cache_enabled"]:
+            self.opener_cache = OpenerCache.from_config(self.models, config)
+        # Loaded once in the background, every session waits for the same load
+        self.stt = SpeechToText(config)
+        self.tts = create_tts(tts, config)
+        self.token_budget = token_budget_for(config, self.models.model)
+        self.trace_log = TraceLog.from_config(config)
+        self.latency = LatencyStats(config["trace_stats_window"])
+
+        counts = {name: config[f"server_{name}_concurrency"] for name in STAGES}
+        self.limits = {name: asyncio.Semaphore(n) for name, n in counts.items()}
+        self.executor = ThreadPoolExecutor(
+            sum(counts.values()), thread_name_prefix="tutor"
+        )
+
+    def warm_up(self):
+        self.models.warm_up()
+        if self.opener_cache:
+            self.opener_cache.pregenerate_async(SCENARIOS)
+        if hasattr(self.tts, "start"):
+            self.tts.start()
+
+    def create_engine(self):
+        return ConversationEngine(
+            self.models,
+            SCENARIOS,
+            stt=self.stt,
+            tts=self.tts,
+            opener_cache=self.opener_cache,
+            token_budget=self.token_budget,
+            tracer=TurnTracer("tutor_server", log=self.trace_log, stats=self.latency),
+        )
+
+    async def run(self, stage, func, *args):
+        # Waits for a free slot of the stage, then runs func off the event loop
+        async with self.limits[stage]:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, func, *args)
+
+    async def synthesize(self, text):
+        # edge-tts streams natively on the event loop; other engines render
+        # the whole clip on the pool
+        if hasattr(self.tts, "stream"):
+            async with aclosing(self.tts.stream(text)) as chunks:
+                async for chunk in chunks:
+                    yield chunk
+        else:
+            loop = asyncio.get_running_loop()
+            yield await loop.run_in_executor(self.executor, self.tts.synthesize, text)
+
+    def close(self):
+        if self.tts is not None:
+            self.tts.close()
+        self.models.client.close()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class TutorSession:
+    """One learner's conversation: its history, audio buffer and current turn.
+
+    At most one turn runs at a time, as a task, so the connection keeps
+    reading while it runs: audio for the next turn, or an interrupt.
+    """
+
+    def __init__(self, session_id, backends):
+        self.id = session_id
+        self.backends = backends
+        self.engine = backends.create_engine()
+        self.tracer = self.engine.tracer
+        self.sample_rate = 16000
+        self.speak = backends.tts is not None
+        self.audio = None  # CapturedAudio of the turn being uploaded
+        self.ws = None
+        self.turn = None
+        self.interrupted = Event()  # Read by the model request's thread
+        self.heard = None
+        self.last_active = time.monotonic()
+
+    @property
+    def busy(self):
+        return self.turn is not None and not self.turn.done()
+
+    async def send(self, data):
+        # Messages for a learner who has gone are dropped, the turn still
+        # finishes and stays in the history
+        if self.ws is not None and not self.ws.closed:
+            try:
+                await self.ws.send_json(data)
+            except ConnectionResetError:
+                pass
+
+    async def send_audio(self, chunk):
+        if self.ws is not None and not self.ws.closed:
+            try:
+                await self.ws.send_bytes(chunk)
+            except ConnectionResetError:
+                pass
+
+    def add_audio(self, chunk):
+        if self.audio is None:
+            self.audio = CapturedAudio(self.sample_rate, SAMPLE_WIDTH)
+        self.audio.append(chunk)
+        if self.audio.duration > self.backends.config["server_max_audio_seconds"]:
+            self.audio = None
+            raise ValueError("Recording too long, the turn was dropped")
+
+    def start_turn(self, coroutine):
+        if self.busy:
+            coroutine.close()
+            raise ValueError("A turn is still running")
+        self.interrupted.clear()
+        self.heard = None
+        self.turn = asyncio.create_task(self.run_turn(coroutine))
+
+    async def run_turn(self, coroutine):
+        try:
+            await coroutine
+        except Exception as e:
+            print(f"Session {self.id}: turn failed: {str(e)}")
+            await self.send({"type": "error", "message": str(e)})
+        finally:
+            self.last_active = time.monotonic()
+
+    async def open_scenario(self, scenario):
+        self.tracer.begin(kind="opener")
+        opener = self.engine.start_scenario(scenario)
+        await self.answer(SCENARIOS[scenario]["initial_prompt"], cached=opener)
+
+    async def voice_turn(self):
+        captured, self.audio = self.audio, None
+        self.tracer.begin(first_point="recording_stop")
+        self.tracer.mark("stt_start")
+        try:
+            transcript = await self.backends.run(
+                "stt", self.engine.transcribe, captured
+            )
+        except TranscriptionError as e:
+            self.tracer.mark("stt_end")
+            self.tracer.finish()
+            await self.send({"type": "error", "message": str(e)})
+            return
+        self.tracer.mark("stt_end")
+        await self.send({"type": "transcript", "text": transcript})
+        await self.answer(transcript)
+
+    async def text_turn(self, text):
+        self.tracer.begin(kind="text")
+        await self.answer(text)
+
+    async def answer(self, user_message, cached=None):
+        """Stream the reply's text and, sentence by sentence, its audio."""
+        loop = asyncio.get_running_loop()
+        tokens = asyncio.Queue()
+        sentences = asyncio.Queue()
+        speaker = None
+        if self.speak:
+            speaker = asyncio.create_task(self.speak_sentences(sentences))
+
+        if cached is not None:
+            tokens.put_nowait(cached)
+            tokens.put_nowait(None)
+            request = None
+        else:
+
+            def on_token(text):
+                # Called on the pool thread reading the model's stream
+                loop.call_soon_threadsafe(tokens.put_nowait, text)
+
+            request = asyncio.create_task(
+                self.backends.run(
+                    "llm",
+                    self.engine.respond,
+                    user_message,
+                    on_token,
+                    self.interrupted.is_set,
+                )
+            )
+            # Queued behind the last token, so every token is read first
+            request.add_done_callback(lambda _: tokens.put_nowait(None))
+
+        segmenter = SentenceSegmenter()
+        try:
+            while True:
+                text = await tokens.get()
+                if text is None:
+                    break
+                await self.send({"type": "token", "text": text})
+                for sentence in segmenter.feed(text):
+                    sentences.put_nowait(sentence)
+            reply = cached if request is None else await request
+
+            if self.engine.last_error:
+                await self.send({"type": "error", "message": self.engine.last_error})
+            else:
+                rest = segmenter.flush()
+                if rest:
+                    sentences.put_nowait(rest)
+        finally:
+            sentences.put_nowait(None)
+            if speaker is not None:
+                await speaker
+
+        # A reply cut off by the learner is remembered as far as it was heard
+        if self.interrupted.is_set() and self.heard is not None:
+            self.engine.mark_partially_heard(self.heard)
+        trace = self.tracer.finish()
+        await self.send(
+            {
+                "type": "reply",
+                "text": reply,
+                "interrupted": self.interrupted.is_set(),
+                "spans_ms": trace.spans() if trace else {},
+            }
+        )
+
+    async def speak_sentences(self, sentences):
+        audio_format = self.backends.tts.audio_format
+        index = 0
+        while True:
+            sentence = await sentences.get()
+            if sentence is None:
+                break
+            if self.interrupted.is_set():
+                continue  # Drain what the model still sends
+            self.tracer.mark("tts_start")
+            await self.send(
+                {
+                    "type": "audio_start",
+                    "sentence": index,
+                    "text": sentence,
+                    "format": audio_format,
+                }
+            )
+            try:
+                async with self.backends.limits["tts"]:
+                    async with aclosing(self.backends.synthesize(sentence)) as audio:
+                        async for chunk in audio:
+                            if self.interrupted.is_set():
+                                break
+                            self.tracer.mark("first_audio")
+                            await self.send_audio(chunk)
+            except Exception as e:
+                print(f"Session {self.id}: could not synthesize {sentence!r}: {e}")
+            await self.send({"type": "audio_end", "sentence": index})
+            index += 1
+        # Playback is up to the client; this is when its last audio went out
+        self.tracer.mark("playback_end")
+
+    async def handle(self, message):
+        kind = message.get("type")
+        if kind != "interrupt" and self.busy:
+            raise ValueError("A turn is still running")
+        if kind == "start":
+            scenario = message.get("scenario", "Casual Chat")
+            if scenario not in SCENARIOS:
+                raise ValueError(f"Unknown scenario {scenario!r}")
+            self.sample_rate = int(message.get("sample_rate", self.sample_rate))
+            self.speak = bool(message.get("speak", True)) and (
+                self.backends.tts is not None
+            )
+            self.audio = None
+            self.start_turn(self.open_scenario(scenario))
+        elif self.engine.scenario is None:
+            raise ValueError("Send a start message first")
+        elif kind == "end_turn":
+            if self.audio is None:
+                raise ValueError("No audio was uploaded for this turn")
+            self.start_turn(self.voice_turn())
+        elif kind == "text":
+            self.start_turn(self.text_turn(message["text"]))
+        elif kind == "interrupt":
+            self.heard = message.get("heard")
+            self.interrupted.set()
+        else:
+            raise ValueError(f"Unknown message type {kind!r}")
+
+
+class TutorServer:
+    """HTTP and WebSocket front end holding the sessions by id."""
+
+    def __init__(self, config, backends):
+        self.config = config
+        self.backends = backends
+        self.sessions = {}
+        self.max_sessions = config["server_max_sessions"]
+        self.idle_seconds = config["server_session_idle_minutes"] * 60
+        self.reaper = None
+
+    def create_app(self):
+        app = web.Application()
+        app.add_routes(
+            [
+                web.get("/ws", self.websocket),
+                web.get("/health", self.health),
+                web.get("/stats", self.stats),
+                web.get("/scenarios", self.scenarios),
+            ]
+        )
+        app.on_startup.append(self.on_startup)
+        app.on_cleanup.append(self.on_cleanup)
+        return app
+
+    async def on_startup(self, app):
+        self.backends.warm_up()
+        self.reaper = asyncio.create_task(self.reap_idle_sessions())
+
+    async def on_cleanup(self, app):
+        self.reaper.cancel()
+        for session in self.sessions.values():
+            if session.busy:
+                session.turn.cancel()
+        self.backends.close()
+
+    async def reap_idle_sessions(self):
+        while True:
+            await asyncio.sleep(60)
+            now = time.monotonic()
+            idle = [
+                session_id
+                for session_id, session in self.sessions.items()
+                if session.ws is None
+                and not session.busy
+                and now - session.last_active > self.idle_seconds
+            ]
+            for session_id in idle:
+                del self.sessions[session_id]
+            if idle:
+                print(f"Server: dropped {len(idle)} idle session(s)")
+
+    def find_session(self, session_id):
+        session = self.sessions.get(session_id) if session_id else None
+        if session is None:
+            if len(self.sessions) >= self.max_sessions:
+                return None
+            session = TutorSession(uuid.uuid4().hex, self.backends)
+            self.sessions[session.id] = session
+        return session
+
+    async def websocket(self, request):
+        session = self.find_session(request.query.get("session"))
+        if session is None:
+            return web.json_response({"error": "Too many sessions"}, status=503)
+
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        if session.ws is not None:
+            await session.ws.close()  # Taken over by the new connection
+        session.ws = ws
+        await session.send({"type": "session", "id": session.id})
+
+        try:
+            async for message in ws:
+                session.last_active = time.monotonic()
+                try:
+                    if message.type == WSMsgType.BINARY:
+                        session.add_audio(message.data)
+                    elif message.type == WSMsgType.TEXT:
+                        await session.handle(json.loads(message.data))
+                    elif message.type == WSMsgType.ERROR:
+                        break
+                except (ValueError, KeyError) as e:
+                    await session.send({"type": "error", "message": str(e)})
+        finally:
+            if session.ws is ws:
+                session.ws = None
+            session.last_active = time.monotonic()
+        return ws
+
+    async def health(self, request):
+        return web.json_response(
+            {
+                "sessions": len(self.sessions),
+                "connected": sum(s.ws is not None for s in self.sessions.values()),
+                "turns_running": sum(s.busy for s in self.sessions.values()),
+            }
+        )
+
+    async def stats(self, request):
+        summary = self.backends.latency.summary()
+        return web.json_response(
+            {
+                stage: (
+                    {"p50_ms": value[0], "p95_ms": value[1], "turns": value[2]}
+                    if value
+                    else None
+                )
+                for stage, value in summary.items()
+            }
+        )
+
+    async def scenarios(self, request):
+        return web.json_response(
+            {name: scenario["description"] for name, scenario in SCENARIOS.items()}
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", help="default: server_host")
+    parser.add_argument("--port", type=int, help="default: server_port")
+    parser.add_argument(
+        "--tts", choices=TTS_ENGINES + ("none",), help="default: server_tts"
+    )
+    parser.add_argument("--model", help="Ollama model (default: ollama_model)")
+    args = parser.parse_args()
+
+    config = load_config()
+    if args.model:
+        config["ollama_model"] = args.model
+    tts = config["server_tts"] if args.tts is None else args.tts
+    # Enough pooled connections for every request that may run at once
+    config["ollama_pool_size"] = max(
+        config["ollama_pool_size"], config["server_llm_concurrency"]
+    )
+
+    server = TutorServer(config, SharedBackends(config, tts if tts != "none" else None))
+    web.run_app(
+        server.create_app(),
+        host=args.host or config["server_host"],
+        port=args.port or config["server_port"],
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import numpy as np
+
+
+def level_db(data):
+    """RMS level of a 16-bit PCM chunk in dBFS."""
+    samples = np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32768.0
+    if not len(samples):
+        return -100.0
+    return float(20.0 * np.log10(np.sqrt(np.mean(samples * samples)) + 1e-10))
+
+
+class VoiceActivityDetector:
+    """Streaming energy + zero-crossing-rate VAD for 16-bit mono PCM.
+
+    Feed it the chunks read from the microphone. It tracks where speech
+    starts and ends and reports when the speaker has been silent for
+    silence_gap_ms after saying something, so the turn can end on its own.
+    """
+
+    def __init__(
+        self,
+        sample_rate,
+        frame_ms=20,
+        silence_gap_ms=1200,
+        min_speech_ms=250,
+        hangover_ms=300,
+        padding_ms=200,
+        energy_margin_db=10.0,
+        min_energy_db=-55.0,
+        zcr_threshold=0.25,
+        noise_floor_db=None,
+    ):
+        self.sample_rate = sample_rate
+        self.frame_len = max(1, int(sample_rate * frame_ms / 1000))
+        self.silence_gap_frames = max(1, silence_gap_ms // frame_ms)
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self.hangover_frames = hangover_ms // frame_ms
+        self.padding = int(sample_rate * padding_ms / 1000)
+        self.energy_margin_db = energy_margin_db
+        self.min_energy_db = min_energy_db
+        self.zcr_threshold = zcr_threshold
+
+        # Adaptive estimate of the background level, in dBFS. It starts
+        # quiet rather than at the first frame, which may already be speech,
+        # and only follows the frames that are not speech
+        if noise_floor_db is None:
+            noise_floor_db = min_energy_db - energy_margin_db
+        self.noise_floor_db = noise_floor_db
+
+        self.pending = np.zeros(0, dtype=np.int16)  # Partial frame carried over
+        self.frame_index = 0
+        self.in_speech = False
+        self.speech_run = 0  # Consecutive speech frames
+        self.hangover = 0
+        self.silence_run = 0  # Consecutive non-speech frames after speech
+        self.speech_start = None  # Sample index of the first confirmed speech
+        self.speech_end = None  # Sample index just past the last speech frame
+        self.end_of_turn = False
+
+    def frame_features(self, frames):
+        # frames: (n, frame_len) float array scaled to [-1, 1]
+        rms = np.sqrt(np.mean(frames * frames, axis=1)) + 1e-10
+        energy_db = 20.0 * np.log10(rms)
+        signs = np.signbit(frames)
+        zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+        return energy_db, zcr
+
+    def classify(self, energy_db, zcr):
+        threshold = max(self.noise_floor_db + self.energy_margin_db, self.min_energy_db)
+
+        # Voiced speech is loud; unvoiced consonants are quieter but have a
+        # high zero-crossing rate, so accept them a little below the threshold
+        is_speech = energy_db > threshold or (
+            energy_db > threshold - self.energy_margin_db / 2
+            and zcr > self.zcr_threshold
+        )
+
+        if not is_speech:
+            # Track the background level slowly, faster when it drops
+            rate = 0.2 if energy_db < self.noise_floor_db else 0.02
+            self.noise_floor_db += rate * (energy_db - self.noise_floor_db)
+        return is_speech
+
+    def process(self, data):
+        """Consume a PCM chunk. Returns True once the turn should end."""
+        samples = np.frombuffer(data, dtype=np.int16)
+        if len(self.pending):
+            samples = np.concatenate([self.pending, samples])
+        n_frames = len(samples) // self.frame_len
+        self.pending = samples[n_frames * self.frame_len :]
+        if n_frames == 0:
+            return self.end_of_turn
+
+        frames = samples[: n_frames * self.frame_len].reshape(n_frames, self.frame_len)
+        energies, zcrs = self.frame_features(frames.astype(np.float32) / 32768.0)
+
+        for energy_db, zcr in zip(energies, zcrs):
+            self.update(self.classify(float(energy_db), float(zcr)))
+            self.frame_index += 1
+        return self.end_of_turn
+
+    def update(self, is_speech):
+        frame_end = (self.frame_index + 1) * self.frame_len
+
+        if is_speech:
+            self.speech_run += 1
+            self.silence_run = 0
+            self.hangover = self.hangover_frames
+            # Short blips (clicks, coughs) do not count as speech
+            if self.speech_run >= self.min_speech_frames:
+                if self.speech_start is None:
+                    first = self.frame_index - self.speech_run + 1
+                    self.speech_start = first * self.frame_len
+                self.in_speech = True
+            if self.in_speech:
+                self.speech_end = frame_end
+            return
+
+        self.speech_run = 0
+        if self.hangover > 0:
+            # Bridge short pauses between words
+            self.hangover -= 1
+            if self.in_speech:
+                self.speech_end = frame_end
+            return
+
+        self.in_speech = False
+        if self.speech_start is not None:
+            self.silence_run += 1
+            if self.silence_run >= self.silence_gap_frames:
+                self.end_of_turn = True
+
+    @property
+    def heard_speech(self):
+        return self.speech_start is not None
+
+    def speech_bounds(self, total_samples):
+        """(start, end) sample range of the speech plus padding, or None."""
+        if self.speech_start is None:
+            return None
+        start = max(0, self.speech_start - self.padding)
+        end = min(total_samples, self.speech_end + self.padding)
+        return start, end